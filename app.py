@@ -1,179 +1,115 @@
-from flask import Flask, render_template, request, jsonify
-import requests
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.utils
-import json
-from datetime import datetime, timedelta
+from flask import Blueprint, Flask, Response, current_app, render_template, request, jsonify
+from werkzeug.local import LocalProxy
+import numpy as np
+from datetime import datetime
 import os
-from functools import lru_cache
+import queue
 import time
-from top_companies import TOP_COMPANIES
-
-app = Flask(__name__)
-
-# Top 20 S&P500 companies (ticker, name, earnings, country, logo_url)
-TOP_COMPANIES = [
-    {"ticker": "AAPL", "name": "Apple", "earnings": "125.57B", "country": "USA", "logo": "https://logo.clearbit.com/apple.com"},
-    {"ticker": "MSFT", "name": "Microsoft", "earnings": "89.47B", "country": "USA", "logo": "https://logo.clearbit.com/microsoft.com"},
-    {"ticker": "GOOGL", "name": "Alphabet (Google)", "earnings": "73.80B", "country": "USA", "logo": "https://logo.clearbit.com/abc.xyz"},
-    {"ticker": "AMZN", "name": "Amazon", "earnings": "30.43B", "country": "USA", "logo": "https://logo.clearbit.com/amazon.com"},
-    {"ticker": "META", "name": "Meta Platforms", "earnings": "39.10B", "country": "USA", "logo": "https://logo.clearbit.com/meta.com"},
-    {"ticker": "TSLA", "name": "Tesla", "earnings": "15.00B", "country": "USA", "logo": "https://logo.clearbit.com/tesla.com"},
-    {"ticker": "BRK-B", "name": "Berkshire Hathaway", "earnings": "115.57B", "country": "USA", "logo": "https://logo.clearbit.com/berkshirehathaway.com"},
-    {"ticker": "NVDA", "name": "NVIDIA", "earnings": "29.76B", "country": "USA", "logo": "https://logo.clearbit.com/nvidia.com"},
-    {"ticker": "JPM", "name": "JPMorgan Chase", "earnings": "48.33B", "country": "USA", "logo": "https://logo.clearbit.com/jpmorganchase.com"},
-    {"ticker": "V", "name": "Visa", "earnings": "17.27B", "country": "USA", "logo": "https://logo.clearbit.com/visa.com"},
-    {"ticker": "UNH", "name": "UnitedHealth Group", "earnings": "22.38B", "country": "USA", "logo": "https://logo.clearbit.com/unitedhealthgroup.com"},
-    {"ticker": "XOM", "name": "Exxon Mobil", "earnings": "55.74B", "country": "USA", "logo": "https://logo.clearbit.com/exxonmobil.com"},
-    {"ticker": "PG", "name": "Procter & Gamble", "earnings": "14.74B", "country": "USA", "logo": "https://logo.clearbit.com/pg.com"},
-    {"ticker": "MA", "name": "Mastercard", "earnings": "11.19B", "country": "USA", "logo": "https://logo.clearbit.com/mastercard.com"},
-    {"ticker": "JNJ", "name": "Johnson & Johnson", "earnings": "17.94B", "country": "USA", "logo": "https://logo.clearbit.com/jnj.com"},
-    {"ticker": "LLY", "name": "Eli Lilly", "earnings": "5.24B", "country": "USA", "logo": "https://logo.clearbit.com/lilly.com"},
-    {"ticker": "HD", "name": "Home Depot", "earnings": "17.10B", "country": "USA", "logo": "https://logo.clearbit.com/homedepot.com"},
-    {"ticker": "MRK", "name": "Merck & Co.", "earnings": "14.52B", "country": "USA", "logo": "https://logo.clearbit.com/merck.com"},
-    {"ticker": "ABBV", "name": "AbbVie", "earnings": "11.84B", "country": "USA", "logo": "https://logo.clearbit.com/abbvie.com"},
-    {"ticker": "PEP", "name": "PepsiCo", "earnings": "9.08B", "country": "USA", "logo": "https://logo.clearbit.com/pepsico.com"}
-]
-
-# Load configuration
-def load_config():
-    try:
-        with open('config.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("Warning: config.json not found. Please copy config.example.json to config.json and update with your API key.")
-        return {"alpha_vantage_api_key": "demo"}
-
-config = load_config()
-ALPHA_VANTAGE_API_KEY = config['alpha_vantage_api_key']
-BASE_URL = 'https://www.alphavantage.co/query'
-
-# Cache for 1 minute to respect API limits while maintaining fresh data
-@lru_cache(maxsize=128)
-def get_cached_data(url, params_str):
-    return requests.get(url, params=json.loads(params_str)).json()
-
-def get_api_data(function, symbol, **additional_params):
-    params = {
-        'function': function,
-        'symbol': symbol,
-        'apikey': ALPHA_VANTAGE_API_KEY,
-        **additional_params
-    }
-    # Convert params to string for caching
-    params_str = json.dumps(params, sort_keys=True)
-    return get_cached_data(BASE_URL, params_str)
-
-@app.route('/')
+from response_cache import make_key
+from timeseries import from_bars
+from periods import period_slice
+from downsample import lttb_indices, lttb_union_indices, ohlc_buckets, parse_max_points
+from indicators import parse_specs as parse_indicator_specs, warmup_bars, compute as compute_indicators
+from chart_payload import build_chart_payload
+from fastjson import json_response, dumps
+from av_responses import UpstreamError
+from rate_limiter import RateLimitTimeout
+from services import Services, load_config
+
+# Routes live on a blueprint; create_app() loads the configuration, builds
+# the Services and registers them, so importing this module does no work
+bp = Blueprint('main', __name__)
+
+# The Services of the app handling the current request
+svc = LocalProxy(lambda: current_app.extensions['services'])
+
+
+def create_app(config=None, config_path=None):
+    """
+    Build the Flask app. config is a dict (tests, benchmarks); otherwise it is
+    read from config_path, the CONFIG_PATH environment variable or config.json.
+    """
+    if config is None:
+        config = load_config(config_path or os.environ.get('CONFIG_PATH', 'config.json'))
+    app = Flask(__name__)
+    app.extensions['services'] = Services(config)
+    app.register_blueprint(bp)
+    return app
+
+
+def after_fork(app):
+    """gunicorn post_fork hook: see Services.after_fork"""
+    app.extensions['services'].after_fork()
+
+def bars_to_frame(bars):
+    # pandas is only needed by the chart routes: import it on first use
+    import pandas as pd
+    return pd.DataFrame(
+        {name: bars[name] for name in ('open', 'high', 'low', 'close', 'volume')},
+        index=pd.DatetimeIndex(bars['date'])
+    )
+
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/get_stock_data', methods=['POST'])
+def get_info_data(function, symbol):
+    """Upstream data for the info box, or {} (shown as 'N/A') when it is unavailable"""
+    try:
+        return svc.get_api_data(function, symbol)
+    except (UpstreamError, RateLimitTimeout) as e:
+        print(f"{function} unavailable for {symbol}: {e}")
+        return {}
+
+@bp.route('/get_stock_data', methods=['POST'])
 def get_stock_data():
     try:
         symbol = request.json['symbol']
         period = request.json.get('period', '1mo')
         
-        # Get time series data
-        if period in ['1d', '5d']:
-            data = get_api_data('TIME_SERIES_INTRADAY', symbol, interval='5min', outputsize='full')
-            time_series_key = 'Time Series (5min)'
-        else:
-            data = get_api_data('TIME_SERIES_DAILY', symbol, outputsize='full')
-            time_series_key = 'Time Series (Daily)'
-
-        if 'Error Message' in data:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid symbol or API error'
-            })
+        # Get time series data from the local store (refreshed incrementally)
+        interval = '5min' if period in ['1d', '5d'] else 'daily'
+        bars = svc.price_store.get(symbol, interval)
 
-        # Get company overview
-        overview = get_api_data('OVERVIEW', symbol)
-        
-        # Get global quote
-        quote = get_api_data('GLOBAL_QUOTE', symbol)
-        
-        # Get SMA indicator
-        sma = get_api_data('SMA', symbol, interval='daily', time_period='20', series_type='close')
+        # Company overview and quote only fill the info box: the chart is
+        # still served from local bars when upstream is throttled
+        overview = get_info_data('OVERVIEW', symbol)
+        quote = get_info_data('GLOBAL_QUOTE', symbol)
         
-        # Parse time series data
-        if time_series_key not in data or not isinstance(data[time_series_key], dict) or not data[time_series_key]:
+        if bars is None or not len(bars):
             return jsonify({
                 'success': False,
                 'error': 'Dati non disponibili per questo simbolo o periodo. Prova a cambiare periodo o riprova più tardi.'
             })
 
-        time_series = data[time_series_key]
-        df = pd.DataFrame.from_dict(time_series, orient='index')
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
-        
-        # Filter data based on period
-        if period == '1d':
-            df = df[df.index >= (datetime.now() - timedelta(days=1))]
-        elif period == '5d':
-            df = df[df.index >= (datetime.now() - timedelta(days=5))]
-        elif period == '1mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=30))]
-        elif period == '3mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=90))]
-        elif period == '6mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=180))]
-        elif period == '1y':
-            df = df[df.index >= (datetime.now() - timedelta(days=365))]
-
-        # Rename columns
-        df.columns = [col.split('. ')[1] for col in df.columns]
-        
-        # Add SMA if available
-        if 'Technical Analysis: SMA' in sma:
-            sma_data = pd.DataFrame.from_dict(sma['Technical Analysis: SMA'], orient='index')
-            sma_data.index = pd.to_datetime(sma_data.index)
-            sma_data = sma_data.sort_index()
-            df['sma'] = sma_data['SMA']
-
-        # Create plot
-        fig = go.Figure()
-        
-        # Add candlestick
-        fig.add_trace(go.Candlestick(
-            x=df.index,
-            open=df['open'].astype(float),
-            high=df['high'].astype(float),
-            low=df['low'].astype(float),
-            close=df['close'].astype(float),
-            name='OHLC'
-        ))
-        
-        # Add SMA if available
-        if 'sma' in df.columns:
-            fig.add_trace(go.Scatter(
-                x=df.index,
-                y=df['sma'].astype(float),
-                name='20-day SMA',
-                line=dict(color='orange', width=2)
-            ))
-
-        # Update layout with premium styling
-        fig.update_layout(
-            title=f'{symbol} Stock Price',
-            yaxis_title='Price',
-            xaxis_title='Date',
-            template='plotly_dark',
-            showlegend=True,
-            legend=dict(
-                yanchor="top",
-                y=0.99,
-                xanchor="left",
-                x=0.01,
-                bgcolor="rgba(0,0,0,0.5)"
-            )
-        )
-        
-        # Convert plot to JSON
-        graphJSON = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        # Slice the requested window (a view on the stored bars) before copying
+        window = period_slice(bars['date'], period, time_from=request.json.get('from'), time_to=request.json.get('to'))
+        df = bars_to_frame(bars[window])
+
+        # Indicators are computed locally, with enough history before the window to warm up
+        specs = parse_indicator_specs(request.json.get('indicators'))
+        start = max(0, window.start - warmup_bars(specs))
+        offset = window.start - start
+        lines = []
+        for line in compute_indicators(specs, from_bars(bars[start:window.stop])):
+            values = line['values'][offset:]
+            valid = ~np.isnan(values)
+            lines.append({**line, 'x': df.index.values[valid], 'values': values[valid]})
+
+        # Optional server-side downsampling of long ranges
+        max_points = parse_max_points(request.json.get('max_points'))
+        candles = (df.index.values, df['open'].values, df['high'].values,
+                   df['low'].values, df['close'].values, df['volume'].values)
+        downsampling = {'original_points': len(df), 'returned_points': len(df), 'method': None}
+        if max_points and len(df) > max_points:
+            candles = ohlc_buckets(*candles, max_points)
+            for line in lines:
+                keep = lttb_indices(line['x'], line['values'], max_points)
+                line['x'], line['values'] = line['x'][keep], line['values'][keep]
+            downsampling = {'original_points': len(df), 'returned_points': len(candles[0]), 'method': 'ohlc_buckets+lttb'}
+
+        # Plain arrays; the front end applies the static layout (static/chart_layout.json)
+        chart = build_chart_payload(symbol, candles, lines)
         
         # Get current quote data
         quote_data = quote.get('Global Quote', {})
@@ -197,10 +133,11 @@ def get_stock_data():
             'description': overview.get('Description', 'N/A')
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'graph': graphJSON,
-            'info': company_info
+            'chart': chart,
+            'info': company_info,
+            'downsampling': downsampling
         })
         
     except Exception as e:
@@ -210,117 +147,108 @@ def get_stock_data():
             'error': str(e)
         })
 
-@app.route('/api/top_companies')
+SSE_KEEPALIVE = 15
+# Streams are closed after this long so their threads rotate between dashboards
+SSE_MAX_SECONDS = 300
+
+@bp.route('/api/top_companies')
 def api_top_companies():
-    api_key = config['alpha_vantage_api_key']
-    results = []
-    for company in TOP_COMPANIES:
-        ticker = company['ticker']
-        # Get GLOBAL_QUOTE
-        quote_url = 'https://www.alphavantage.co/query'
-        quote_params = {
-            'function': 'GLOBAL_QUOTE',
-            'symbol': ticker,
-            'apikey': api_key
-        }
-        quote_resp = requests.get(quote_url, params=quote_params)
-        quote_data = quote_resp.json().get('Global Quote', {})
-        price = float(quote_data.get('05. price', 0))
-        change = float(quote_data.get('09. change', 0))
-        change_percent = quote_data.get('10. change percent', '0%')
-        volume = int(quote_data.get('06. volume', 0))
-        # Get OVERVIEW
-        overview_url = 'https://www.alphavantage.co/query'
-        overview_params = {
-            'function': 'OVERVIEW',
-            'symbol': ticker,
-            'apikey': api_key
-        }
-        overview_resp = requests.get(overview_url, params=overview_params)
-        overview_data = overview_resp.json()
-        market_cap = overview_data.get('MarketCapitalization', 'N/A')
-        pe_ratio = overview_data.get('PERatio', 'N/A')
-        shares_outstanding = overview_data.get('SharesOutstanding')
-        # Calcolo market cap live se possibile
-        if shares_outstanding and price:
-            try:
-                market_cap_live = float(shares_outstanding) * price
-            except Exception:
-                market_cap_live = market_cap
-        else:
-            market_cap_live = market_cap
-        # Get sparkline (last 30 closes)
-        ts_url = 'https://www.alphavantage.co/query'
-        ts_params = {
-            'function': 'TIME_SERIES_DAILY',
-            'symbol': ticker,
-            'apikey': api_key,
-            'outputsize': 'compact'
-        }
-        ts_resp = requests.get(ts_url, params=ts_params)
-        ts_data = ts_resp.json().get('Time Series (Daily)', {})
-        closes = []
-        if ts_data:
-            closes = [float(v['4. close']) for k, v in sorted(ts_data.items(), reverse=False)][-30:]
-        # Compose result
-        results.append({
-            **company,
-            'price': price,
-            'change': change,
-            'change_percent': change_percent,
-            'volume': volume,
-            'market_cap': market_cap_live,
-            'pe_ratio': pe_ratio,
-            'sparkline': closes
-        })
-    return jsonify({'companies': results})
+    snapshot = svc.top_companies_snapshot.current(timeout=svc.top_companies_first_wait)
+    if snapshot is None:
+        return jsonify({'companies': [], 'errors': {}, 'error': 'Dati non ancora disponibili, riprova tra poco'}), 503
+    response = Response(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.cache_control.no_cache = True
+    # 304 Not Modified when If-None-Match already has this version
+    return response.make_conditional(request)
+
+def sse_event(event, body, event_id=None):
+    """One Server-Sent Events message; body is JSON bytes"""
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else '')
+    return head.encode() + b'data: ' + body + b'\n\n'
+
+@bp.route('/api/top_companies/stream')
+def api_top_companies_stream():
+    """
+    Pushes 'update' events with the rows changed by each refresh. A full
+    'snapshot' event is sent first unless the client's version is already
+    current, and again whenever the client falls behind. The version is the
+    Last-Event-ID of a reconnect (the last event the browser saw), else
+    ?version= from the page's first subscribe.
+
+    Each open stream holds a server thread, so a worker serves at most
+    top_companies.max_streams of them (503 beyond that: the page polls
+    instead), and each ends after SSE_MAX_SECONDS (the browser reconnects,
+    possibly to another worker).
+    """
+    # Versions are content hashes, so one seen from another worker still matches.
+    # A reconnect keeps the original URL: its ?version= is older than Last-Event-ID
+    client_version = request.headers.get('Last-Event-ID') or request.args.get('version')
+
+    # The generator outlives the request context, so resolve the proxy now
+    snapshots = svc.top_companies_snapshot
+    first_wait = svc.top_companies_first_wait
+    streams = svc.top_companies_streams
+    if not streams.acquire(blocking=False):
+        return jsonify({'error': 'Troppi aggiornamenti in tempo reale aperti, riprova più tardi'}), 503, {'Retry-After': '60'}
+
+    def events():
+        subscription = snapshots.subscribe()
+        ends_at = time.monotonic() + SSE_MAX_SECONDS
+        try:
+            snapshot = snapshots.current(timeout=first_wait)
+            if snapshot is not None and snapshot.version != client_version:
+                yield sse_event('snapshot', snapshot.body, snapshot.version)
+            while time.monotonic() < ends_at:
+                try:
+                    diff = subscription.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield b': keep-alive\n\n'
+                    continue
+                if diff.get('resync'):
+                    snapshot = snapshots.current()
+                    yield sse_event('snapshot', snapshot.body, snapshot.version)
+                else:
+                    yield sse_event('update', dumps(diff), diff['version'])
+        finally:
+            snapshots.unsubscribe(subscription)
 
-@app.route('/sma')
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the server closes the response, even if the generator never started
+    response.call_on_close(streams.release)
+    return response
+
+@bp.route('/sma')
 def sma_plot():
     return render_template('sma.html')
 
-@app.route('/close-volume')
+@bp.route('/close-volume')
 def close_volume_plot():
     return render_template('close_volume.html')
 
-@app.route('/search')
+@bp.route('/search')
 def search_company():
     return render_template('search.html')
 
-@app.route('/marketcap')
+@bp.route('/marketcap')
 def marketcap_view():
     return render_template('marketcap.html')
 
-@app.route('/get_close_volume_data', methods=['POST'])
+@bp.route('/get_close_volume_data', methods=['POST'])
 def get_close_volume_data():
     try:
         symbol = request.json['symbol']
         period = request.json.get('period', '1mo')
-        # Recupera dati daily
-        data = get_api_data('TIME_SERIES_DAILY', symbol, outputsize='full')
-        time_series_key = 'Time Series (Daily)'
-        if 'Error Message' in data or time_series_key not in data or not isinstance(data[time_series_key], dict) or not data[time_series_key]:
+        # Recupera dati daily dallo store locale
+        bars = svc.price_store.get(symbol, 'daily')
+        if bars is None or not len(bars):
             return jsonify({'success': False, 'error': 'Dati non disponibili per questo simbolo o periodo.'})
-        time_series = data[time_series_key]
-        df = pd.DataFrame.from_dict(time_series, orient='index')
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
         # Filtra periodo
-        if period == '1d':
-            df = df[df.index >= (datetime.now() - timedelta(days=1))]
-        elif period == '5d':
-            df = df[df.index >= (datetime.now() - timedelta(days=5))]
-        elif period == '1mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=30))]
-        elif period == '3mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=90))]
-        elif period == '6mo':
-            df = df[df.index >= (datetime.now() - timedelta(days=180))]
-        elif period == '1y':
-            df = df[df.index >= (datetime.now() - timedelta(days=365))]
+        window = period_slice(bars['date'], period, time_from=request.json.get('from'), time_to=request.json.get('to'))
+        df = bars_to_frame(bars[window])
         # Estrai close e volume
-        df['close'] = df['4. close'].astype(float)
-        df['volume'] = df['5. volume'].astype(float)
+        df['volume'] = df['volume'].astype(float)
         # Normalizza volume tra 0 e 1
         min_vol = df['volume'].min()
         max_vol = df['volume'].max()
@@ -328,49 +256,112 @@ def get_close_volume_data():
             df['volume_norm'] = (df['volume'] - min_vol) / (max_vol - min_vol)
         else:
             df['volume_norm'] = 0
+        # Downsampling opzionale: LTTB su close e volume, unione dei punti scelti
+        max_points = parse_max_points(request.json.get('max_points'))
+        downsampling = {'original_points': len(df), 'returned_points': len(df), 'method': None}
+        if max_points and len(df) > max_points:
+            keep = lttb_union_indices(df.index.values, [df['close'].values, df['volume_norm'].values], max_points)
+            df = df.iloc[keep]
+            downsampling = {'original_points': downsampling['original_points'], 'returned_points': len(df), 'method': 'lttb'}
         # Prepara dati per il frontend
         return jsonify({
             'success': True,
             'dates': [d.strftime('%Y-%m-%d') for d in df.index],
             'close': df['close'].tolist(),
-            'volume_norm': df['volume_norm'].tolist()
+            'volume_norm': df['volume_norm'].tolist(),
+            'downsampling': downsampling
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/get_news', methods=['POST'])
+@bp.route('/get_news', methods=['POST'])
 def get_news():
     try:
         params = request.json
-        api_params = {
-            'function': 'NEWS_SENTIMENT',
-            'apikey': ALPHA_VANTAGE_API_KEY
-        }
-        if 'tickers' in params and params['tickers']:
-            api_params['tickers'] = params['tickers']
-        else:
+        if not params.get('tickers'):
             return jsonify({'success': False, 'error': 'Ticker obbligatorio'}), 400
-        if 'topics' in params and params['topics']:
-            api_params['topics'] = params['topics']
-        if 'time_from' in params and params['time_from']:
-            api_params['time_from'] = params['time_from']
-        if 'time_to' in params and params['time_to']:
-            api_params['time_to'] = params['time_to']
-        if 'sort' in params and params['sort']:
-            api_params['sort'] = params['sort']
-        if 'limit' in params and params['limit']:
-            api_params['limit'] = params['limit']
-        resp = requests.get(BASE_URL, params=api_params)
-        data = resp.json()
-        if 'feed' not in data:
-            return jsonify({'success': False, 'error': data.get('Information', 'Nessuna news trovata o limite API raggiunto')})
-        return jsonify({'success': True, 'feed': data['feed']})
+        feed, next_cursor, info = svc.news_store.search(
+            params['tickers'].split(','),
+            topic=params.get('topics') or None,
+            time_from=params.get('time_from') or None,
+            time_to=params.get('time_to') or None,
+            sort=params.get('sort') or 'LATEST',
+            limit=params.get('limit') or None,
+            cursor=params.get('cursor') or None
+        )
+        if not feed and 'error' in info:
+            return jsonify({'success': False, 'error': info['error']})
+        return json_response({'success': True, 'feed': feed, 'next_cursor': next_cursor, **info})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/api/sentiment_daily')
+def api_sentiment_daily():
+    ticker = request.args.get('ticker', '').strip()
+    if not ticker:
+        return jsonify({'success': False, 'error': 'Ticker obbligatorio'}), 400
+    day_from = request.args.get('from') or None
+    day_to = request.args.get('to') or None
+    try:
+        for day in (day_from, day_to):
+            if day:
+                datetime.strptime(day, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Date nel formato YYYY-MM-DD'}), 400
+    series = svc.news_store.daily_sentiment(ticker, day_from, day_to)
+    return json_response({'success': True, 'ticker': ticker.upper(), 'series': series})
+
+@bp.route('/api/sentiment_price')
+def api_sentiment_price():
+    """
+    Lagged sentiment/return correlations and event-window returns.
+
+    ticker=AAPL for one symbol (its prices are refreshed first), or no ticker
+    for the whole sp500_tickers.txt universe using locally stored prices.
+    """
+    try:
+        ticker = request.args.get('ticker', '').strip().upper()
+        interval = request.args.get('interval', 'daily')
+        if interval not in ('daily', '5min'):
+            return jsonify({'success': False, 'error': f'Intervallo non supportato: {interval}'}), 400
+        params = {
+            'time_from': request.args.get('from') or None,
+            'time_to': request.args.get('to') or None,
+            'interval': interval,
+            'max_lag': min(int(request.args.get('max_lag', 5)), 30),
+            'window': min(int(request.args.get('window', 5)), 30),
+            'min_relevance': float(request.args.get('min_relevance', 0.5))
+        }
+        key = make_key({'function': 'SENTIMENT_PRICE', 'ticker': ticker or '*', **params})
+        result = svc.response_cache.get(key)
+        if result is None:
+            # Loaded on first use: it pulls in pandas
+            import sentiment_price
+            if ticker:
+                svc.price_store.get(ticker, interval)
+            tickers = [ticker] if ticker else sentiment_price.load_universe()
+            result = sentiment_price.analyze(svc.news_store.connection(), svc.price_store.load, tickers, **params)
+            svc.response_cache.set(key, result, 'SENTIMENT_PRICE')
+        return json_response({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/news')
+@bp.route('/news')
 def news_page():
     return render_template('news.html')
 
+@bp.route('/api/cache_stats')
+def api_cache_stats():
+    return jsonify(svc.response_cache.snapshot())
+
+@bp.route('/api/metrics')
+def api_metrics():
+    return jsonify(svc.snapshot())
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True) 
\ No newline at end of file
+    # Development server only; production runs gunicorn -c gunicorn.conf.py 'app:create_app()'
+    create_app().run(host='0.0.0.0', debug=os.environ.get('FLASK_DEBUG', '1') == '1')
@@ -0,0 +1,73 @@
+"""Classification of Alpha Vantage responses.
+
+Alpha Vantage answers throttling and most errors with HTTP 200 and a JSON
+body holding an 'Information', 'Note' or 'Error Message' key, so callers
+cannot rely on the status code to decide whether to retry.
+"""
+
+OK = 'ok'
+EMPTY = 'empty'
+THROTTLED = 'throttled'
+INVALID_KEY = 'invalid_key'
+ERROR = 'error'
+
+_THROTTLE_HINTS = ('call frequency', 'rate limit', 'requests per day', 'calls per minute', 'per second', 'burst')
+_KEY_HINTS = ('apikey', 'api key', 'demo purposes')
+
+
+class UpstreamError(Exception):
+    """An Alpha Vantage call that did not produce usable data"""
+
+    kind = ERROR
+
+
+class ThrottledError(UpstreamError):
+    kind = THROTTLED
+
+
+class InvalidApiKeyError(UpstreamError):
+    kind = INVALID_KEY
+
+
+def message(payload):
+    """The human readable message Alpha Vantage put in a non-data response"""
+    if not isinstance(payload, dict):
+        return ''
+    return str(payload.get('Note') or payload.get('Information') or payload.get('Error Message') or '')
+
+
+def classify(payload, data_key=None):
+    """
+    Return OK, EMPTY, THROTTLED, INVALID_KEY or ERROR for a decoded response.
+
+    data_key names the entry that carries the data (e.g. 'feed'); without it
+    any dict free of error keys counts as OK when it is not empty.
+    """
+    if not isinstance(payload, dict) or not payload:
+        return EMPTY
+    text = message(payload).lower()
+    if text:
+        if any(hint in text for hint in _THROTTLE_HINTS):
+            return THROTTLED
+        if any(hint in text for hint in _KEY_HINTS):
+            return INVALID_KEY
+        if 'Note' in payload:
+            # Notes are only ever used for frequency warnings
+            return THROTTLED
+        return ERROR
+    if data_key is not None:
+        data = payload.get(data_key)
+        if data is None:
+            return ERROR
+        return OK if data else EMPTY
+    return OK
+
+
+def raise_for_payload(payload, data_key=None):
+    """classify() and raise for throttled or invalid-key responses; returns the kind otherwise"""
+    kind = classify(payload, data_key)
+    if kind == THROTTLED:
+        raise ThrottledError(message(payload))
+    if kind == INVALID_KEY:
+        raise InvalidApiKeyError(message(payload))
+    return kind
@@ -0,0 +1,303 @@
+"""
+Offline stand-in for the Alpha Vantage query endpoint.
+
+Answers TIME_SERIES_DAILY, TIME_SERIES_INTRADAY, OVERVIEW, GLOBAL_QUOTE,
+SMA and NEWS_SENTIMENT after a configurable delay, either by replaying
+payloads recorded with benchmarks/record_payloads.py (--recordings) or with
+synthetic payloads of the real shape. --throttle-per-minute and
+--throttle-every make it answer like a throttled key, with an HTTP 200
+'Note' or 'Information' body. Point the app at it with
+"alpha_vantage_base_url": "http://127.0.0.1:8765/query" in config.json.
+
+    python benchmarks/av_stub.py [--port 8765] [--latency 0.2] [--jitter 0.05]
+        [--recordings benchmarks/payloads] [--throttle-per-minute 75] [--throttle-kind note]
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.md5('|'.join(map(str, parts)).encode()).digest()[:4], 'big')
+
+
+def _bars(symbol, count, step, fmt):
+    rng = random.Random(_seed(symbol, step))
+    price = 50 + rng.random() * 450
+    stamp = datetime.now().replace(second=0, microsecond=0)
+    series = {}
+    for i in range(count):
+        while step >= timedelta(days=1) and stamp.weekday() >= 5:
+            stamp -= timedelta(days=1)
+        price *= 1 + rng.gauss(0, 0.01)
+        series[stamp.strftime(fmt)] = {
+            '1. open': f'{price:.4f}',
+            '2. high': f'{price * 1.01:.4f}',
+            '3. low': f'{price * 0.99:.4f}',
+            '4. close': f'{price * 1.002:.4f}',
+            '5. volume': str(1000000 + rng.randrange(1000000)),
+        }
+        stamp -= step
+    return series
+
+
+def time_series_daily(params):
+    symbol = params.get('symbol', 'DEMO')
+    count = 5000 if params.get('outputsize') == 'full' else 100
+    return {
+        'Meta Data': {'2. Symbol': symbol},
+        'Time Series (Daily)': _bars(symbol, count, timedelta(days=1), '%Y-%m-%d'),
+    }
+
+
+def time_series_intraday(params):
+    symbol = params.get('symbol', 'DEMO')
+    interval = params.get('interval', '5min')
+    count = 2000 if params.get('outputsize') == 'full' else 100
+    return {
+        'Meta Data': {'2. Symbol': symbol, '4. Interval': interval},
+        f'Time Series ({interval})': _bars(symbol, count, timedelta(minutes=5), '%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def overview(params):
+    symbol = params.get('symbol', 'DEMO')
+    rng = random.Random(_seed(symbol, 'overview'))
+    shares = rng.randrange(10 ** 9, 2 * 10 ** 10)
+    return {
+        'Symbol': symbol, 'Name': f'{symbol} Inc.', 'Sector': 'TECHNOLOGY', 'Industry': 'SOFTWARE',
+        'Description': f'Synthetic company for {symbol}.',
+        'MarketCapitalization': str(shares * rng.randrange(50, 500)), 'SharesOutstanding': str(shares),
+        'PERatio': f'{rng.uniform(5, 60):.2f}', 'DividendYield': f'{rng.uniform(0, 0.04):.4f}',
+        '52WeekHigh': '500.00', '52WeekLow': '50.00',
+    }
+
+
+def global_quote(params):
+    symbol = params.get('symbol', 'DEMO')
+    # Changes once a minute, like a cached real quote would
+    rng = random.Random(_seed(symbol, datetime.now().strftime('%Y%m%d%H%M')))
+    price = 50 + rng.random() * 450
+    change = rng.uniform(-5, 5)
+    return {'Global Quote': {
+        '01. symbol': symbol, '05. price': f'{price:.4f}', '06. volume': str(rng.randrange(10 ** 6, 10 ** 8)),
+        '09. change': f'{change:.4f}', '10. change percent': f'{change / price * 100:.4f}%',
+    }}
+
+
+def sma(params):
+    symbol = params.get('symbol', 'DEMO')
+    closes = time_series_daily({'symbol': symbol})['Time Series (Daily)']
+    return {
+        'Meta Data': {'1: Symbol': symbol, '3: Indicator': 'Simple Moving Average (SMA)'},
+        'Technical Analysis: SMA': {day: {'SMA': bar['4. close']} for day, bar in closes.items()},
+    }
+
+
+def news_sentiment(params):
+    tickers = [t for t in params.get('tickers', 'AAPL').split(',') if t]
+    rng = random.Random(_seed(params.get('tickers'), params.get('topics'), params.get('time_from')))
+    stamp = datetime.now()
+    feed = []
+    for i in range(min(int(params.get('limit', 50)), 200)):
+        stamp -= timedelta(minutes=rng.randrange(5, 120))
+        score = rng.uniform(-0.5, 0.5)
+        feed.append({
+            'title': f'Synthetic headline {i}', 'url': f'https://news.example/{rng.getrandbits(48):x}',
+            'time_published': stamp.strftime('%Y%m%dT%H%M%S'), 'summary': 'Synthetic summary.',
+            'source': 'Stub', 'topics': [{'topic': 'Technology', 'relevance_score': '0.9'}],
+            'overall_sentiment_score': f'{score:.4f}', 'overall_sentiment_label': 'Neutral',
+            'ticker_sentiment': [
+                {'ticker': t, 'relevance_score': f'{rng.random():.4f}',
+                 'ticker_sentiment_score': f'{score:.4f}', 'ticker_sentiment_label': 'Neutral'}
+                for t in tickers
+            ],
+        })
+    return {'items': str(len(feed)), 'feed': feed}
+
+
+HANDLERS = {
+    'TIME_SERIES_DAILY': time_series_daily,
+    'TIME_SERIES_INTRADAY': time_series_intraday,
+    'OVERVIEW': overview,
+    'GLOBAL_QUOTE': global_quote,
+    'SMA': sma,
+    'NEWS_SENTIMENT': news_sentiment,
+}
+
+# What Alpha Vantage sends (with HTTP 200) once a key is over its limits
+THROTTLE_PAYLOADS = {
+    'note': {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is '
+                     '5 calls per minute and 500 calls per day. Please visit '
+                     'https://www.alphavantage.co/premium/ if you would like to target a higher API call frequency.'},
+    'information': {'Information': 'Thank you for using Alpha Vantage! Our standard API rate limit is '
+                                   '25 requests per day. Please subscribe to any of the premium plans at '
+                                   'https://www.alphavantage.co/premium/ to instantly remove all daily rate limits.'},
+}
+
+
+def _requested_symbol(params):
+    return params.get('symbol') or (params.get('tickers') or '').split(',')[0] or None
+
+
+class Recordings:
+    """
+    Payloads saved by record_payloads.py, one JSON file per call holding
+    {"params": {...}, "payload": {...}}. A call is answered with the
+    recording of the same function and symbol if there is one, else with
+    any recording of the function, its symbol swapped for the requested one.
+    Bodies are serialized once at load, so replaying costs no JSON encoding.
+    """
+
+    def __init__(self, directory):
+        self.by_symbol = {}
+        self.by_function = {}
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            with open(path, 'r') as f:
+                recorded = json.load(f)
+            params = recorded['params']
+            function, symbol = params['function'], _requested_symbol(params)
+            body = json.dumps(recorded['payload'])
+            self.by_symbol[(function, symbol)] = body
+            self.by_function.setdefault(function, (symbol, body))
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+    def get(self, params):
+        """The body to send for params, or None when nothing of that function was recorded"""
+        function, symbol = params.get('function'), _requested_symbol(params)
+        body = self.by_symbol.get((function, symbol))
+        if body is not None:
+            return body
+        if function not in self.by_function:
+            return None
+        recorded_symbol, body = self.by_function[function]
+        if symbol and recorded_symbol and symbol != recorded_symbol:
+            body = body.replace(f'"{recorded_symbol}"', f'"{symbol}"')
+        return body
+
+
+class Throttle:
+    """
+    Decides which calls get a throttle answer instead of data: calls beyond
+    per_minute in any sliding 60 seconds, and/or every Nth call.
+    """
+
+    def __init__(self, per_minute=None, every=None, kind='note'):
+        self.per_minute = per_minute
+        self.every = every
+        self.body = json.dumps(THROTTLE_PAYLOADS[kind])
+        self._calls = deque()
+        self._count = 0
+
+    def __call__(self):
+        """True when this call is throttled (runs on the event loop, so no lock)"""
+        self._count += 1
+        if self.every and self._count % self.every == 0:
+            return True
+        if self.per_minute:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.per_minute:
+                return True
+            self._calls.append(now)
+        return False
+
+
+def make_app(latency=0.2, jitter=0.05, recordings=None, throttle=None):
+    app = web.Application()
+    app['stats'] = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0, 'replayed': 0, 'throttled': 0}
+
+    async def query(request):
+        stats = request.app['stats']
+        stats['requests'] += 1
+        stats['in_flight'] += 1
+        stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+        try:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if throttle is not None and throttle():
+                stats['throttled'] += 1
+                return web.Response(text=throttle.body, content_type='application/json')
+            body = recordings.get(request.query) if recordings is not None else None
+            if body is not None:
+                stats['replayed'] += 1
+                return web.Response(text=body, content_type='application/json')
+            handler = HANDLERS.get(request.query.get('function'))
+            if handler is None:
+                payload = {'Error Message': 'Invalid API call. Please retry or visit the documentation.'}
+            else:
+                payload = handler(request.query)
+            return web.Response(text=json.dumps(payload), content_type='application/json')
+        finally:
+            stats['in_flight'] -= 1
+
+    async def stats(request):
+        return web.json_response(request.app['stats'])
+
+    app.router.add_get('/query', query)
+    app.router.add_get('/stats', stats)
+    return app
+
+
+def start_in_thread(port, host='127.0.0.1', **app_options):
+    """Run the stub on its own loop thread (for in-process benchmarks); returns once it is listening"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def serve():
+        runner = web.AppRunner(make_app(**app_options))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        ready.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(serve()), loop.run_forever()), daemon=True).start()
+    ready.wait()
+
+
+def add_arguments(parser):
+    """Stub options, shared with the benchmarks that start the stub themselves"""
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds before each answer')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Random +/- seconds added to the latency')
+    parser.add_argument('--recordings', help='Directory of payloads saved by record_payloads.py')
+    parser.add_argument('--throttle-per-minute', type=int, help='Throttle calls beyond this many per minute')
+    parser.add_argument('--throttle-every', type=int, help='Throttle every Nth call')
+    parser.add_argument('--throttle-kind', choices=sorted(THROTTLE_PAYLOADS), default='note',
+                        help="Answer throttled calls with a 'Note' or an 'Information' body")
+
+
+def app_options(args):
+    """make_app() keyword arguments from parsed add_arguments() options"""
+    throttle = None
+    if args.throttle_per_minute or args.throttle_every:
+        throttle = Throttle(args.throttle_per_minute, args.throttle_every, args.throttle_kind)
+    return {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'recordings': Recordings(args.recordings) if args.recordings else None,
+        'throttle': throttle,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline Alpha Vantage stub server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(make_app(**app_options(args)), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: chart serialization time and payload bytes.
+
+Compares the old go.Figure + PlotlyJSONEncoder path (JSON string nested in
+the response) with chart_payload.build_chart_payload + fastjson.dumps.
+
+    python benchmarks/bench_chart_payload.py [--bars 1260] [--repeat 30]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import fastjson
+from chart_payload import build_chart_payload
+
+
+def make_series(n_bars):
+    dates = np.arange(np.datetime64('2000-01-03'), np.datetime64('2000-01-03') + n_bars).astype('datetime64[s]')
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, n_bars))
+    candles = (dates, close - 0.5, close + 1.0, close - 1.0, close, np.full(n_bars, 1000000, dtype=np.int64))
+    sma = np.convolve(close, np.ones(20) / 20, mode='same')
+    lines = [{'name': 'SMA 20', 'pane': 'price', 'x': dates, 'values': sma}]
+    return candles, lines
+
+
+def old_path(candles, lines):
+    import plotly.graph_objects as go
+    import plotly.utils
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(x=candles[0], open=candles[1], high=candles[2],
+                                 low=candles[3], close=candles[4], name='OHLC'))
+    for line in lines:
+        fig.add_trace(go.Scatter(x=line['x'], y=line['values'], name=line['name']))
+    fig.update_layout(title='AAPL Stock Price', yaxis_title='Price', xaxis_title='Date',
+                      template='plotly_dark', showlegend=True)
+    graph_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    # The old endpoint nested that string inside another JSON document
+    return json.dumps({'success': True, 'graph': graph_json}).encode('utf-8')
+
+
+def new_path(candles, lines):
+    return fastjson.dumps({'success': True, 'chart': build_chart_payload('AAPL', candles, lines)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chart payload serialization benchmark')
+    parser.add_argument('--bars', type=int, default=1260)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    candles, lines = make_series(args.bars)
+    print(f"Series: {args.bars} bars, encoder: {'orjson' if fastjson.orjson else 'json'}")
+
+    new_bytes = len(new_path(candles, lines))
+    new = min(timeit.repeat(lambda: new_path(candles, lines), number=1, repeat=args.repeat))
+    try:
+        import plotly  # noqa: F401
+    except ImportError:
+        old = None
+    else:
+        old_bytes = len(old_path(candles, lines))
+        old = min(timeit.repeat(lambda: old_path(candles, lines), number=1, repeat=args.repeat))
+
+    if old is not None:
+        print(f"Plotly figure path:  {old * 1000:8.2f} ms  {old_bytes:>10,} bytes")
+    else:
+        print("Plotly figure path:  skipped (plotly not installed)")
+    print(f"Compact payload:     {new * 1000:8.2f} ms  {new_bytes:>10,} bytes")
+    if old is not None:
+        print(f"Speedup {old / new:.1f}x, payload {old_bytes / new_bytes:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
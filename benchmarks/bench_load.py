@@ -0,0 +1,322 @@
+"""
+Load test of the web app against the offline Alpha Vantage stub.
+
+Starts benchmarks/av_stub.py and the app (the Flask server, or gunicorn with
+gunicorn.conf.py) in subprocesses with a throwaway config and data
+directory, then runs each scenario with --concurrency clients for
+--duration seconds and reports throughput and latency percentiles. A
+response counts as an error when its status is 4xx/5xx or its JSON says
+"success": false. Upstream calls (and how many of them the stub throttled)
+are read from the stub's /stats.
+
+Scenarios:
+    stock_data     POST /get_stock_data (intraday and daily periods, SMA 20)
+    close_volume   POST /get_close_volume_data
+    top_companies  GET  /api/top_companies
+    news           POST /get_news
+
+Each scenario first sends --warmup requests that are not measured (the
+first ones fill the price store, the caches and the dashboard snapshot);
+--warmup 0 measures cold starts. Stub options (--latency, --recordings,
+--throttle-*) are the ones of av_stub.py.
+
+    python benchmarks/bench_load.py [--scenario stock_data ...] [--concurrency 16] [--duration 10]
+        [--server gunicorn --workers 4] [--output results.json] [--compare baseline.json]
+    python benchmarks/bench_load.py --url http://127.0.0.1:5000   # an app already running
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+from av_stub import add_arguments as add_stub_arguments
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+SYMBOLS = ['AAPL', 'MSFT', 'NVDA', 'GOOGL', 'AMZN', 'META', 'TSLA', 'JPM', 'V', 'WMT']
+PERIODS = ['1d', '1mo', '6mo', '1y', 'max']
+
+SERVER = """
+import sys
+from app import create_app
+create_app().run(host='127.0.0.1', port=int(sys.argv[1]), debug=False, use_reloader=False, threaded=True)
+"""
+
+
+def _symbol(i, symbols):
+    return symbols[i % len(symbols)]
+
+
+def _period(i, symbols):
+    return PERIODS[i // len(symbols) % len(PERIODS)]
+
+
+# name -> request i -> (method, path, JSON body)
+SCENARIOS = {
+    'stock_data': lambda i, symbols: ('POST', '/get_stock_data', {
+        'symbol': _symbol(i, symbols), 'period': _period(i, symbols),
+        'indicators': [{'name': 'sma', 'window': 20}],
+    }),
+    'close_volume': lambda i, symbols: ('POST', '/get_close_volume_data', {
+        'symbol': _symbol(i, symbols), 'period': _period(i, symbols),
+    }),
+    'top_companies': lambda i, symbols: ('GET', '/api/top_companies', None),
+    'news': lambda i, symbols: ('POST', '/get_news', {'tickers': _symbol(i, symbols), 'limit': 50}),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    started = time.time()
+    while time.time() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'{url} did not answer in time')
+
+
+def stub_stats(stub_url):
+    with urllib.request.urlopen(stub_url + '/stats', timeout=5) as response:
+        return json.load(response)
+
+
+def start_stack(args, workdir):
+    """Start the stub and the app; returns (app url, stub url, processes)"""
+    stub_port, app_port = free_port(), free_port()
+    stub_command = [sys.executable, os.path.join(HERE, 'av_stub.py'), '--port', str(stub_port),
+                    '--latency', str(args.latency), '--jitter', str(args.jitter),
+                    '--throttle-kind', args.throttle_kind]
+    if args.recordings:
+        stub_command += ['--recordings', os.path.abspath(args.recordings)]
+    if args.throttle_per_minute:
+        stub_command += ['--throttle-per-minute', str(args.throttle_per_minute)]
+    if args.throttle_every:
+        stub_command += ['--throttle-every', str(args.throttle_every)]
+
+    # The example config with every path moved to the scratch directory and no local rate limit
+    with open(os.path.join(ROOT, 'config.example.json'), 'r') as f:
+        config = json.load(f)
+    config.update({
+        'alpha_vantage_api_key': 'bench',
+        'alpha_vantage_base_url': f'http://127.0.0.1:{stub_port}/query',
+        'price_store_dir': os.path.join(workdir, 'prices'),
+        'news_db': os.path.join(workdir, 'news.db'),
+        'rate_limit': {'per_minute': None, 'per_day': None, 'path': os.path.join(workdir, 'rate_limit.db')},
+    })
+    config['cache'] = {**config.get('cache', {}), 'path': os.path.join(workdir, 'response_cache.db'),
+                       'backend': 'sqlite' if args.server == 'gunicorn' else 'memory'}
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+
+    env = {**os.environ, 'PYTHONPATH': ROOT, 'CONFIG_PATH': config_path}
+    if args.server == 'gunicorn':
+        env.update({'GUNICORN_BIND': f'127.0.0.1:{app_port}', 'WEB_CONCURRENCY': str(args.workers)})
+        app_command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'app:create_app()']
+    else:
+        app_command = [sys.executable, '-c', SERVER, str(app_port)]
+
+    processes = []
+    try:
+        for command in (stub_command, app_command):
+            processes.append(subprocess.Popen(command, cwd=workdir, env=env,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        stub_url, app_url = f'http://127.0.0.1:{stub_port}', f'http://127.0.0.1:{app_port}'
+        wait_until_up(stub_url + '/stats')
+        wait_until_up(app_url + '/')
+    except Exception:
+        stop(processes)
+        raise
+    return app_url, stub_url, processes
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def check(response):
+    """None for a good response, else a short description of the failure"""
+    if response.status_code >= 400:
+        return f'HTTP {response.status_code}'
+    body = response.json()
+    if isinstance(body, dict) and body.get('success') is False:
+        return str(body.get('error', 'success: false'))[:60]
+    return None
+
+
+def run(base_url, scenario, symbols, concurrency, duration, count, first=0):
+    """
+    Send requests first, first+1, ... of scenario from concurrency threads
+    until count were sent or duration seconds passed.
+    Returns (latencies in seconds, Counter of errors, elapsed seconds).
+    """
+    indexes = itertools.count(first)
+    latencies, errors = [], Counter()
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def client():
+        session = requests.Session()
+        for i in indexes:
+            if i >= first + count or time.perf_counter() >= deadline:
+                return
+            method, path, body = SCENARIOS[scenario](i, symbols)
+            sent = time.perf_counter()
+            try:
+                error = check(session.request(method, base_url + path, json=body, timeout=120))
+            except (requests.RequestException, ValueError) as e:
+                error = type(e).__name__
+            latency = time.perf_counter() - sent
+            with lock:
+                latencies.append(latency)
+                if error:
+                    errors[error] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, errors, elapsed, upstream):
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        'requests': len(ordered),
+        'errors': sum(errors.values()),
+        'error_kinds': dict(errors.most_common(3)),
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)) if ordered else None,
+        'p95_ms': ms(percentile(ordered, 95)) if ordered else None,
+        'p99_ms': ms(percentile(ordered, 99)) if ordered else None,
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        'upstream_calls': upstream['requests'] if upstream else None,
+        'upstream_throttled': upstream['throttled'] if upstream else None,
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _change(new, old):
+    if not new or not old:
+        return ''
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def print_report(results, baseline=None):
+    print(f"{'scenario':<14} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'upstream':>8} {'throttled':>9}")
+    for name, r in results['scenarios'].items():
+        print(f"{name:<14} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8} {r['p50_ms'] or '-':>8} "
+              f"{r['p95_ms'] or '-':>8} {r['p99_ms'] or '-':>8} {r['max_ms'] or '-':>8} "
+              f"{'-' if r['upstream_calls'] is None else r['upstream_calls']:>8} "
+              f"{'-' if r['upstream_throttled'] is None else r['upstream_throttled']:>9}")
+        for error, times in r['error_kinds'].items():
+            print(f"    {times} x {error}")
+        old = (baseline or {}).get('scenarios', {}).get(name)
+        if old:
+            print(f"{'  vs ' + str(baseline.get('commit')):<14} {'':>8} {'':>6} {_change(r['rps'], old['rps']):>8} "
+                  + ' '.join(f"{_change(r[key], old[key]):>8}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web app load test against the offline stub')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario to run (repeat for several; default all)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('--requests', type=int, default=10 ** 9, help='Stop a scenario after this many requests')
+    parser.add_argument('--warmup', type=int, help='Unmeasured requests first (default: two per symbol and period)')
+    parser.add_argument('--symbols', type=int, default=len(SYMBOLS), help='How many distinct symbols to request')
+    parser.add_argument('--url', help='Test an app already running there instead of starting one')
+    parser.add_argument('--server', choices=['flask', 'gunicorn'], default='flask')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    symbols = SYMBOLS[:max(1, min(args.symbols, len(SYMBOLS)))]
+    warmup = 2 * len(symbols) * len(PERIODS) if args.warmup is None else args.warmup
+    commit, dirty = git_revision()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {},
+    }
+
+    processes = []
+    stub_url = None
+    app_url = args.url.rstrip('/') if args.url else None
+    with tempfile.TemporaryDirectory(prefix='bench_load_') as workdir:
+        try:
+            if app_url is None:
+                app_url, stub_url, processes = start_stack(args, workdir)
+            for name in args.scenario or list(SCENARIOS):
+                run(app_url, name, symbols, args.concurrency, float('inf'), warmup)
+                before = stub_stats(stub_url) if stub_url else None
+                latencies, errors, elapsed = run(app_url, name, symbols, args.concurrency,
+                                                 args.duration, args.requests, first=warmup)
+                upstream = None
+                if stub_url:
+                    after = stub_stats(stub_url)
+                    upstream = {key: after[key] - before[key] for key in ('requests', 'throttled')}
+                results['scenarios'][name] = summarize(latencies, errors, elapsed, upstream)
+        finally:
+            stop(processes)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
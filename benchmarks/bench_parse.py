@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: OHLC parsing of a full 20-year TIME_SERIES_DAILY payload.
+
+Compares the old DataFrame.from_dict path used by get_stock_data with
+timeseries.parse_time_series.
+
+    python benchmarks/bench_parse.py [--years 20] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from timeseries import parse_time_series
+
+
+def make_payload(years):
+    """Synthetic daily series shaped like Alpha Vantage output (newest first)"""
+    series = {}
+    day = date.today()
+    price = 100.0
+    for i in range(int(years * 252)):
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        price *= 1.0003 if i % 3 else 0.9995
+        series[day.isoformat()] = {
+            '1. open': f'{price:.4f}',
+            '2. high': f'{price * 1.01:.4f}',
+            '3. low': f'{price * 0.99:.4f}',
+            '4. close': f'{price * 1.002:.4f}',
+            '5. volume': str(1000000 + i),
+        }
+        day -= timedelta(days=1)
+    return series
+
+
+def parse_with_dataframe(time_series):
+    """The path get_stock_data used before timeseries.py"""
+    df = pd.DataFrame.from_dict(time_series, orient='index')
+    df.index = pd.to_datetime(df.index)
+    df = df.sort_index()
+    df.columns = [col.split('. ')[1] for col in df.columns]
+    return (df['open'].astype(float), df['high'].astype(float),
+            df['low'].astype(float), df['close'].astype(float))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OHLC parsing micro-benchmark')
+    parser.add_argument('--years', type=float, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    payload = make_payload(args.years)
+    print(f"Payload: {len(payload)} daily bars")
+
+    old = min(timeit.repeat(lambda: parse_with_dataframe(payload), number=1, repeat=args.repeat))
+    new = min(timeit.repeat(lambda: parse_time_series(payload), number=1, repeat=args.repeat))
+    print(f"DataFrame.from_dict path: {old * 1000:8.2f} ms")
+    print(f"parse_time_series:        {new * 1000:8.2f} ms")
+    print(f"Speedup:                  {old / new:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
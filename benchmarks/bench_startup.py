@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark: import time of app.py and start-to-first-response.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and
+reports the total and the slowest top-level imports, then starts the app
+in a subprocess (create_app().run) and times how long it takes until GET /
+answers. Every measurement is a new process, so nothing is warm except the
+OS file cache.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--top 10] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Processes run in a scratch directory so the databases they create stay out of the tree
+WORKDIR = tempfile.mkdtemp(prefix='bench_startup_')
+ENV = {**os.environ, 'PYTHONPATH': ROOT, 'CONFIG_PATH': os.path.join(ROOT, 'config.json')}
+
+SERVER = """
+import sys
+from app import create_app
+create_app().run(host='127.0.0.1', port=int(sys.argv[1]), debug=False, use_reloader=False)
+"""
+
+
+def import_times():
+    """(total microseconds, {module imported by app: cumulative microseconds}) for `import app`"""
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=WORKDIR, env=ENV, capture_output=True, text=True, check=True
+    ).stderr
+    # Children are printed before their parent, indented two more spaces
+    children = {}
+    for line in out.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 3:
+            children[name] = cumulative
+        elif depth == 1:
+            if name == 'app':
+                return cumulative, children
+            children = {}
+    raise RuntimeError('app was not imported')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def first_response(timeout=60):
+    """Seconds from spawning the server process to the first 200 on GET /"""
+    port = free_port()
+    started = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', SERVER, str(port)],
+        cwd=WORKDIR, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.time() - started < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.time() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError('the app did not answer in time')
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='App cold-start benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+    parser.add_argument('--json', action='store_true', help='Print one JSON object (to compare commits)')
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeat)]
+    totals = [total / 1e6 for total, _ in runs]
+    slowest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    responses = [first_response() for _ in range(args.repeat)]
+
+    result = {
+        'import_seconds_median': round(statistics.median(totals), 4),
+        'first_response_seconds_median': round(statistics.median(responses), 4),
+        'first_response_seconds_min': round(min(responses), 4),
+        'slowest_imports': {name: round(us / 1e6, 4) for name, us in slowest},
+    }
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"import app (median of {args.repeat}):      {result['import_seconds_median'] * 1000:8.1f} ms")
+    print(f"start to first response (median): {result['first_response_seconds_median'] * 1000:8.1f} ms")
+    print("Slowest top-level imports:")
+    for name, seconds in result['slowest_imports'].items():
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
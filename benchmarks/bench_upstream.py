@@ -0,0 +1,42 @@
+"""
+Load test of the shared upstream client against the offline stub.
+
+Starts benchmarks/av_stub.py in-process with the given latency, then sends
+--requests GLOBAL_QUOTE calls through upstream.run_concurrently (one
+keep-alive session, --concurrency threads and pooled connections) and
+reports the throughput.
+
+    python benchmarks/bench_upstream.py [--requests 500] [--concurrency 32] [--latency 0.2]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upstream
+from av_stub import start_in_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upstream client load test')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32, help='Calling threads and pool size')
+    parser.add_argument('--latency', type=float, default=0.2, help='Stub latency in seconds')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    start_in_thread(args.port, latency=args.latency, jitter=0)
+    upstream.configure(max_concurrency=args.concurrency, base_url=f'http://127.0.0.1:{args.port}/query')
+    jobs = {i: {'params': {'function': 'GLOBAL_QUOTE', 'symbol': f'S{i % 50}'}} for i in range(args.requests)}
+
+    started = time.perf_counter()
+    results, errors = upstream.run_concurrently(upstream.fetch_json, jobs)
+    elapsed = time.perf_counter() - started
+    print(f"{len(results)} ok, {len(errors)} errors in {elapsed:.2f}s from {args.concurrency} threads "
+          f"({len(results) / elapsed:.0f} req/s, about {len(results) / elapsed * args.latency:.0f} in flight on average)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Record real Alpha Vantage answers for av_stub.py --recordings to replay.
+
+Calls TIME_SERIES_DAILY (full), TIME_SERIES_INTRADAY (5min, full),
+OVERVIEW, GLOBAL_QUOTE, SMA and NEWS_SENTIMENT once for --symbol with the
+key in config.json and saves each answer as <FUNCTION>_<SYMBOL>.json. The
+API key is not written to the files. Throttled or failed calls are reported
+and not saved, so a partial run can be repeated later.
+
+    python benchmarks/record_payloads.py [--symbol IBM] [--out benchmarks/payloads] [--pause 15]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upstream
+from av_responses import OK, classify, message
+from services import load_config
+
+CALLS = [
+    {'function': 'TIME_SERIES_DAILY', 'outputsize': 'full'},
+    {'function': 'TIME_SERIES_INTRADAY', 'interval': '5min', 'outputsize': 'full'},
+    {'function': 'OVERVIEW'},
+    {'function': 'GLOBAL_QUOTE'},
+    {'function': 'SMA', 'interval': 'daily', 'time_period': 20, 'series_type': 'close'},
+    {'function': 'NEWS_SENTIMENT', 'sort': 'LATEST', 'limit': 200},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record Alpha Vantage payloads for the offline stub')
+    parser.add_argument('--symbol', default='IBM')
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads'))
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--pause', type=float, default=15, help='Seconds between calls (free keys allow 5 per minute)')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    upstream.configure(request_timeout=config.get('request_timeout'), base_url=config.get('alpha_vantage_base_url'))
+    os.makedirs(args.out, exist_ok=True)
+
+    for i, call in enumerate(CALLS):
+        if i:
+            time.sleep(args.pause)
+        params = dict(call)
+        if params['function'] == 'NEWS_SENTIMENT':
+            params['tickers'] = args.symbol
+        else:
+            params['symbol'] = args.symbol
+        payload = upstream.fetch_json({**params, 'apikey': config['alpha_vantage_api_key']})
+        kind = classify(payload)
+        if kind != OK:
+            print(f"{params['function']}: not saved ({kind}: {message(payload)[:80]})")
+            continue
+        path = os.path.join(args.out, f"{params['function']}_{args.symbol}.json")
+        with open(path, 'w') as f:
+            json.dump({'params': params, 'payload': payload}, f)
+        print(f"{params['function']}: {os.path.getsize(path) / 1024:.0f} KB -> {path}")
+
+
+if __name__ == '__main__':
+    main()
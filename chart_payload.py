@@ -0,0 +1,40 @@
+"""Compact chart payload: plain arrays the front end turns into Plotly traces."""
+import numpy as np
+
+# Alpha Vantage quotes prices with 4 decimals; more digits only add bytes
+DECIMALS = 4
+
+
+def epoch_ms(dates):
+    """datetime64 array -> int64 milliseconds, which Plotly date axes accept as-is"""
+    return np.asarray(dates).astype('datetime64[ms]').astype(np.int64)
+
+
+def _prices(values):
+    return np.round(np.asarray(values, dtype=np.float64), DECIMALS)
+
+
+def build_chart_payload(symbol, candles, lines):
+    """
+    candles is (dates, open, high, low, close, volume); lines are the
+    indicator dicts produced by indicators.compute with 'x' added.
+    The layout is static and served separately (static/chart_layout.json).
+    """
+    dates, open_, high, low, close, _ = candles
+    return {
+        'symbol': symbol,
+        'x': epoch_ms(dates),
+        'open': _prices(open_),
+        'high': _prices(high),
+        'low': _prices(low),
+        'close': _prices(close),
+        'indicators': [
+            {
+                'name': line['name'],
+                'pane': line['pane'],
+                'x': epoch_ms(line['x']),
+                'y': _prices(line['values']),
+            }
+            for line in lines
+        ],
+    }
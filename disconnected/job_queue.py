@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Shared modules (news_db) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from news_db import url_id
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Persistent orchestrator work queue: one job per (day, ticker group, topic)"""
+
+    def __init__(self, path='orchestrator_queue.db'):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                period TEXT NOT NULL,
+                time_from TEXT NOT NULL,
+                time_to TEXT NOT NULL,
+                tickers TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                articles INTEGER,
+                error TEXT,
+                updated_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, next_attempt_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def reset(self):
+        """Drop every job (a fresh, non-resumed run)"""
+        self._conn().execute("DELETE FROM jobs")
+
+    def enqueue(self, jobs):
+        """jobs: iterable of dicts with period, time_from, time_to, tickers, topic"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN')
+        conn.executemany(
+            "INSERT INTO jobs (period, time_from, time_to, tickers, topic, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(j['period'], j['time_from'], j['time_to'], json.dumps(j['tickers']), j['topic'], now) for j in jobs]
+        )
+        conn.execute('COMMIT')
+
+    def recover(self):
+        """Jobs left 'running' by a crashed run go back to pending; returns how many"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?", (PENDING, time.time(), RUNNING)
+        )
+        return cur.rowcount
+
+    def claim(self):
+        """
+        Atomically take the next due pending job and mark it running.
+
+        Returns the job dict, the number of seconds until the next pending
+        job becomes due (float) when none is due yet, or None when nothing
+        is left to do.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE state = ? AND next_attempt_at <= ? ORDER BY id LIMIT 1", (PENDING, now)
+            ).fetchone()
+            if row is None:
+                next_due = conn.execute(
+                    "SELECT MIN(next_attempt_at) FROM jobs WHERE state = ?", (PENDING,)
+                ).fetchone()[0]
+                conn.execute('COMMIT')
+                return None if next_due is None else max(0.0, next_due - now)
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        job = dict(row)
+        job['tickers'] = json.loads(job['tickers'])
+        job['attempts'] += 1
+        return job
+
+    def complete(self, job_id, articles):
+        self._conn().execute(
+            "UPDATE jobs SET state = ?, articles = ?, error = NULL, updated_at = ? WHERE id = ?",
+            (DONE, articles, time.time(), job_id)
+        )
+
+    def retry_later(self, job_id, delay, error):
+        self._conn().execute(
+            "UPDATE jobs SET state = ?, next_attempt_at = ?, error = ?, updated_at = ? WHERE id = ?",
+            (PENDING, time.time() + delay, error, time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        self._conn().execute(
+            "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+            (FAILED, error, time.time(), job_id)
+        )
+
+    def counts(self):
+        rows = self._conn().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+
+NEW = 'new'
+NEW_TOPIC = 'new_topic'
+DUPLICATE = 'duplicate'
+
+
+class SeenArticles:
+    """
+    Articles already written during this orchestrator run, keyed by URL
+    hash, with the topics each was written under. Lives next to the jobs
+    table so a resumed run keeps deduplicating.
+
+    reserve() is called per feed item by the worker thread running a job;
+    the reservations become permanent with commit() once the job's output
+    is written, or are dropped with rollback() if the job fails. A job only
+    gets NEW_TOPIC (and writes a topic_only record) once the full record of
+    the article is committed: while another job still holds the first
+    reservation it gets NEW and writes the full record too, so a rollback of
+    that job cannot leave topic_only records without their article.
+    """
+
+    def __init__(self, path='orchestrator_queue.db'):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_articles (
+                article_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                PRIMARY KEY (article_id, topic)
+            ) WITHOUT ROWID
+        """)
+        # Committed: every article here has its full record written
+        self._seen = {}
+        for article_id, topic in conn.execute("SELECT article_id, topic FROM seen_articles"):
+            self._seen.setdefault(article_id, set()).add(topic)
+        # Reserved by a job that has not committed or rolled back yet
+        self._claimed = {}
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _pending(self):
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = []
+        return pending
+
+    def __len__(self):
+        return len(self._seen)
+
+    def reset(self):
+        """Forget every article (a fresh, non-resumed run)"""
+        with self._lock:
+            self._seen.clear()
+            self._claimed.clear()
+        self._conn().execute("DELETE FROM seen_articles")
+
+    def reserve(self, url, topic):
+        """
+        DUPLICATE if (url, topic) is committed or reserved by a running job,
+        NEW_TOPIC if the article's full record is committed, else NEW
+        """
+        article_id = url_id(url)
+        with self._lock:
+            committed = self._seen.get(article_id)
+            if committed is not None and topic in committed:
+                return DUPLICATE
+            claimed = self._claimed.setdefault(article_id, set())
+            if topic in claimed:
+                # The job holding it writes it, or frees it again on rollback
+                return DUPLICATE
+            claimed.add(topic)
+        self._pending().append((article_id, topic))
+        return NEW if committed is None else NEW_TOPIC
+
+    def _release(self, pending, keep):
+        with self._lock:
+            for article_id, topic in pending:
+                claimed = self._claimed.get(article_id)
+                if claimed is not None:
+                    claimed.discard(topic)
+                    if not claimed:
+                        del self._claimed[article_id]
+                if keep:
+                    self._seen.setdefault(article_id, set()).add(topic)
+        pending.clear()
+
+    def commit(self):
+        pending = self._pending()
+        if pending:
+            conn = self._conn()
+            conn.execute('BEGIN')
+            conn.executemany("INSERT OR IGNORE INTO seen_articles (article_id, topic) VALUES (?, ?)", pending)
+            conn.execute('COMMIT')
+            self._release(pending, keep=True)
+
+    def rollback(self):
+        self._release(self._pending(), keep=False)
@@ -1,18 +1,23 @@
 import requests
 import json
 import os
+import sys
+import time
 from datetime import datetime, timedelta
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,  # DEBUG level for detailed logs
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Shared modules (rate limiter, response classifier) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from av_responses import (classify, message, OK, EMPTY, THROTTLED, INVALID_KEY,
+                          UpstreamError, ThrottledError, InvalidApiKeyError)
+from rate_limiter import AdaptiveBackoff
+import upstream
+from job_queue import NEW, NEW_TOPIC, DUPLICATE
+import run_log
+
 logger = logging.getLogger(__name__)
 
 def validate_api_key(api_key):
-    base_url = "https://www.alphavantage.co/query"
     params = {
         'function': 'NEWS_SENTIMENT',
         'topics': 'technology',
@@ -23,10 +28,10 @@ def validate_api_key(api_key):
         'apikey': api_key
     }
     try:
-        response = requests.get(base_url, params=params)
-        data = response.json()
-        if 'Information' in data or 'Error Message' in data:
-            logger.error(f"API Key Error: {data.get('Information') or data.get('Error Message')}")
+        data = upstream.fetch_json(params)
+        kind = classify(data, 'feed')
+        if kind not in (OK, EMPTY):
+            logger.error(f"API Key Error ({kind}): {message(data)}")
             return False
         return True
     except Exception as e:
@@ -46,8 +51,50 @@ def load_config(config_path='config.json'):
         logger.error(f"Invalid JSON in configuration file {config_path}")
         raise
 
-def get_news_sentiment(api_key, tickers=None, topics=None, time_from=None, time_to=None, apply_ticker_filter=True):
-    base_url = "https://www.alphavantage.co/query"
+def fetch_news_page(params, rate_limiter=None, backoff=None, max_throttle_retries=3):
+    """
+    One NEWS_SENTIMENT call. Throttled answers are retried after the adaptive
+    backoff delay; returns (kind, data) for ok, empty and error responses.
+    """
+    if backoff is None:
+        backoff = AdaptiveBackoff()
+    for attempt in range(max_throttle_retries + 1):
+        backoff.wait()
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            # Shared pool with timeouts and retries (upstream)
+            data = upstream.fetch_json(params)
+        except UpstreamError:
+            raise
+        except (requests.RequestException, ValueError) as e:
+            raise UpstreamError(str(e))
+        kind = classify(data, 'feed')
+        backoff.record(kind)
+        if kind != THROTTLED:
+            break
+        logger.warning(f"Throttled by Alpha Vantage (attempt {attempt + 1}), backing off {backoff.delay:.1f}s")
+    if kind == THROTTLED:
+        raise ThrottledError(message(data))
+    if kind == INVALID_KEY:
+        raise InvalidApiKeyError(message(data))
+    return kind, data
+
+def get_news_sentiment(api_key, tickers=None, topics=None, time_from=None, time_to=None, apply_ticker_filter=True,
+                       rate_limiter=None, backoff=None, seen=None):
+    """
+    Fetch and flatten news for every topic. Empty windows return no articles
+    without retrying; throttling that outlasts the backoff, an invalid key or
+    a network failure raise an av_responses.UpstreamError.
+
+    An article returned for several topics is flattened once, with all of
+    them in 'topics'. With seen (a job_queue.SeenArticles), articles already
+    written earlier in the run are skipped before flattening; one seen only
+    under other topics comes back as a topic_only record.
+
+    Each call emits one 'news_call' metrics record (see run_log) with its
+    counters and timings; nothing is logged per article.
+    """
     if topics is None:
         topics = ['earnings']
     if time_from is None:
@@ -55,12 +102,13 @@ def get_news_sentiment(api_key, tickers=None, topics=None, time_from=None, time_
     if time_to is None:
         time_to = datetime.now().strftime('%Y%m%dT2359')
 
-    logger.debug(f"Making API call with parameters:")
-    logger.debug(f"Tickers: {tickers}")
-    logger.debug(f"Topics: {topics}")
-    logger.debug(f"Time range: {time_from} to {time_to}")
+    logger.debug(f"Fetching news for tickers {tickers}, topics {topics}, {time_from} to {time_to}")
 
     all_news = []
+    by_url = {}
+    started = time.perf_counter()
+    fetch_seconds = 0.0
+    counts = {'calls': 0, 'empty': 0, 'items': 0, 'merged': 0, 'duplicates': 0, 'topic_only': 0}
 
     for topic in topics:
         params = {
@@ -74,51 +122,84 @@ def get_news_sentiment(api_key, tickers=None, topics=None, time_from=None, time_
         }
         if apply_ticker_filter and tickers:
             params['tickers'] = ','.join(tickers)
-        else:
-            logger.debug("Skipping 'tickers' filter to broaden results")
-
-        try:
-            logger.info(f"Fetching news for topic: {topic}")
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            if 'feed' in data:
-                logger.info(f"Retrieved {len(data['feed'])} articles for topic {topic}")
-                for item in data['feed']:
-                    news_item = {
-                        'title': item.get('title', ''),
-                        'url': item.get('url', ''),
-                        'source': item.get('source', 'Unknown'),
-                        'time_published': item.get('time_published', ''),
-                        'summary': item.get('summary', ''),
-                        'stocks_mentioned': [ticker['ticker'] for ticker in item.get('ticker_sentiment', [])],
-                        'sentiment_scores': {
-                            'overall': float(item.get('overall_sentiment_score', 0)),
-                            'relevance': float(item.get('relevance_score', 0))
-                        },
-                        'sentiment': item.get('overall_sentiment_label', 'neutral'),
-                        'topic': topic,
-                        'ticker_sentiments': [
-                            {
-                                'ticker': ticker['ticker'],
-                                'relevance_score': float(ticker['relevance_score']),
-                                'sentiment_score': float(ticker['ticker_sentiment_score']),
-                                'sentiment': ticker['ticker_sentiment_label']
-                            } for ticker in item.get('ticker_sentiment', [])
-                        ]
-                    }
-                    print(news_item)
-                    all_news.append(news_item)
-            else:
-                logger.warning(f"No 'feed' data found in response for topic {topic}")
-        except Exception as e:
-            logger.error(f"Error fetching news for topic {topic}: {str(e)}")
 
+        # Every topic is a separate API call, so each one takes a token
+        fetch_started = time.perf_counter()
+        kind, data = fetch_news_page(params, rate_limiter=rate_limiter, backoff=backoff)
+        fetch_seconds += time.perf_counter() - fetch_started
+        counts['calls'] += 1
+        if kind == EMPTY:
+            counts['empty'] += 1
+            continue
+        if kind != OK:
+            logger.warning(f"No 'feed' data found in response for topic {topic}: {message(data)}")
+            continue
+        counts['items'] += len(data['feed'])
+        for item in data['feed']:
+            url = item.get('url', '')
+            known = by_url.get(url)
+            if known is not None:
+                counts['merged'] += 1
+                if topic not in known['topics'] and (seen is None or seen.reserve(url, topic) != DUPLICATE):
+                    known['topics'].append(topic)
+                continue
+            status = seen.reserve(url, topic) if seen is not None and url else NEW
+            if status == DUPLICATE:
+                counts['duplicates'] += 1
+                continue
+            if status == NEW_TOPIC:
+                counts['topic_only'] += 1
+                news_item = {
+                    'url': url,
+                    'time_published': item.get('time_published', ''),
+                    'topic': topic,
+                    'topics': [topic],
+                    'topic_only': True
+                }
+                by_url[url] = news_item
+                all_news.append(news_item)
+                continue
+            news_item = {
+                'title': item.get('title', ''),
+                'url': item.get('url', ''),
+                'source': item.get('source', 'Unknown'),
+                'time_published': item.get('time_published', ''),
+                'summary': item.get('summary', ''),
+                'stocks_mentioned': [ticker['ticker'] for ticker in item.get('ticker_sentiment', [])],
+                'sentiment_scores': {
+                    'overall': float(item.get('overall_sentiment_score', 0)),
+                    'relevance': float(item.get('relevance_score', 0))
+                },
+                'sentiment': item.get('overall_sentiment_label', 'neutral'),
+                'topic': topic,
+                'topics': [topic],
+                'ticker_sentiments': [
+                    {
+                        'ticker': ticker['ticker'],
+                        'relevance_score': float(ticker['relevance_score']),
+                        'sentiment_score': float(ticker['ticker_sentiment_score']),
+                        'sentiment': ticker['ticker_sentiment_label']
+                    } for ticker in item.get('ticker_sentiment', [])
+                ]
+            }
+            by_url[url] = news_item
+            all_news.append(news_item)
+
+    run_log.emit(
+        'news_call', time_from=time_from, topics=topics, tickers=len(tickers or ()),
+        articles=len(all_news), seconds=round(time.perf_counter() - started, 4),
+        fetch_seconds=round(fetch_seconds, 4), **counts
+    )
     return all_news
 
 def main():
+    run_log.configure(level='INFO')
     try:
         config = load_config()
+        upstream.configure(
+            request_timeout=config.get('request_timeout'),
+            base_url=config.get('alpha_vantage_base_url')
+        )
         api_key = config.get('api_key')
         if not api_key or api_key == 'YOUR_API_KEY':
             logger.error("Please set a valid API key in config.json")
@@ -1,24 +1,26 @@
 import os
+import sys
 import json
 import time
 import argparse
 import logging
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from news_analyzer import get_news_sentiment, load_config
+from job_queue import JobQueue, SeenArticles
+from raw_output import RawWriter, EXTENSIONS, seal_partitions
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='orchestrator.log'
-)
+# Shared modules (rate limiter) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import RateLimiter, AdaptiveBackoff, stored_quotas, DEFAULT_PATH as RATE_LIMIT_DB
+from av_responses import UpstreamError, ThrottledError, InvalidApiKeyError
+import upstream
+import run_log
+
+# Handlers are set up by the entry point (run_log.configure), not at import
 logger = logging.getLogger(__name__)
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console.setFormatter(formatter)
-logger.addHandler(console)
 
 def load_sp500_tickers(file_path="sp500_tickers.txt"):
     """Load S&P 500 tickers from a file"""
@@ -84,33 +86,52 @@ def create_random_ticker_groups(tickers, group_size=5, randomize=True):
         # Original sequential grouping
         return [tickers[i:i + group_size] for i in range(0, len(tickers), group_size)]
 
-def analyze_for_period_and_tickers(api_key, time_range, tickers, topics, output_dir, apply_ticker_filter=False):
-    """Run analysis for a specific time period and ticker group"""
+def analyze_for_period_and_tickers(api_key, time_range, tickers, topics, output_dir, apply_ticker_filter=False,
+                                   rate_limiter=None, backoff=None, writer=None, seen=None):
+    """
+    Run analysis for a specific time period and ticker group. With a
+    raw_output.RawWriter the articles are appended to its monthly NDJSON
+    file, otherwise they go to one JSON file per call. Articles reserved in
+    seen are committed once written and released if the call fails; every
+    failure is re-raised so the job is retried instead of marked done.
+    """
     try:
-        # Create specific output directory for this analysis
         period_label = time_range.get('label', 'unknown')
         
-        # Use all tickers in the folder name
-        ticker_label = '_'.join(tickers)
-        specific_dir = os.path.join(output_dir, f"{period_label}_{ticker_label}")
-        
-        if not os.path.exists(specific_dir):
-            os.makedirs(specific_dir)
-            logger.info(f"Created output directory: {specific_dir}")
+        if writer is None:
+            # Use all tickers in the folder name
+            ticker_label = '_'.join(tickers)
+            specific_dir = os.path.join(output_dir, f"{period_label}_{ticker_label}")
+            
+            if not os.path.exists(specific_dir):
+                # exist_ok: another worker may create it for a different topic
+                os.makedirs(specific_dir, exist_ok=True)
+                logger.debug(f"Created output directory: {specific_dir}")
         
         # Get news data
-        logger.info(f"Analyzing news for period {period_label} and tickers {tickers}")
+        logger.debug(f"Analyzing news for period {period_label} and tickers {tickers}")
         news_data = get_news_sentiment(
             api_key=api_key,
             tickers=tickers,
             topics=topics,
             time_from=time_range.get('from'),
             time_to=time_range.get('to'),
-            apply_ticker_filter=apply_ticker_filter
+            apply_ticker_filter=apply_ticker_filter,
+            rate_limiter=rate_limiter,
+            backoff=backoff,
+            seen=seen
         )
         
+        if writer is not None:
+            filename = writer.append(period_label, news_data, topic=topics[0] if len(topics) == 1 else None)
+            logger.debug(f"Appended {len(news_data)} articles to {filename}")
+            if seen is not None:
+                seen.commit()
+            return len(news_data)
+        
         # Save to JSON
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Microseconds keep concurrent jobs for the same group from colliding
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = os.path.join(specific_dir, f'news_analysis_{timestamp}.json')
         
         with open(filename, 'w') as f:
@@ -123,120 +144,236 @@ def analyze_for_period_and_tickers(api_key, time_range, tickers, topics, output_
                 'status': 'ok' if news_data else 'no_data'
             }, f, indent=4)
         
-        logger.info(f"Saved {len(news_data)} articles to {filename}")
+        logger.debug(f"Saved {len(news_data)} articles to {filename}")
+        if seen is not None:
+            seen.commit()
         return len(news_data)
     
+    except UpstreamError:
+        # Throttling and key problems are handled by the caller
+        if seen is not None:
+            seen.rollback()
+        raise
     except Exception as e:
+        # Write errors and bad payloads too: process_job retries or fails the job
+        if seen is not None:
+            seen.rollback()
         logger.error(f"Error analyzing for period {time_range.get('label')} and tickers {tickers}: {str(e)}")
-        return 0
+        raise
+
+def resolve_date_ranges(config, start_date=None, end_date=None):
+    """Daily ranges from the CLI dates or the config time_range; None if invalid"""
+    if start_date and end_date:
+        # Parse custom date range with daily precision
+        try:
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+            start_year = start_dt.year
+            start_month = start_dt.month
+            end_year = end_dt.year
+            end_month = end_dt.month
+        except ValueError:
+            logger.error("Invalid date format. Please use YYYY-MM-DD format")
+            return None
+    else:
+        # Use config file date range
+        time_range = config.get('time_range', {})
+        start_date_str = time_range.get('from', '')
+        end_date_str = time_range.get('to', '')
+        
+        if not (start_date_str and end_date_str):
+            logger.error("Date range not specified in config file")
+            return None
+        
+        # Parse dates from config (format: YYYYMMDDTHHMM)
+        start_year = int(start_date_str[:4])
+        start_month = int(start_date_str[4:6])
+        end_year = int(end_date_str[:4])
+        end_month = int(end_date_str[4:6])
+    
+    date_ranges = generate_monthly_ranges(start_year, start_month, end_year, end_month)
+    logger.info(f"Generated {len(date_ranges)} date ranges from {start_year}-{start_month} to {end_year}-{end_month}")
+    return date_ranges
+
+def build_jobs(date_ranges, all_tickers, topics, ticker_group_size=10, randomize_tickers=True):
+    """One job per (day, ticker group, topic); groups are drawn once and stored with the job"""
+    jobs = []
+    for date_range in date_ranges:
+        # For each date range, create a new random grouping of tickers
+        ticker_groups = create_random_ticker_groups(all_tickers, ticker_group_size, randomize_tickers)
+        for ticker_group in ticker_groups:
+            for topic in topics:
+                jobs.append({
+                    'period': date_range['label'],
+                    'time_from': date_range['from'],
+                    'time_to': date_range['to'],
+                    'tickers': ticker_group,
+                    'topic': topic
+                })
+    return jobs
+
+def process_job(queue, job, api_key, output_dir, apply_ticker_filter, rate_limiter, backoff,
+                max_attempts=3, base_backoff=15, max_backoff=900, writer=None, seen=None,
+                totals=None):
+    """
+    Run one queued job and record its outcome. Empty windows are done on the
+    first try; throttled jobs wait for the adaptive backoff, other failures
+    are retried with exponential backoff. An invalid API key is re-raised.
+    Every attempt emits a 'job' metrics record and is added to totals.
+    """
+    time_range = {'from': job['time_from'], 'to': job['time_to'], 'label': job['period']}
+    delay = None
+    started = time.perf_counter()
+    try:
+        articles = analyze_for_period_and_tickers(
+            api_key, time_range, job['tickers'], [job['topic']], output_dir, apply_ticker_filter,
+            rate_limiter=rate_limiter, backoff=backoff, writer=writer, seen=seen
+        )
+        queue.complete(job['id'], articles)
+        if totals is not None:
+            totals.add(jobs_done=1, articles=articles)
+        run_log.emit('job', id=job['id'], period=job['period'], topic=job['topic'], attempt=job['attempts'],
+                     outcome='done', articles=articles, seconds=round(time.perf_counter() - started, 4))
+        return articles
+    except InvalidApiKeyError as e:
+        # Not this job's fault: put it back for the next run and stop
+        queue.retry_later(job['id'], 0, str(e))
+        raise
+    except ThrottledError as e:
+        error = f"throttled: {e}"
+        delay = max(backoff.delay, base_backoff)
+    except Exception as e:
+        error = str(e)
+
+    run_log.emit('job', id=job['id'], period=job['period'], topic=job['topic'], attempt=job['attempts'],
+                 outcome='error', error=error, seconds=round(time.perf_counter() - started, 4))
+    if totals is not None:
+        totals.add(job_errors=1)
+    if job['attempts'] >= max_attempts:
+        logger.warning(f"Job {job['id']} ({job['period']}, {job['topic']}) failed after {job['attempts']} attempts: {error}")
+        queue.fail(job['id'], error)
+    else:
+        if delay is None:
+            delay = min(max_backoff, base_backoff * 2 ** (job['attempts'] - 1)) * random.uniform(0.8, 1.2)
+        logger.warning(f"Retry {job['attempts']}/{max_attempts} for job {job['id']} ({job['period']}, {job['topic']}) in {delay:.0f}s")
+        queue.retry_later(job['id'], delay, error)
+    return 0
+
+def worker_loop(queue, stop, **job_kwargs):
+    """Drain the queue until no pending job is left or stop is set; returns the articles found"""
+    total = 0
+    while not stop.is_set():
+        job = queue.claim()
+        if job is None:
+            break
+        if isinstance(job, float):
+            # Only jobs waiting for a backoff remain
+            time.sleep(min(job, 5.0))
+            continue
+        try:
+            total += process_job(queue, job, **job_kwargs)
+        except InvalidApiKeyError as e:
+            logger.error(f"Invalid API key, stopping all workers: {e}")
+            stop.set()
+    return total
 
 def run_orchestrator(config_file='disconnected/config.json', ticker_file='disconnected/sp500_tickers.txt', 
                     start_date=None, end_date=None, ticker_group_size=10,
-                    delay_between_calls=12, max_api_calls_per_minute=5,
-                    randomize_tickers=True):
-    """Main orchestrator function"""
+                    max_api_calls_per_minute=None, max_api_calls_per_day=None,
+                    randomize_tickers=True, rate_limit_db=RATE_LIMIT_DB,
+                    queue_db='orchestrator_queue.db', resume=False, workers=4, max_attempts=3,
+                    output_format=None, compression=None):
+    """
+    Main orchestrator function. output_format 'ndjson' appends to compressed
+    monthly files (see raw_output) instead of writing one JSON file per job;
+    both default to the config's output_format/compression.
+    """
     try:
-        # Load config and tickers
+        # Load config
         config = load_config(config_file)
-        all_tickers = load_sp500_tickers(ticker_file)
-        
-        # Parse date ranges
-        if start_date and end_date:
-            # Parse custom date range with daily precision
-            try:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-                start_year = start_dt.year
-                start_month = start_dt.month
-                end_year = end_dt.year
-                end_month = end_dt.month
-            except ValueError:
-                logger.error("Invalid date format. Please use YYYY-MM-DD format")
-                return
-        else:
-            # Use config file date range
-            time_range = config.get('time_range', {})
-            start_date_str = time_range.get('from', '')
-            end_date_str = time_range.get('to', '')
-            
-            if not (start_date_str and end_date_str):
-                logger.error("Date range not specified in config file")
-                return
-            
-            # Parse dates from config (format: YYYYMMDDTHHMM)
-            start_year = int(start_date_str[:4])
-            start_month = int(start_date_str[4:6])
-            end_year = int(end_date_str[:4])
-            end_month = int(end_date_str[4:6])
-        
-        date_ranges = generate_monthly_ranges(start_year, start_month, end_year, end_month)
-        logger.info(f"Generated {len(date_ranges)} date ranges from {start_year}-{start_month} to {end_year}-{end_month}")
         
         # Get other parameters from config
         api_key = config.get('api_key')
         topics = config.get('topics', ['earnings', 'technology', 'finance', 'markets', 'economy', 'business'])
         output_dir = config.get('output_dir', 'output')
         apply_ticker_filter = config.get('apply_ticker_filter', False)
+        upstream.configure(
+            max_concurrency=max(workers, config.get('max_concurrency') or 0),
+            request_timeout=config.get('request_timeout'),
+            max_retries=config.get('max_retries'),
+            base_url=config.get('alpha_vantage_base_url')
+        )
+        output_format = output_format or config.get('output_format', 'json')
+        compression = compression or config.get('compression', 'gzip')
         
         # Create base output directory if it doesn't exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             logger.info(f"Created base output directory: {output_dir}")
         
-        # Track API calls to stay within rate limits
-        api_calls = 0
-        minute_start_time = time.time()
-        total_articles = 0
-        retry_count = 0
-        max_retries = 3
+        queue = JobQueue(queue_db)
+        # Articles written so far, so overlapping groups and topics are written once
+        seen = SeenArticles(queue_db)
+        if resume and queue.counts():
+            recovered = queue.recover()
+            logger.info(f"Resuming from {queue_db}: {queue.counts()} ({recovered} interrupted jobs requeued, "
+                        f"{len(seen)} articles already written)")
+        else:
+            all_tickers = load_sp500_tickers(ticker_file)
+            date_ranges = resolve_date_ranges(config, start_date, end_date)
+            if date_ranges is None:
+                return
+            jobs = build_jobs(date_ranges, all_tickers, topics, ticker_group_size, randomize_tickers)
+            queue.reset()
+            seen.reset()
+            queue.enqueue(jobs)
+            logger.info(f"Queued {len(jobs)} jobs in {queue_db}")
         
-        # Run analysis for each date range
-        for date_range in date_ranges:
-            # For each date range, create a new random grouping of tickers
-            ticker_groups = create_random_ticker_groups(all_tickers, ticker_group_size, randomize_tickers)
-            logger.info(f"Created {len(ticker_groups)} ticker groups for period {date_range['label']}")
-            
-            for group_idx, ticker_group in enumerate(ticker_groups):
-                # Check API rate limits
-                current_time = time.time()
-                if current_time - minute_start_time >= 60:
-                    api_calls = 0
-                    minute_start_time = current_time
-                
-                if api_calls >= max_api_calls_per_minute:
-                    wait_time = 60 - (current_time - minute_start_time) + 5  # Add buffer
-                    logger.info(f"Rate limit approaching. Waiting {wait_time:.1f} seconds")
-                    time.sleep(wait_time)
-                    api_calls = 0
-                    minute_start_time = time.time()
-                
-                # Run analysis with retry logic
-                articles_found = 0
-                while retry_count < max_retries:
-                    try:
-                        articles_found = analyze_for_period_and_tickers(
-                            api_key, date_range, ticker_group, topics, output_dir, apply_ticker_filter
-                        )
-                        if articles_found > 0:
-                            break
-                        retry_count += 1
-                        logger.warning(f"Retry {retry_count}/{max_retries} for period {date_range['label']}")
-                        time.sleep(30)  # Wait before retry
-                    except Exception as e:
-                        logger.error(f"Error during analysis: {str(e)}")
-                        retry_count += 1
-                        time.sleep(30)
-                
-                total_articles += articles_found
-                retry_count = 0  # Reset retry count for next group
-                
-                # Update API call count and wait between calls
-                api_calls += 1
-                logger.info(f"Completed run {group_idx+1}/{len(ticker_groups)} for period {date_range['label']}")
-                logger.info(f"Waiting {delay_between_calls} seconds before next API call")
-                time.sleep(delay_between_calls)
+        # Token buckets shared with the web app: every upstream call takes one token,
+        # so the workers together never exceed the budget. Without --rate-limit the
+        # limits already stored by the web app apply (5/minute if there are none)
+        if max_api_calls_per_minute is None and 'minute' not in stored_quotas(rate_limit_db):
+            max_api_calls_per_minute = 5
+        rate_limiter = RateLimiter(
+            per_minute=max_api_calls_per_minute,
+            per_day=max_api_calls_per_day,
+            path=rate_limit_db
+        )
+        # One adaptive controller for all workers: a throttle seen by one slows them all
+        backoff = AdaptiveBackoff()
+        totals = run_log.Totals()
+        writer = None
+        if output_format == 'ndjson':
+            # Partitions a killed run left open hold committed articles: make them ingestible
+            for path in seal_partitions(output_dir):
+                logger.info(f"Sealed partition left open by an earlier run: {path}")
+            writer = RawWriter(output_dir, datetime.now().strftime('%Y%m%d_%H%M%S'), compression)
+            logger.info(f"Appending articles to {output_dir}/<YYYY-MM>/{writer.run_id}{writer.extension}")
+        job_kwargs = dict(
+            api_key=api_key,
+            output_dir=output_dir,
+            apply_ticker_filter=apply_ticker_filter,
+            rate_limiter=rate_limiter,
+            backoff=backoff,
+            max_attempts=max_attempts,
+            writer=writer,
+            seen=seen,
+            totals=totals
+        )
+        stop = threading.Event()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(worker_loop, queue, stop, **job_kwargs) for _ in range(workers)]
+                total_articles = sum(future.result() for future in futures)
+        finally:
+            if writer is not None:
+                # Only closed partitions are picked up by output_handler
+                writer.close()
         
-        logger.info(f"Orchestration complete. Total articles found: {total_articles}")
+        summary = totals.snapshot()
+        run_log.emit('run', jobs=queue.counts(), **summary)
+        logger.info(f"Orchestration complete. Total articles found: {total_articles} in {summary['seconds']:.0f}s. "
+                    f"Jobs: {queue.counts()}")
     
     except Exception as e:
         logger.error(f"Orchestrator error: {str(e)}")
@@ -248,21 +385,46 @@ if __name__ == "__main__":
     parser.add_argument('--start', help='Start date in YYYY-MM-DD format')
     parser.add_argument('--end', help='End date in YYYY-MM-DD format')
     parser.add_argument('--group-size', type=int, default=10, help='Number of tickers per group')
-    parser.add_argument('--delay', type=int, default=12, help='Delay between API calls in seconds')
-    parser.add_argument('--rate-limit', type=int, default=5, help='Maximum API calls per minute')
+    parser.add_argument('--rate-limit', type=int, default=None,
+                        help='Maximum API calls per minute (default: the shared limit, else 5)')
+    parser.add_argument('--daily-limit', type=int, default=None, help='Maximum API calls per day')
+    parser.add_argument('--rate-db', default=RATE_LIMIT_DB, help='SQLite file holding the shared rate budget')
+    parser.add_argument('--queue-db', default='orchestrator_queue.db', help='SQLite file holding the job queue')
+    parser.add_argument('--resume', action='store_true', help='Continue the jobs left in the queue by a previous run')
+    parser.add_argument('--workers', type=int, default=4, help='Number of concurrent workers')
+    parser.add_argument('--max-attempts', type=int, default=3, help='Attempts per job before it is marked failed')
+    parser.add_argument('--output-format', choices=['json', 'ndjson'], help='One JSON file per job or compressed monthly NDJSON (default: config, else json)')
+    parser.add_argument('--compression', choices=sorted(EXTENSIONS), help='Compression of ndjson output (default: config, else gzip)')
+    parser.add_argument('--log-level', default='INFO', help='Level of orchestrator.log and the console')
+    parser.add_argument('--log-file', default='orchestrator.log', help='Log file (empty to disable)')
+    parser.add_argument('--quiet', action='store_true', help='Only warnings and errors on the console')
+    parser.add_argument('--metrics-file', default='orchestrator_metrics.jsonl', help='JSON-lines metrics per API call and job (empty to disable)')
     parser.add_argument('--random', dest='randomize', action='store_true', help='Randomize ticker selection')
     parser.add_argument('--no-random', dest='randomize', action='store_false', help='Use sequential ticker selection')
     parser.set_defaults(randomize=True)
     
     args = parser.parse_args()
     
+    run_log.configure(
+        level=args.log_level.upper(),
+        log_file=args.log_file or None,
+        console_level='WARNING' if args.quiet else None,
+        metrics_file=args.metrics_file or None
+    )
     run_orchestrator(
         config_file=args.config,
         ticker_file=args.tickers,
         start_date=args.start,
         end_date=args.end,
         ticker_group_size=args.group_size,
-        delay_between_calls=args.delay,
         max_api_calls_per_minute=args.rate_limit,
-        randomize_tickers=args.randomize
+        max_api_calls_per_day=args.daily_limit,
+        randomize_tickers=args.randomize,
+        rate_limit_db=args.rate_db,
+        queue_db=args.queue_db,
+        resume=args.resume,
+        workers=args.workers,
+        max_attempts=args.max_attempts,
+        output_format=args.output_format,
+        compression=args.compression
     ) 
\ No newline at end of file
@@ -1,100 +1,214 @@
-import pandas as pd
-import sqlite3
-import hashlib
 import json
 import os
+import sys
 import shutil
+import time
+import itertools
+import argparse
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
 
-def make_id(url, ticker):
-    return hashlib.md5(f"{url}_{ticker}".encode()).hexdigest()
-
-input_dir = "output"
-processed_root = "processed"
-
-# Connessione al DB
-conn = sqlite3.connect("news.db")
-cursor = conn.cursor()
-
-# Crea tabella finale se non esiste
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS articles (
-    id TEXT PRIMARY KEY,
-    title TEXT,
-    url TEXT,
-    source TEXT,
-    time_published TEXT,
-    summary TEXT,
-    overall_sentiment_score REAL,
-    overall_sentiment TEXT,
-    topic TEXT,
-    ticker TEXT,
-    relevance_score REAL,
-    sentiment_score REAL,
-    sentiment TEXT
-);
-""")
-
-# Scorri tutti i file JSON dentro output/
-for root, _, files in os.walk(input_dir):
-    for filename in files:
-        if not filename.endswith(".json"):
-            continue
-
-        filepath = os.path.join(root, filename)
-        rel_path = os.path.relpath(filepath, input_dir)
-        dest_path = os.path.join(processed_root, rel_path)
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-        try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
-
-            rows = []
-            for a in data.get("articles", []):
-                for ts in a.get("ticker_sentiments", []):
-                    rows.append({
-                        "id": make_id(a["url"], ts["ticker"]),
-                        "title": a["title"],
-                        "url": a["url"],
-                        "source": a["source"],
-                        "time_published": a["time_published"],
-                        "summary": a["summary"],
-                        "overall_sentiment_score": a["sentiment_scores"]["overall"],
-                        "overall_sentiment": a["sentiment"],
-                        "topic": a["topic"],
-                        "ticker": ts["ticker"],
-                        "relevance_score": ts["relevance_score"],
-                        "sentiment_score": ts["sentiment_score"],
-                        "sentiment": ts["sentiment"]
-                    })
-
-            if not rows:
-                print(f"⚠️ Nessun articolo trovato in: {rel_path}")
+# Shared schema (news_db) lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from news_db import connect, ensure_schema, article_rows, insert_rows
+from raw_output import is_raw_file, iter_raw_articles
+
+def iter_json_files(input_dir):
+    """
+    Scorri tutti i file JSON e NDJSON (compressi o no) dentro input_dir.
+    Le partizioni NDJSON ancora aperte dall'orchestrator (.part) sono escluse.
+    """
+    for root, _, files in os.walk(input_dir):
+        for filename in files:
+            if filename.endswith(".json") or is_raw_file(filename):
+                yield os.path.join(root, filename)
+
+def iter_articles(filepath):
+    if is_raw_file(filepath):
+        # NDJSON: letto in streaming, una riga per articolo
+        yield from iter_raw_articles(filepath)
+        return
+    with open(filepath, "r") as f:
+        data = json.load(f)
+    yield from data.get("articles", [])
+
+def iter_file_rows(filepath):
+    """(riga articolo, righe topic, righe ticker) per ogni articolo del file, vedi news_db.article_rows"""
+    for a in iter_articles(filepath):
+        rows = article_rows(a)
+        if rows is not None:
+            yield rows
+
+def iter_file_chunks(filepath, chunk_rows=5000):
+    """
+    (filepath, rows, error, last) a blocchi di al massimo chunk_rows articoli,
+    così anche una partizione mensile non sta mai tutta in memoria. L'ultimo
+    blocco (o quello con l'errore) ha last=True.
+    """
+    chunk = []
+    try:
+        for rows in iter_file_rows(filepath):
+            chunk.append(rows)
+            if len(chunk) >= chunk_rows:
+                yield filepath, chunk, None, False
+                chunk = []
+    except Exception as e:
+        yield filepath, chunk, str(e), True
+        return
+    yield filepath, chunk, None, True
+
+def _parse_into(filepath, chunk_rows, out):
+    """Eseguita in un processo worker: manda i blocchi del file sulla coda out"""
+    for item in iter_file_chunks(filepath, chunk_rows):
+        out.put(item)
+
+def iter_parsed(files, workers=0, chunk_rows=5000):
+    """
+    I blocchi di tutti i file (vedi iter_file_chunks). Con più worker i file
+    vengono letti in parallelo e i blocchi di file diversi si alternano; la
+    coda limitata tiene al massimo 2 blocchi per worker in attesa.
+    """
+    if not (workers and workers > 1):
+        for filepath in files:
+            yield from iter_file_chunks(filepath, chunk_rows)
+        return
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        out = manager.Queue(maxsize=2 * workers)
+        futures = [executor.submit(_parse_into, filepath, chunk_rows, out) for filepath in files]
+        remaining = len(futures)
+        while remaining:
+            try:
+                item = out.get(timeout=1)
+            except queue.Empty:
+                # A worker that died never sends its last chunk
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
                 continue
+            if item[3]:
+                remaining -= 1
+            yield item
 
-            df_new = pd.DataFrame(rows)
-            df_new.to_sql("staging_articles", conn, if_exists="replace", index=False)
+def unique_destination(dest_path):
+    """dest_path, o nome-1.ext, nome-2.ext... se esiste già: processed/ non viene mai sovrascritto"""
+    if not os.path.exists(dest_path):
+        return dest_path
+    directory, filename = os.path.split(dest_path)
+    stem, dot, ext = filename.partition('.')
+    for n in itertools.count(1):
+        candidate = os.path.join(directory, f"{stem}-{n}{dot}{ext}")
+        if not os.path.exists(candidate):
+            return candidate
 
-            cursor.execute("""
-            INSERT OR IGNORE INTO articles
-            SELECT * FROM staging_articles;
-            """)
-            inserted_rows = cursor.rowcount
+def ingest(input_dir="output", processed_root="processed", db_path="news.db",
+           batch_size=5000, commit_rows=100000, workers=0, move_files=True):
+    """
+    Carica tutti i file di input_dir in news.db.
+
+    I file vengono letti a blocchi di batch_size articoli; le righe vengono
+    accumulate in batch per executemany e committate in transazioni grandi
+    (commit_rows). Un file viene spostato in processed_root solo dopo il
+    commit che contiene il suo ultimo blocco; un file con errori resta dov'è
+    (le righe già inserite sono idempotenti: INSERT OR IGNORE).
+    """
+    conn = connect(db_path, bulk=True)
+    ensure_schema(conn)
+
+    stats = {"files": 0, "rows": 0, "inserted": 0, "mentions": 0, "errors": 0, "empty": 0}
+    articles, topics, tickers = [], [], []
+    uncommitted_rows = 0
+    pending_files = []
+    started = time.time()
+
+    def flush(commit):
+        nonlocal uncommitted_rows
+        if articles or topics:
+            inserted, mentions = insert_rows(conn, articles, topics, tickers)
+            stats["inserted"] += inserted
+            stats["mentions"] += mentions
+            uncommitted_rows += len(tickers)
+            articles.clear()
+            topics.clear()
+            tickers.clear()
+        if commit:
             conn.commit()
-            cursor.execute("DROP TABLE staging_articles;")
+            uncommitted_rows = 0
+            for filepath in pending_files:
+                if move_files:
+                    rel_path = os.path.relpath(filepath, input_dir)
+                    dest_path = os.path.join(processed_root, rel_path)
+                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                    shutil.move(filepath, unique_destination(dest_path))
+            pending_files.clear()
+
+    # Articoli letti finora per ogni file non ancora completo
+    file_articles = {}
+    for filepath, rows, error, last in iter_parsed(iter_json_files(input_dir), workers, batch_size):
+        for article, topic_rows, ticker_rows in rows:
+            if article is not None:
+                articles.append(article)
+            topics.extend(topic_rows)
+            tickers.extend(ticker_rows)
+            stats["rows"] += len(ticker_rows)
+        file_articles[filepath] = file_articles.get(filepath, 0) + len(rows)
+        if last:
+            rel_path = os.path.relpath(filepath, input_dir)
+            if error is not None:
+                stats["errors"] += 1
+                print(f"❌ Errore con {rel_path}: {error}")
+            elif not file_articles[filepath]:
+                stats["empty"] += 1
+                print(f"⚠️ Nessun articolo trovato in: {rel_path}")
+            else:
+                stats["files"] += 1
+                pending_files.append(filepath)
+            del file_articles[filepath]
+        if len(tickers) >= batch_size:
+            flush(commit=uncommitted_rows + len(tickers) >= commit_rows)
+    flush(commit=True)
+
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.close()
+
+    elapsed = max(time.time() - started, 1e-9)
+    stats["seconds"] = round(elapsed, 2)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed)
+    print(f"✅ {stats['files']} file, {stats['rows']} righe lette, {stats['inserted']} articoli "
+          f"e {stats['mentions']} menzioni inserite "
+          f"in {stats['seconds']}s ({stats['rows_per_sec']} righe/s)")
+    return stats
 
-            shutil.move(filepath, dest_path)
-            print(f"✅ Processato e spostato: {rel_path} — Righe inserite: {inserted_rows}")
+def remove_empty_dirs(input_dir):
+    # Rimuovi le cartelle vuote dentro output/
+    for root, dirs, _ in os.walk(input_dir, topdown=False):
+        for d in dirs:
+            dir_path = os.path.join(root, d)
+            if not os.listdir(dir_path):
+                os.rmdir(dir_path)
+                print(f"🧹 Rimossa cartella vuota: {dir_path}")
 
-        except Exception as e:
-            print(f"❌ Errore con {rel_path}: {e}")
+def main():
+    parser = argparse.ArgumentParser(description='Bulk ingest of orchestrator output into news.db')
+    parser.add_argument('--input', default='output', help='Directory with the JSON/NDJSON files to ingest')
+    parser.add_argument('--processed', default='processed', help='Where ingested files are moved')
+    parser.add_argument('--db', default='news.db', help='SQLite database path')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per executemany call')
+    parser.add_argument('--commit-rows', type=int, default=100000, help='Rows per transaction')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes for JSON parsing (0 = in-process)')
+    parser.add_argument('--keep-files', action='store_true', help='Do not move ingested files')
+    args = parser.parse_args()
 
-# Rimuovi le cartelle vuote dentro output/
-for root, dirs, _ in os.walk(input_dir, topdown=False):
-    for d in dirs:
-        dir_path = os.path.join(root, d)
-        if not os.listdir(dir_path):
-            os.rmdir(dir_path)
-            print(f"🧹 Rimossa cartella vuota: {dir_path}")
+    ingest(
+        input_dir=args.input,
+        processed_root=args.processed,
+        db_path=args.db,
+        batch_size=args.batch_size,
+        commit_rows=args.commit_rows,
+        workers=args.workers,
+        move_files=not args.keep_files
+    )
+    remove_empty_dirs(args.input)
 
-conn.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compact raw output for the orchestrator: one compressed NDJSON file per
+month and run, one article per line.
+
+Every batch is appended as its own gzip member (or zstd frame), so a file
+stays readable up to the last complete batch even if a run is killed, and
+readers can stream it without loading it whole.
+
+While a run is writing, its files carry an extra '.part' suffix that
+is_raw_file() does not match, so ingest never reads a partition that is
+still growing. RawWriter.close() renames them to their final names at the
+end of the run; seal_partitions() does the same for the files of a run that
+was killed.
+"""
+import gzip
+import io
+import json
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+EXTENSIONS = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst', 'none': '.ndjson'}
+# Added to the name of a partition while its run may still append to it
+OPEN_SUFFIX = '.part'
+
+
+def is_raw_file(filename):
+    """True for a closed raw file (open partitions end with OPEN_SUFFIX)"""
+    return filename.endswith(tuple(EXTENSIONS.values()))
+
+
+def seal_partitions(output_dir):
+    """Close the partitions left open by killed runs; returns the paths sealed"""
+    sealed = []
+    for root, _, files in os.walk(output_dir):
+        for filename in files:
+            if filename.endswith(OPEN_SUFFIX) and is_raw_file(filename[:-len(OPEN_SUFFIX)]):
+                path = os.path.join(root, filename[:-len(OPEN_SUFFIX)])
+                os.rename(path + OPEN_SUFFIX, path)
+                sealed.append(path)
+    return sealed
+
+
+def _open(path, mode):
+    # An open partition uses the compression of its final name
+    name = path[:-len(OPEN_SUFFIX)] if path.endswith(OPEN_SUFFIX) else path
+    if name.endswith('.gz'):
+        return gzip.open(path, mode)
+    if name.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("reading or writing .zst output needs the zstandard package")
+        if 'r' in mode:
+            # zstandard.open stops at the first frame; every batch is its own frame
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+            return io.BufferedReader(reader)
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+def compact_article(article, period, topic=None):
+    """Orchestrator article dict -> NDJSON record, without the derivable stocks_mentioned"""
+    record = {k: v for k, v in article.items() if k != 'stocks_mentioned'}
+    record['period'] = period
+    if topic is not None and 'topic' not in record and 'topics' not in record:
+        record['topic'] = topic
+    return record
+
+
+class RawWriter:
+    """
+    Appends articles to <output_dir>/<YYYY-MM>/<run_id><ext>, named
+    <run_id><ext>.part until close(). Thread safe: orchestrator workers
+    share one writer.
+    """
+
+    def __init__(self, output_dir, run_id, compression='gzip'):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"unknown compression {compression!r}, use one of {sorted(EXTENSIONS)}")
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd output needs the zstandard package")
+        self.output_dir = output_dir
+        self.run_id = run_id
+        self.extension = EXTENSIONS[compression]
+        self._lock = threading.Lock()
+        # Final paths of the partitions written to so far
+        self._open_paths = set()
+
+    def path_for(self, period):
+        """period is 'YYYY-MM-DD'; the partition is its month"""
+        return os.path.join(self.output_dir, period[:7], f"{self.run_id}{self.extension}")
+
+    def append(self, period, articles, topic=None):
+        """Write one batch as a single compressed member; returns the path the file gets on close()"""
+        path = self.path_for(period)
+        lines = ''.join(
+            json.dumps(compact_article(a, period, topic), separators=(',', ':')) + '\n' for a in articles
+        ).encode('utf-8')
+        with self._lock:
+            if self._open_paths is None:
+                raise RuntimeError('RawWriter is closed')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if lines:
+                with _open(path + OPEN_SUFFIX, 'ab') as f:
+                    f.write(lines)
+                self._open_paths.add(path)
+        return path
+
+    def close(self):
+        """Give every partition its final name, making it visible to ingest; returns their paths"""
+        with self._lock:
+            paths, self._open_paths = sorted(self._open_paths or ()), None
+            for path in paths:
+                os.rename(path + OPEN_SUFFIX, path)
+        return paths
+
+
+def iter_raw_articles(path):
+    """Stream the article dicts of one raw NDJSON file"""
+    with _open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
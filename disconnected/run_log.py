@@ -0,0 +1,77 @@
+"""
+Logging and metrics setup for the news scripts.
+
+Modules only create loggers; the entry points (orchestrator, news_analyzer
+main) call configure() once. Metrics are JSON lines on the 'news.metrics'
+logger, written to their own file and never to the console, so a backfill
+pays for one small record per API call and per job rather than per article.
+"""
+import json
+import logging
+import threading
+import time
+
+METRICS_LOGGER = 'news.metrics'
+FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+metrics_logger = logging.getLogger(METRICS_LOGGER)
+metrics_logger.propagate = False
+
+
+def configure(level='INFO', log_file=None, console=True, console_level=None, metrics_file=None):
+    """
+    Set up the root logger (file and/or console) and the metrics stream.
+    Without metrics_file metrics are off and emit() costs one level check.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    formatter = logging.Formatter(FORMAT)
+    if log_file:
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    if console:
+        handler = logging.StreamHandler()
+        handler.setLevel(console_level or level)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+
+    if metrics_file:
+        handler = logging.FileHandler(metrics_file)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(logging.INFO)
+    else:
+        metrics_logger.setLevel(logging.CRITICAL + 1)
+
+
+def enabled():
+    return metrics_logger.isEnabledFor(logging.INFO)
+
+
+def emit(event, **fields):
+    """One JSON line: {"ts": ..., "event": event, **fields}"""
+    if metrics_logger.isEnabledFor(logging.INFO):
+        record = {'ts': round(time.time(), 3), 'event': event}
+        record.update(fields)
+        metrics_logger.info(json.dumps(record, separators=(',', ':'), default=str))
+
+
+class Totals:
+    """Thread-safe run totals: counters summed across workers, reported once at the end"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.started = time.time()
+
+    def add(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts['seconds'] = round(time.time() - self.started, 3)
+        return counts
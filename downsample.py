@@ -0,0 +1,89 @@
+"""Server-side downsampling of chart series (LTTB for lines, bucketed OHLC for candles)."""
+import numpy as np
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously selected point
+    and the average of the next bucket. Returns all indices when n_out >= len(y).
+    """
+    n = len(y)
+    n_out = max(n_out, 3)
+    if n_out >= n:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets over the interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (or the last point for the final bucket)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb_union_indices(x, columns, n_out):
+    """LTTB over several series sharing x; returns the sorted union of their picks"""
+    if n_out >= len(x):
+        return np.arange(len(x))
+    per_column = max(3, n_out // len(columns))
+    picks = [lttb_indices(x, column, per_column) for column in columns]
+    return np.unique(np.concatenate(picks))
+
+
+def ohlc_buckets(dates, open_, high, low, close, volume, n_out):
+    """
+    Aggregate candles into at most n_out buckets of consecutive bars.
+
+    Each bucket keeps its first date and open, the max high, the min low,
+    the last close and the summed volume, so no price extreme is lost.
+    """
+    n = len(dates)
+    if n_out >= n:
+        return dates, open_, high, low, close, volume
+    starts = np.unique(np.linspace(0, n, n_out, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], n) - 1
+    return (
+        np.asarray(dates)[starts],
+        np.asarray(open_)[starts],
+        np.maximum.reduceat(np.asarray(high), starts),
+        np.minimum.reduceat(np.asarray(low), starts),
+        np.asarray(close)[ends],
+        np.add.reduceat(np.asarray(volume), starts),
+    )
+
+
+def parse_max_points(value):
+    """Validate the optional max_points request parameter (None = no downsampling)"""
+    if value in (None, '', 0):
+        return None
+    max_points = int(value)
+    if max_points < 3:
+        raise ValueError("max_points deve essere almeno 3")
+    return max_points
@@ -0,0 +1,48 @@
+"""JSON encoding for API responses: orjson when installed, stdlib json otherwise."""
+import json
+import math
+
+import numpy as np
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """Copy of obj with NaN/inf floats replaced by None, as orjson writes them"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return _finite(obj.tolist())
+    return obj
+
+
+def dumps(obj):
+    """Serialize obj (NumPy arrays included) to UTF-8 JSON bytes; NaN and inf become null"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        text = json.dumps(obj, default=_default, separators=(',', ':'), allow_nan=False)
+    except ValueError:
+        # The stdlib would write bare NaN (invalid JSON): only then pay for a cleaning pass
+        text = json.dumps(_finite(obj), default=_default, separators=(',', ':'), allow_nan=False)
+    return text.encode('utf-8')
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
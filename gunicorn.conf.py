@@ -0,0 +1,43 @@
+"""
+Production server settings: gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+Every value can be overridden through the environment (WEB_CONCURRENCY,
+GUNICORN_THREADS, ...). The response cache and the rate limiter are shared
+by the workers through SQLite files under data/, so adding workers adds
+throughput without adding upstream calls.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers: most of a request is spent waiting on Alpha Vantage, and
+# the market cap SSE stream holds a thread per open dashboard. At most
+# top_companies.max_streams (config.json) threads per worker go to streams,
+# so the others stay free for the rest of the routes
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2)))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Import app.py once in the master; workers fork with the code already loaded
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Upstream calls can wait on the rate limiter (rate_limit.max_wait) before running
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # SQLite connections and the HTTP pools opened while preloading belong to the master
+    import app
+    # With preload_app this is the app already built in the master
+    app.after_fork(worker.app.wsgi())
@@ -0,0 +1,162 @@
+"""Technical indicators computed locally on OHLCV arrays."""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _rolling_mean(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def _rolling_std(values, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).std(axis=1)
+    return out
+
+
+def _ewm(values, alpha):
+    # pandas is only needed here; importing it lazily keeps app start-up fast
+    import pandas as pd
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy(copy=True)
+
+
+def sma(series, window=20):
+    return [(f'SMA {window}', _rolling_mean(series.close, window))]
+
+
+def ema(series, window=20):
+    values = _ewm(series.close, 2.0 / (window + 1))
+    values[:window - 1] = np.nan
+    return [(f'EMA {window}', values)]
+
+
+def rsi(series, window=14):
+    delta = np.diff(series.close, prepend=np.nan)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    # Wilder smoothing
+    avg_gain = _ewm(gains[1:], 1.0 / window)
+    avg_loss = _ewm(losses[1:], 1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+    values = np.concatenate([[np.nan], values])
+    values[:window] = np.nan
+    return [(f'RSI {window}', values)]
+
+
+def macd(series, fast=12, slow=26, signal=9):
+    line = _ewm(series.close, 2.0 / (fast + 1)) - _ewm(series.close, 2.0 / (slow + 1))
+    signal_line = _ewm(line, 2.0 / (signal + 1))
+    hist = line - signal_line
+    for values in (line, signal_line, hist):
+        values[:slow - 1] = np.nan
+    return [
+        (f'MACD {fast}/{slow}', line),
+        (f'MACD signal {signal}', signal_line),
+        ('MACD histogram', hist),
+    ]
+
+
+def bollinger(series, window=20, k=2.0):
+    mid = _rolling_mean(series.close, window)
+    std = _rolling_std(series.close, window)
+    return [
+        (f'BB mid {window}', mid),
+        (f'BB upper {window}', mid + k * std),
+        (f'BB lower {window}', mid - k * std),
+    ]
+
+
+def vwap(series):
+    """Volume weighted average price, reset at every calendar day"""
+    typical = (series.high + series.low + series.close) / 3.0
+    volume = series.volume.astype(np.float64)
+    days = series.dates.astype('datetime64[D]')
+    intraday = len(days) != len(np.unique(days))
+    pv = typical * volume
+    if intraday:
+        # Cumulative sums restarted at each session boundary
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        session = np.repeat(starts, np.diff(np.r_[starts, len(days)]))
+        cum_pv = np.cumsum(pv)
+        cum_v = np.cumsum(volume)
+        base_pv = np.where(session > 0, cum_pv[session - 1], 0.0)
+        base_v = np.where(session > 0, cum_v[session - 1], 0.0)
+        cum_pv, cum_v = cum_pv - base_pv, cum_v - base_v
+    else:
+        # Daily bars: anchored at the first bar passed in
+        cum_pv, cum_v = np.cumsum(pv), np.cumsum(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
+    return [('VWAP', values)]
+
+
+# name -> (function, default params, pane, bars needed before the first valid value)
+INDICATORS = {
+    'sma': (sma, {'window': 20}, 'price', lambda p: p['window']),
+    'ema': (ema, {'window': 20}, 'price', lambda p: 4 * p['window']),
+    'rsi': (rsi, {'window': 14}, 'oscillator', lambda p: 5 * p['window']),
+    'macd': (macd, {'fast': 12, 'slow': 26, 'signal': 9}, 'oscillator', lambda p: 4 * p['slow'] + p['signal']),
+    'bollinger': (bollinger, {'window': 20, 'k': 2.0}, 'price', lambda p: p['window']),
+    'vwap': (vwap, {}, 'price', lambda p: 0),
+}
+
+DEFAULT_INDICATORS = [{'name': 'sma', 'window': 20}]
+
+
+def parse_specs(raw):
+    """
+    Normalize the 'indicators' request parameter.
+
+    Accepts a list of names ('rsi') or dicts ({'name': 'sma', 'window': 50}),
+    or a single one of them; anything else, unknown names or parameters raise
+    ValueError.
+    """
+    if raw is None:
+        raw = DEFAULT_INDICATORS
+    elif isinstance(raw, (str, dict)):
+        # One indicator, not a sequence of characters or keys
+        raw = [raw]
+    elif not isinstance(raw, (list, tuple)):
+        raise ValueError("indicators deve essere una lista")
+    specs = []
+    for item in raw:
+        if isinstance(item, str):
+            item = {'name': item}
+        elif not isinstance(item, dict):
+            raise ValueError(f"Indicatore non valido: {item!r}")
+        name = str(item.get('name', '')).lower()
+        if name not in INDICATORS:
+            raise ValueError(f"Indicatore non supportato: {name}")
+        defaults = INDICATORS[name][1]
+        params = dict(defaults)
+        for key, value in item.items():
+            if key == 'name':
+                continue
+            if key not in defaults:
+                raise ValueError(f"Parametro non valido per {name}: {key}")
+            params[key] = type(defaults[key])(value)
+            if params[key] <= 0:
+                raise ValueError(f"Parametro non valido per {name}: {key}")
+        specs.append((name, params))
+    return specs
+
+
+def warmup_bars(specs):
+    """Extra history needed before the visible window so every line starts valid"""
+    return max((INDICATORS[name][3](params) for name, params in specs), default=0)
+
+
+def compute(specs, series):
+    """List of {'name', 'pane', 'values'} lines, each aligned with series.dates"""
+    lines = []
+    for name, params in specs:
+        func, _, pane, _ = INDICATORS[name]
+        for label, values in func(series, **params):
+            lines.append({'name': label, 'pane': pane, 'values': values})
+    return lines
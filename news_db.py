@@ -0,0 +1,397 @@
+"""Normalized news.db schema shared by the ingest scripts and the web app.
+
+articles holds one row per URL; article_tickers holds one row per ticker
+mention, clustered on (ticker, time_published) so ticker/time-window
+queries are index range scans. Times are stored as UTC epoch seconds.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    source TEXT,
+    summary TEXT,
+    time_published INTEGER NOT NULL,
+    overall_sentiment_score REAL,
+    overall_sentiment TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_time ON articles (time_published);
+
+CREATE TABLE IF NOT EXISTS article_topics (
+    article_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    PRIMARY KEY (article_id, topic)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_article_topics_topic ON article_topics (topic, article_id);
+
+CREATE TABLE IF NOT EXISTS article_tickers (
+    ticker TEXT NOT NULL,
+    time_published INTEGER NOT NULL,
+    article_id INTEGER NOT NULL,
+    relevance_score REAL,
+    sentiment_score REAL,
+    sentiment TEXT,
+    PRIMARY KEY (ticker, time_published, article_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_article_tickers_article ON article_tickers (article_id);
+
+CREATE TABLE IF NOT EXISTS news_coverage (
+    ticker TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    time_from INTEGER NOT NULL,
+    time_to INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (ticker, topic, time_from, time_to)
+) WITHOUT ROWID;
+
+-- Per ticker and UTC day, sums rather than averages so rows can be updated
+-- one mention at a time; means and stdev are derived when reading
+CREATE TABLE IF NOT EXISTS sentiment_daily (
+    ticker TEXT NOT NULL,
+    day TEXT NOT NULL,
+    mentions INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    score_sq_sum REAL NOT NULL DEFAULT 0,
+    relevance_sum REAL NOT NULL DEFAULT 0,
+    weighted_score_sum REAL NOT NULL DEFAULT 0,
+    bearish INTEGER NOT NULL DEFAULT 0,
+    somewhat_bearish INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    somewhat_bullish INTEGER NOT NULL DEFAULT 0,
+    bullish INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ticker, day)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_sentiment_daily AFTER INSERT ON article_tickers
+BEGIN
+    INSERT INTO sentiment_daily (
+        ticker, day, mentions, score_sum, score_sq_sum, relevance_sum, weighted_score_sum,
+        bearish, somewhat_bearish, neutral, somewhat_bullish, bullish
+    )
+    SELECT NEW.ticker, date(NEW.time_published, 'unixepoch'), 1,
+           COALESCE(NEW.sentiment_score, 0),
+           COALESCE(NEW.sentiment_score, 0) * COALESCE(NEW.sentiment_score, 0),
+           COALESCE(NEW.relevance_score, 0),
+           COALESCE(NEW.relevance_score, 0) * COALESCE(NEW.sentiment_score, 0),
+           label = 'bearish', label = 'somewhat-bearish', label = 'neutral',
+           label = 'somewhat-bullish', label = 'bullish'
+    FROM (SELECT lower(replace(NEW.sentiment, '_', '-')) AS label)
+    WHERE true
+    ON CONFLICT (ticker, day) DO UPDATE SET
+        mentions = mentions + 1,
+        score_sum = score_sum + excluded.score_sum,
+        score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+        relevance_sum = relevance_sum + excluded.relevance_sum,
+        weighted_score_sum = weighted_score_sum + excluded.weighted_score_sum,
+        bearish = bearish + excluded.bearish,
+        somewhat_bearish = somewhat_bearish + excluded.somewhat_bearish,
+        neutral = neutral + excluded.neutral,
+        somewhat_bullish = somewhat_bullish + excluded.somewhat_bullish,
+        bullish = bullish + excluded.bullish;
+END;
+"""
+
+LABELS = ('bearish', 'somewhat_bearish', 'neutral', 'somewhat_bullish', 'bullish')
+
+INSERT_ARTICLE = """
+INSERT OR IGNORE INTO articles
+    (id, url, title, source, summary, time_published, overall_sentiment_score, overall_sentiment)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_TOPIC = "INSERT OR IGNORE INTO article_topics (article_id, topic) VALUES (?, ?)"
+INSERT_TICKER = """
+INSERT OR IGNORE INTO article_tickers
+    (ticker, time_published, article_id, relevance_score, sentiment_score, sentiment)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Topic labels used in NEWS_SENTIMENT feed items -> the 'topics' query values
+FEED_TOPICS = {
+    'Blockchain': 'blockchain',
+    'Earnings': 'earnings',
+    'IPO': 'ipo',
+    'Mergers & Acquisitions': 'mergers_and_acquisitions',
+    'Financial Markets': 'financial_markets',
+    'Economy - Fiscal': 'economy_fiscal',
+    'Economy - Monetary': 'economy_monetary',
+    'Economy - Macro': 'economy_macro',
+    'Energy & Transportation': 'energy_transportation',
+    'Finance': 'finance',
+    'Life Sciences': 'life_sciences',
+    'Manufacturing': 'manufacturing',
+    'Real Estate & Construction': 'real_estate',
+    'Retail & Wholesale': 'retail_wholesale',
+    'Technology': 'technology',
+}
+
+
+def url_id(url):
+    """Signed 64-bit id from the MD5 of the URL, used as INTEGER PRIMARY KEY"""
+    return int.from_bytes(hashlib.md5(url.encode()).digest()[:8], 'big', signed=True)
+
+
+def to_epoch(time_published):
+    """'20240102T093000' (Alpha Vantage, UTC) -> epoch seconds; None if unparsable"""
+    if not time_published:
+        return None
+    fmt = '%Y%m%dT%H%M%S' if len(time_published) >= 15 else '%Y%m%dT%H%M'
+    try:
+        return int(datetime.strptime(time_published, fmt).replace(tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        return None
+
+
+def from_epoch(seconds):
+    """epoch seconds -> '20240102T093000', the format the API and front end use"""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y%m%dT%H%M%S')
+
+
+def connect(db_path='news.db', bulk=False):
+    """Open news.db; bulk mode trades durability for load speed"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if bulk:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-200000")
+    else:
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _is_legacy(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(articles)")]
+    return 'ticker' in columns
+
+
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def schema_statements(script=SCHEMA):
+    """The statements of script one by one (executescript would commit first)"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+
+
+def ensure_schema(conn):
+    """Create the schema, migrating a legacy one-row-per-mention articles table first"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    # articles_legacy left behind means an interrupted migration by an older version
+    if _is_legacy(conn) or _has_table(conn, 'articles_legacy'):
+        migrate_legacy(conn)
+    conn.executescript(SCHEMA)
+    if version < 3:
+        # The rollup trigger only sees new mentions: backfill what is already stored
+        rebuild_sentiment_daily(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+def migrate_legacy(conn, vacuum=True):
+    """
+    Move data from the old denormalized articles table into the normalized
+    tables. The rename, the new schema, the copy and the drop run in one
+    explicit transaction, so a failure leaves the legacy table as it was. A
+    stranded articles_legacy table is migrated again.
+    """
+    conn.create_function('url_id', 1, url_id, deterministic=True)
+    conn.create_function('to_epoch', 1, to_epoch, deterministic=True)
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        if not _has_table(conn, 'articles_legacy'):
+            conn.execute("ALTER TABLE articles RENAME TO articles_legacy")
+        for statement in schema_statements():
+            conn.execute(statement)
+        conn.execute("""
+            INSERT OR IGNORE INTO articles
+                (id, url, title, source, summary, time_published, overall_sentiment_score, overall_sentiment)
+            SELECT url_id(url), url, title, source, summary, to_epoch(time_published),
+                   overall_sentiment_score, overall_sentiment
+            FROM articles_legacy
+            WHERE url IS NOT NULL AND to_epoch(time_published) IS NOT NULL
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO article_topics (article_id, topic)
+            SELECT url_id(url), topic FROM articles_legacy
+            WHERE url IS NOT NULL AND topic IS NOT NULL
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO article_tickers
+                (ticker, time_published, article_id, relevance_score, sentiment_score, sentiment)
+            SELECT ticker, to_epoch(time_published), url_id(url), relevance_score, sentiment_score, sentiment
+            FROM articles_legacy
+            WHERE url IS NOT NULL AND ticker IS NOT NULL AND to_epoch(time_published) IS NOT NULL
+        """)
+        conn.execute("DROP TABLE articles_legacy")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if vacuum:
+        conn.execute("VACUUM")
+
+
+def rebuild_sentiment_daily(conn):
+    """Recompute sentiment_daily from article_tickers in one pass"""
+    with conn:
+        conn.execute("DELETE FROM sentiment_daily")
+        conn.execute("""
+            INSERT INTO sentiment_daily (
+                ticker, day, mentions, score_sum, score_sq_sum, relevance_sum, weighted_score_sum,
+                bearish, somewhat_bearish, neutral, somewhat_bullish, bullish
+            )
+            SELECT ticker, day, COUNT(*), SUM(score), SUM(score * score), SUM(relevance), SUM(relevance * score),
+                   SUM(label = 'bearish'), SUM(label = 'somewhat-bearish'), SUM(label = 'neutral'),
+                   SUM(label = 'somewhat-bullish'), SUM(label = 'bullish')
+            FROM (
+                SELECT ticker, date(time_published, 'unixepoch') AS day,
+                       COALESCE(sentiment_score, 0) AS score, COALESCE(relevance_score, 0) AS relevance,
+                       lower(replace(sentiment, '_', '-')) AS label
+                FROM article_tickers
+            )
+            GROUP BY ticker, day
+        """)
+
+
+def daily_sentiment(conn, ticker, day_from=None, day_to=None):
+    """
+    Daily sentiment series for ticker from the rollup, oldest first.
+
+    day_from/day_to are 'YYYY-MM-DD' (inclusive). Each row has mentions,
+    mean, relevance-weighted mean, sample stdev and the label histogram.
+    """
+    rows = conn.execute(
+        """SELECT day, mentions, score_sum, score_sq_sum, relevance_sum, weighted_score_sum,
+                  bearish, somewhat_bearish, neutral, somewhat_bullish, bullish
+           FROM sentiment_daily
+           WHERE ticker = ? AND day BETWEEN ? AND ?
+           ORDER BY day""",
+        (ticker.upper(), day_from or '0000-00-00', day_to or '9999-99-99')
+    ).fetchall()
+    series = []
+    for day, n, total, sq_total, relevance, weighted, *labels in rows:
+        mean = total / n
+        variance = (sq_total - n * mean * mean) / (n - 1) if n > 1 else 0.0
+        series.append({
+            'day': day,
+            'mentions': n,
+            'mean': mean,
+            'weighted_mean': weighted / relevance if relevance else mean,
+            'stdev': max(variance, 0.0) ** 0.5,
+            'labels': dict(zip(LABELS, labels))
+        })
+    return series
+
+
+def article_rows(article):
+    """
+    Split one orchestrator article dict into (article row, topic rows, ticker rows)
+    matching INSERT_ARTICLE, INSERT_TOPIC and INSERT_TICKER. None if it has no usable time.
+
+    A topic_only record (an article already written under another topic in
+    the same run) only carries topic rows; its article row is None.
+    """
+    if article.get('topic_only'):
+        if not article.get('url'):
+            return None
+        return None, [(url_id(article['url']), topic) for topic in article.get('topics', [])], []
+    published = to_epoch(article.get('time_published'))
+    if published is None or not article.get('url'):
+        return None
+    article_id = url_id(article['url'])
+    row = (
+        article_id,
+        article['url'],
+        article.get('title'),
+        article.get('source'),
+        article.get('summary'),
+        published,
+        article.get('sentiment_scores', {}).get('overall'),
+        article.get('sentiment'),
+    )
+    topics = article.get('topics') or ([article['topic']] if article.get('topic') else [])
+    topic_rows = [(article_id, topic) for topic in topics]
+    ticker_rows = [
+        (ts['ticker'], published, article_id, ts['relevance_score'], ts['sentiment_score'], ts['sentiment'])
+        for ts in article.get('ticker_sentiments', [])
+    ]
+    return row, topic_rows, ticker_rows
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def feed_item_rows(item):
+    """Same as article_rows, for a raw NEWS_SENTIMENT feed item"""
+    published = to_epoch(item.get('time_published'))
+    if published is None or not item.get('url'):
+        return None
+    article_id = url_id(item['url'])
+    row = (
+        article_id,
+        item['url'],
+        item.get('title'),
+        item.get('source'),
+        item.get('summary'),
+        published,
+        _float(item.get('overall_sentiment_score')),
+        item.get('overall_sentiment_label'),
+    )
+    topic_rows = [
+        (article_id, FEED_TOPICS.get(t['topic'], t['topic'].lower().replace(' ', '_')))
+        for t in item.get('topics', []) if t.get('topic')
+    ]
+    ticker_rows = [
+        (ts['ticker'], published, article_id, _float(ts.get('relevance_score')),
+         _float(ts.get('ticker_sentiment_score')), ts.get('ticker_sentiment_label'))
+        for ts in item.get('ticker_sentiment', [])
+    ]
+    return row, topic_rows, ticker_rows
+
+
+def insert_rows(conn, articles, topics, tickers):
+    """executemany the three row lists; returns (articles inserted, mentions inserted)"""
+    # rowcount, unlike total_changes, leaves out the rows written by the rollup trigger
+    inserted_articles = conn.executemany(INSERT_ARTICLE, articles).rowcount
+    conn.executemany(INSERT_TOPIC, topics)
+    return inserted_articles, conn.executemany(INSERT_TICKER, tickers).rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or migrate the news.db schema')
+    parser.add_argument('db', nargs='?', default='news.db', help='SQLite database path')
+    args = parser.parse_args()
+
+    size_before = os.path.getsize(args.db) if os.path.exists(args.db) else 0
+    conn = connect(args.db)
+    legacy = _is_legacy(conn)
+    ensure_schema(conn)
+    conn.close()
+    size_after = os.path.getsize(args.db)
+    if legacy:
+        print(f"Migrated {args.db}: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    else:
+        print(f"{args.db} is at schema version {SCHEMA_VERSION}")
+
+
+if __name__ == '__main__':
+    main()
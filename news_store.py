@@ -0,0 +1,293 @@
+"""Local-first news search over news.db, filling uncovered windows from upstream."""
+import os
+import threading
+import time
+
+from av_responses import classify, message, OK, EMPTY, UpstreamError
+from rate_limiter import RateLimitTimeout
+from news_db import connect, ensure_schema, feed_item_rows, insert_rows, to_epoch, from_epoch, daily_sentiment
+
+SORTS = ('LATEST', 'EARLIEST', 'RELEVANCE')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# Window searched when the request gives no time_from
+DEFAULT_WINDOW = 7 * 86400
+# Uncovered stretches shorter than this are not worth an API call
+MIN_GAP = 900
+# NEWS_SENTIMENT returns at most this many items per call
+UPSTREAM_LIMIT = 1000
+
+
+def encode_cursor(sort, row):
+    """Opaque keyset cursor from the sort key of the last returned row"""
+    if sort == 'RELEVANCE':
+        return f"{row['relevance_score'] or 0:.6f}:{row['time_published']}:{row['article_id']}"
+    return f"{row['time_published']}:{row['article_id']}"
+
+
+def decode_cursor(sort, cursor):
+    parts = cursor.split(':')
+    try:
+        if sort == 'RELEVANCE':
+            return float(parts[0]), int(parts[1]), int(parts[2])
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        raise ValueError('Cursor non valido')
+
+
+def uncovered(intervals, start, end, min_gap=MIN_GAP):
+    """Stretches of [start, end] not inside any (time_from, time_to) interval"""
+    gaps = []
+    pos = start
+    for time_from, time_to in sorted(intervals):
+        if time_to <= pos:
+            continue
+        if time_from > pos:
+            gaps.append((pos, min(time_from, end)))
+        pos = max(pos, time_to)
+        if pos >= end:
+            break
+    if pos < end:
+        gaps.append((pos, end))
+    return [(a, b) for a, b in gaps if b - a >= min_gap]
+
+
+class NewsStore:
+    """
+    Answers NEWS_SENTIMENT-style queries from news.db.
+
+    news_coverage records which (tickers, topic, window) combinations were
+    already fetched completely; only the missing stretches go upstream, and
+    their articles are written back before the local query runs.
+    """
+
+    def __init__(self, fetch, path='news.db', min_gap=MIN_GAP, max_fills=2):
+        self.fetch = fetch
+        self.path = path
+        self.min_gap = min_gap
+        self.max_fills = max_fills
+        self._local = threading.local()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {'queries': 0, 'local_hits': 0, 'upstream_fills': 0, 'fill_errors': 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        ensure_schema(self._conn())
+
+    def connection(self):
+        """This thread's news.db connection, for read-only analytics"""
+        return self._conn()
+
+    def after_fork(self):
+        """Forget connections inherited from the parent process"""
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.path)
+            conn.execute('PRAGMA busy_timeout = 30000')
+            self._local.conn = conn
+        return conn
+
+    def _lock_for(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def search(self, tickers, topic=None, time_from=None, time_to=None, sort='LATEST',
+               limit=DEFAULT_LIMIT, cursor=None, fill=True):
+        """
+        Feed items (Alpha Vantage shape) for articles mentioning every ticker.
+
+        Returns (feed, next_cursor, info); info says whether upstream was
+        called and carries the error message if a fill failed.
+        """
+        tickers = sorted({t.strip().upper() for t in tickers if t.strip()})
+        if not tickers:
+            raise ValueError('Ticker obbligatorio')
+        sort = (sort or 'LATEST').upper()
+        if sort not in SORTS:
+            raise ValueError(f'Ordinamento non valido: {sort}')
+        limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+        end = to_epoch(time_to) if time_to else int(time.time())
+        start = to_epoch(time_from) if time_from else end - DEFAULT_WINDOW
+        if start is None or end is None or start > end:
+            raise ValueError('Intervallo temporale non valido')
+
+        self.stats['queries'] += 1
+        info = {'source': 'local', 'fills': 0}
+        # Later pages reuse the coverage established by the first one
+        if fill and cursor is None:
+            try:
+                info['fills'] = self.fill(tickers, topic or '', start, end)
+            except (UpstreamError, RateLimitTimeout) as e:
+                # Whatever is stored locally is still served
+                self.stats['fill_errors'] += 1
+                info['error'] = str(e) or getattr(e, 'kind', 'rate_limited')
+        if info['fills']:
+            info['source'] = 'upstream'
+        else:
+            self.stats['local_hits'] += 1
+
+        rows = self.query(tickers, topic, start, end, sort, limit + 1, cursor)
+        next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+        return self.to_feed(rows[:limit], first=tickers[0]), next_cursor, info
+
+    def coverage(self, tickers, topic, start, end):
+        """Covered intervals overlapping [start, end] for this ticker set or any of its tickers"""
+        keys = [','.join(tickers)] + (tickers if len(tickers) > 1 else [])
+        topics = ['', topic] if topic else ['']
+        return self._conn().execute(
+            f"""SELECT time_from, time_to FROM news_coverage
+                WHERE ticker IN ({','.join('?' * len(keys))}) AND topic IN ({','.join('?' * len(topics))})
+                  AND time_to >= ? AND time_from <= ?""",
+            (*keys, *topics, start, end)
+        ).fetchall()
+
+    def fill(self, tickers, topic, start, end):
+        """Fetch the uncovered parts of the window from upstream; returns the number of calls made"""
+        key = ','.join(tickers)
+        with self._lock_for((key, topic)):
+            gaps = uncovered(self.coverage(tickers, topic, start, end), start, end, self.min_gap)
+            # Newest gaps first: they are the ones users look at
+            gaps = sorted(gaps, reverse=True)[:self.max_fills]
+            for gap_from, gap_to in gaps:
+                self._fill_gap(key, topic, gap_from, gap_to)
+            return len(gaps)
+
+    def _fill_gap(self, key, topic, gap_from, gap_to):
+        # The API takes minutes: only claim coverage up to the last whole minute asked for
+        gap_to -= gap_to % 60
+        params = {
+            'tickers': key,
+            'time_from': from_epoch(gap_from)[:13],
+            'time_to': from_epoch(gap_to)[:13],
+            'sort': 'LATEST',
+            'limit': UPSTREAM_LIMIT
+        }
+        if topic:
+            params['topics'] = topic
+        data = self.fetch(**params)
+        kind = classify(data, 'feed')
+        if kind not in (OK, EMPTY):
+            raise UpstreamError(message(data) or 'Risposta NEWS_SENTIMENT non valida')
+        self.stats['upstream_fills'] += 1
+
+        feed = data.get('feed') or []
+        articles, topics, mentions = [], [], []
+        covered_from = gap_from
+        for item in feed:
+            rows = feed_item_rows(item)
+            if rows is None:
+                continue
+            articles.append(rows[0])
+            topics.extend(rows[1])
+            mentions.extend(rows[2])
+        if len(feed) >= UPSTREAM_LIMIT and articles:
+            # Truncated answer: only the stretch after the oldest returned item is complete
+            covered_from = min(row[5] for row in articles)
+
+        conn = self._conn()
+        with conn:
+            insert_rows(conn, articles, topics, mentions)
+            conn.execute(
+                "INSERT OR REPLACE INTO news_coverage (ticker, topic, time_from, time_to, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key, topic, covered_from, gap_to, time.time())
+            )
+
+    def query(self, tickers, topic, start, end, sort, limit, cursor=None):
+        """
+        One page of mentions of tickers[0] in [start, end], as dict rows.
+
+        The (ticker, time_published, article_id) primary key turns the
+        window into a range seek and LATEST/EARLIEST into an ordered scan;
+        the remaining tickers and the topic are checked per article.
+        """
+        sql = ["""SELECT t.article_id, t.time_published, t.relevance_score
+                  FROM article_tickers t
+                  WHERE t.ticker = ? AND t.time_published BETWEEN ? AND ?"""]
+        args = [tickers[0], start, end]
+        for other in tickers[1:]:
+            sql.append("AND EXISTS (SELECT 1 FROM article_tickers o WHERE o.article_id = t.article_id AND o.ticker = ?)")
+            args.append(other)
+        if topic:
+            sql.append("AND EXISTS (SELECT 1 FROM article_topics p WHERE p.article_id = t.article_id AND p.topic = ?)")
+            args.append(topic)
+        if cursor:
+            position = decode_cursor(sort, cursor)
+            if sort == 'LATEST':
+                sql.append("AND (t.time_published, t.article_id) < (?, ?)")
+            elif sort == 'EARLIEST':
+                sql.append("AND (t.time_published, t.article_id) > (?, ?)")
+            else:
+                sql.append("AND (ROUND(COALESCE(t.relevance_score, 0), 6), t.time_published, t.article_id) < (?, ?, ?)")
+            args.extend(position)
+        if sort == 'LATEST':
+            sql.append("ORDER BY t.time_published DESC, t.article_id DESC")
+        elif sort == 'EARLIEST':
+            sql.append("ORDER BY t.time_published, t.article_id")
+        else:
+            sql.append("ORDER BY ROUND(COALESCE(t.relevance_score, 0), 6) DESC, t.time_published DESC, t.article_id DESC")
+        sql.append("LIMIT ?")
+        args.append(limit)
+
+        columns = ('article_id', 'time_published', 'relevance_score')
+        rows = self._conn().execute('\n'.join(sql), args).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def to_feed(self, rows, first=None):
+        """Expand article ids into feed items shaped like the NEWS_SENTIMENT response"""
+        if not rows:
+            return []
+        ids = [row['article_id'] for row in rows]
+        marks = ','.join('?' * len(ids))
+        conn = self._conn()
+        articles = {
+            r[0]: r for r in conn.execute(
+                f"""SELECT id, url, title, source, summary, time_published, overall_sentiment_score, overall_sentiment
+                    FROM articles WHERE id IN ({marks})""", ids)
+        }
+        mentions = {}
+        for article_id, ticker, relevance, score, label in conn.execute(
+                f"""SELECT article_id, ticker, relevance_score, sentiment_score, sentiment
+                    FROM article_tickers WHERE article_id IN ({marks})""", ids):
+            mentions.setdefault(article_id, []).append({
+                'ticker': ticker,
+                'relevance_score': relevance,
+                'ticker_sentiment_score': score,
+                'ticker_sentiment_label': label
+            })
+        topics = {}
+        for article_id, topic in conn.execute(
+                f"SELECT article_id, topic FROM article_topics WHERE article_id IN ({marks})", ids):
+            topics.setdefault(article_id, []).append(topic)
+
+        feed = []
+        for row in rows:
+            article = articles.get(row['article_id'])
+            if article is None:
+                continue
+            article_id, url, title, source, summary, published, score, label = article
+            ticker_sentiment = mentions.get(article_id, [])
+            # The page shows the first entry: the searched ticker, then by relevance
+            ticker_sentiment.sort(key=lambda m: (m['ticker'] != first, -(m['relevance_score'] or 0)))
+            feed.append({
+                'title': title,
+                'url': url,
+                'source': source,
+                'summary': summary,
+                'time_published': from_epoch(published),
+                'overall_sentiment_score': score,
+                'overall_sentiment_label': label,
+                'topics': topics.get(article_id, []),
+                'ticker_sentiment': ticker_sentiment
+            })
+        return feed
+
+    def daily_sentiment(self, ticker, day_from=None, day_to=None):
+        """Per-day rollup for ticker, see news_db.daily_sentiment (local data only)"""
+        return daily_sentiment(self._conn(), ticker, day_from, day_to)
+
+    def snapshot(self):
+        return dict(self.stats)
@@ -0,0 +1,83 @@
+"""Period resolution and O(log n) slicing of sorted date arrays."""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Look-back window of each named period
+PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 30,
+    '3mo': 90,
+    '6mo': 180,
+    '1y': 365,
+}
+PERIODS = tuple(PERIOD_DAYS) + ('ytd', 'max', 'custom')
+
+
+# Accepted string bounds: ISO dates/times and Alpha Vantage style 20240102T0930
+DATE_FORMATS = ('%Y-%m-%d', '%Y%m%d')
+# Compact forms shortest first: strptime would also read '0930' as %H%M%S (09:03:00)
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S',
+                    '%Y-%m-%d %H:%M', '%Y%m%dT%H%M', '%Y%m%dT%H%M%S')
+
+
+def _parse(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def _is_bare_date(value):
+    return isinstance(value, str) and _parse(value.strip(), DATE_FORMATS) is not None
+
+
+def _to_datetime64(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        parsed = _parse(value.strip(), DATE_FORMATS + DATETIME_FORMATS)
+        if parsed is None:
+            # numpy would read '20240102' as the year 20240102 and silently select nothing
+            raise ValueError(f"Data non valida: {value!r}")
+        value = parsed
+    return np.datetime64(value, 's')
+
+
+def resolve_range(period='1mo', now=None, time_from=None, time_to=None):
+    """
+    Map a period name (or explicit from/to bounds) to (start, end).
+
+    Either bound may be None, meaning unbounded. Explicit bounds win over
+    the period; 'custom' requires at least one of them. An unknown period or
+    an unparseable bound raises ValueError.
+    """
+    if time_from or time_to:
+        start = _to_datetime64(time_from)
+        end = _to_datetime64(time_to)
+        if end is not None and _is_bare_date(time_to):
+            # A bare date as upper bound includes the whole day
+            end = end + np.timedelta64(1, 'D') - np.timedelta64(1, 's')
+        return start, end
+    if now is None:
+        now = datetime.now()
+    if period in PERIOD_DAYS:
+        return np.datetime64(now - timedelta(days=PERIOD_DAYS[period]), 's'), None
+    if period == 'ytd':
+        return np.datetime64(datetime(now.year, 1, 1), 's'), None
+    if period == 'max':
+        return None, None
+    if period == 'custom':
+        raise ValueError("Il periodo custom richiede from e/o to")
+    raise ValueError(f"Periodo non valido: {period}")
+
+
+def period_slice(dates, period='1mo', now=None, time_from=None, time_to=None):
+    """slice selecting the requested window of an ascending datetime64 array"""
+    start, end = resolve_range(period, now, time_from, time_to)
+    lo = 0 if start is None else int(np.searchsorted(dates, start, side='left'))
+    hi = len(dates) if end is None else int(np.searchsorted(dates, end, side='right'))
+    return slice(lo, max(lo, hi))
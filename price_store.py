@@ -0,0 +1,134 @@
+"""Persistent per-symbol OHLCV store backed by memory-mapped NumPy files."""
+import os
+import threading
+import time
+
+import numpy as np
+
+from timeseries import parse_time_series, to_bars
+
+# interval -> (Alpha Vantage function, extra params, payload key)
+INTERVALS = {
+    'daily': ('TIME_SERIES_DAILY', {}, 'Time Series (Daily)'),
+    '5min': ('TIME_SERIES_INTRADAY', {'interval': '5min'}, 'Time Series (5min)'),
+}
+
+# Seconds before a stored series is topped up again with a compact fetch
+DEFAULT_REFRESH_AFTER = {
+    'daily': 3600,
+    '5min': 300,
+}
+
+# Seconds a series is served as stored after a failed refresh before upstream is tried again
+DEFAULT_RETRY_AFTER_FAILURE = 30
+
+
+class PriceStore:
+    """
+    Keeps the full history of each (symbol, interval) on disk.
+
+    The first request downloads outputsize='full'; later refreshes only fetch
+    outputsize='compact' and append bars newer than the last stored one.
+    Readers never queue behind a refresh when there is stored history to
+    serve, and a failed refresh is not retried for retry_after_failure
+    seconds.
+    """
+
+    def __init__(self, fetch, root='data/prices', refresh_after=None, retry_after_failure=DEFAULT_RETRY_AFTER_FAILURE):
+        self.fetch = fetch
+        self.root = root
+        self.refresh_after = {**DEFAULT_REFRESH_AFTER, **(refresh_after or {})}
+        self.retry_after_failure = retry_after_failure
+        # (symbol, interval) -> time.monotonic() of the last failed refresh
+        self._failed = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol, interval):
+        safe_symbol = symbol.upper().replace('/', '_')
+        return os.path.join(self.root, f'{safe_symbol}_{interval}.npy')
+
+    def load(self, symbol, interval='daily'):
+        """Stored bars as a read-only memory map, or None if nothing is stored"""
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def is_stale(self, symbol, interval='daily'):
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return True
+        return time.time() - os.path.getmtime(path) > self.refresh_after[interval]
+
+    def _needs_refresh(self, symbol, interval):
+        failed = self._failed.get((symbol, interval))
+        if failed is not None and time.monotonic() - failed < self.retry_after_failure:
+            return False
+        return self.is_stale(symbol, interval)
+
+    def get(self, symbol, interval='daily'):
+        """Bars for symbol, refreshed from upstream when stale; None if unavailable"""
+        symbol = symbol.upper()
+        if self._needs_refresh(symbol, interval):
+            lock = self._lock_for(symbol, interval)
+            # With history on disk, serve it rather than wait for a refresh already running
+            if not lock.acquire(blocking=not os.path.exists(self.path(symbol, interval))):
+                return self.load(symbol, interval)
+            try:
+                # Another thread may have refreshed (or failed to) while we waited
+                if self._needs_refresh(symbol, interval):
+                    try:
+                        self.refresh(symbol, interval)
+                    except Exception as e:
+                        # Keep serving local history if upstream is unavailable
+                        print(f"Price refresh failed for {symbol} {interval}: {e}")
+                    if self.is_stale(symbol, interval):
+                        self._failed[(symbol, interval)] = time.monotonic()
+                    else:
+                        self._failed.pop((symbol, interval), None)
+            finally:
+                lock.release()
+        return self.load(symbol, interval)
+
+    def refresh(self, symbol, interval='daily'):
+        """Append new bars from upstream; downloads full history only when needed"""
+        existing = self.load(symbol, interval)
+        if existing is not None and len(existing):
+            new_bars = self._download(symbol, interval, 'compact')
+            if new_bars is None:
+                return existing
+            first_new = new_bars['date'][0]
+            if first_new > existing['date'][-1]:
+                # Gap larger than a compact window: fall back to a full download
+                merged = self._download(symbol, interval, 'full')
+            else:
+                # Overlapping bars are taken from upstream so revised/partial bars get updated
+                keep = np.asarray(existing[existing['date'] < first_new])
+                merged = np.concatenate([keep, new_bars])
+        else:
+            merged = self._download(symbol, interval, 'full')
+        if merged is None:
+            return existing
+        self._write(symbol, interval, merged)
+        return merged
+
+    def _download(self, symbol, interval, outputsize):
+        function, extra, key = INTERVALS[interval]
+        payload = self.fetch(function, symbol, outputsize=outputsize, **extra)
+        time_series = payload.get(key)
+        if not isinstance(time_series, dict) or not time_series:
+            return None
+        return to_bars(parse_time_series(time_series))
+
+    def _write(self, symbol, interval, bars):
+        path = self.path(symbol, interval)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, bars)
+        os.replace(tmp_path, path)
+
+    def _lock_for(self, symbol, interval):
+        with self._locks_guard:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
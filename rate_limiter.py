@@ -0,0 +1,243 @@
+"""Token-bucket rate limiter shared by threads and processes through SQLite."""
+import os
+import sqlite3
+import threading
+import time
+
+# Next to the app so the web app and the news orchestrator share one budget
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rate_limits.db')
+
+MINUTE = 60
+DAY = 24 * 3600
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a token is not available within the caller's timeout"""
+
+
+def stored_quotas(path=DEFAULT_PATH, name='alpha_vantage'):
+    """Periods ('minute', 'day') that have a bucket with stored limits at path"""
+    if not os.path.exists(path):
+        return set()
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        rows = conn.execute(
+            "SELECT key FROM buckets WHERE key >= ? AND key < ? AND capacity IS NOT NULL",
+            (f'{name}:', f'{name};')
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # No buckets table, or one from before the limits were stored
+        return set()
+    finally:
+        conn.close()
+    return {key.split(':', 1)[1] for key, in rows}
+
+
+class RateLimiter:
+    """
+    One token bucket per quota (e.g. 75/minute and 25000/day). acquire()
+    takes a token from every bucket atomically, waiting as long as the
+    most depleted bucket needs to refill. State lives in a SQLite file,
+    so every process pointing at the same path draws from one budget.
+
+    Each bucket's capacity and rate are stored with it: a process debits
+    every bucket of its name, including quotas only another process
+    configured, and refuses to start with limits different from those of
+    a bucket that is still in use (not yet refilled).
+    """
+
+    def __init__(self, per_minute=None, per_day=None, name='alpha_vantage', path=DEFAULT_PATH):
+        self.name = name
+        self.path = path
+        # (bucket key, capacity, refill rate per second)
+        self.quotas = []
+        if per_minute:
+            self.quotas.append((f'{name}:minute', float(per_minute), per_minute / MINUTE))
+        if per_day:
+            self.quotas.append((f'{name}:day', float(per_day), per_day / DAY))
+        self._local = threading.local()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'timeouts': 0}
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                capacity REAL,
+                rate REAL
+            )
+        """)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(buckets)')}
+        for column in ('capacity', 'rate'):
+            if column not in columns:
+                # Buckets written before the limits were stored
+                conn.execute(f'ALTER TABLE buckets ADD COLUMN {column} REAL')
+        self._register()
+
+    def _register(self):
+        """Store this process's quotas, or raise ValueError if they conflict with a bucket in use"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, capacity, rate in self.quotas:
+                row = conn.execute(
+                    'SELECT tokens, updated, capacity, rate FROM buckets WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and row[2] is not None and (row[2], row[3]) != (capacity, rate):
+                    level = min(row[2], row[0] + max(0.0, now - row[1]) * row[3])
+                    if level < row[2]:
+                        raise ValueError(
+                            f"Rate limit {key} is in use with {row[2]:g} per {row[2] / row[3]:g}s, "
+                            f"configured {capacity:g} per {capacity / rate:g}s: use the same limits "
+                            f"everywhere {self.path} is shared"
+                        )
+                    row = None
+                if row is None or row[2] is None:
+                    # New bucket, one from an older version, or an idle (full) one with other limits
+                    tokens = capacity if row is None else min(capacity, row[0])
+                    conn.execute(
+                        'INSERT OR REPLACE INTO buckets (key, tokens, updated, capacity, rate) VALUES (?, ?, ?, ?, ?)',
+                        (key, tokens, now, capacity, rate)
+                    )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @property
+    def enabled(self):
+        return bool(self.buckets())
+
+    def after_fork(self):
+        """Forget connections inherited from the parent process"""
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _select_buckets(self, conn):
+        # Keys are '<name>:<period>'; ';' sorts right after ':'
+        return conn.execute(
+            'SELECT key, tokens, updated, capacity, rate FROM buckets '
+            'WHERE key >= ? AND key < ? AND capacity IS NOT NULL',
+            (f'{self.name}:', f'{self.name};')
+        ).fetchall()
+
+    def buckets(self):
+        """{bucket key: (capacity, refill rate per second)} for every stored quota of this name"""
+        return {key: (capacity, rate) for key, _, _, capacity, rate in self._select_buckets(self._conn())}
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if every bucket has them; otherwise return the seconds to wait"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            buckets = self._select_buckets(conn)
+            levels = [
+                min(capacity, level + max(0.0, now - updated) * rate)
+                for _, level, updated, capacity, rate in buckets
+            ]
+            wait = max(
+                ((tokens - level) / bucket[4] for bucket, level in zip(buckets, levels) if level < tokens),
+                default=0.0
+            )
+            if wait == 0.0:
+                conn.executemany(
+                    'UPDATE buckets SET tokens = ?, updated = ? WHERE key = ?',
+                    [(level - tokens, now, bucket[0]) for bucket, level in zip(buckets, levels)]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; returns the seconds spent waiting"""
+        started = time.time()
+        slept = False
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                waited = time.time() - started if slept else 0.0
+                with self._stats_lock:
+                    self.stats['acquired'] += 1
+                    if slept:
+                        self.stats['waited'] += 1
+                        self.stats['wait_seconds'] += waited
+                return waited
+            if timeout is not None and time.time() - started + wait > timeout:
+                with self._stats_lock:
+                    self.stats['timeouts'] += 1
+                raise RateLimitTimeout(f"Rate limit reached, next slot in {wait:.1f}s")
+            time.sleep(wait)
+            slept = True
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['quotas'] = {key: {'capacity': capacity, 'per_second': rate} for key, (capacity, rate) in self.buckets().items()}
+        return stats
+
+
+class AdaptiveBackoff:
+    """
+    Extra delay in front of upstream calls that adapts to throttling.
+
+    Each throttled response multiplies the delay (starting at min_step);
+    every success_streak consecutive successes shrink it again, down to
+    zero, so callers run at full speed while the API is happy and slow
+    down as soon as it starts answering with rate-limit notes.
+    """
+
+    def __init__(self, min_step=1.0, max_delay=300.0, increase=2.0, decrease=0.5, success_streak=5):
+        self.min_step = min_step
+        self.max_delay = max_delay
+        self.increase = increase
+        self.decrease = decrease
+        self.success_streak = success_streak
+        self.delay = 0.0
+        self._streak = 0
+        self._lock = threading.Lock()
+        self.stats = {'throttled': 0, 'successes': 0, 'slowdowns': 0, 'speedups': 0}
+
+    def record(self, kind):
+        """Feed the outcome of one call (an av_responses kind)"""
+        with self._lock:
+            if kind == 'throttled':
+                self.stats['throttled'] += 1
+                self.stats['slowdowns'] += 1
+                self._streak = 0
+                self.delay = min(self.max_delay, max(self.min_step, self.delay * self.increase))
+            elif kind in ('ok', 'empty'):
+                self.stats['successes'] += 1
+                self._streak += 1
+                if self.delay and self._streak >= self.success_streak:
+                    self._streak = 0
+                    self.stats['speedups'] += 1
+                    self.delay *= self.decrease
+                    if self.delay < self.min_step:
+                        self.delay = 0.0
+
+    def wait(self, max_wait=None):
+        """Sleep for the current delay (capped at max_wait); returns the seconds slept"""
+        with self._lock:
+            delay = self.delay
+        if max_wait is not None:
+            delay = min(delay, max_wait)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'delay': self.delay}
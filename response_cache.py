@@ -0,0 +1,321 @@
+"""Response cache with per-function TTLs and size bounds, in memory or shared through SQLite."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from av_responses import classify, OK
+from fastjson import dumps
+
+# Shared by every worker process of the web app
+DEFAULT_SHARED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'response_cache.db')
+
+# Seconds each Alpha Vantage function stays fresh
+DEFAULT_TTLS = {
+    'GLOBAL_QUOTE': 60,
+    'TIME_SERIES_INTRADAY': 300,
+    'SMA': 3600,
+    'NEWS_SENTIMENT': 300,
+    'OVERVIEW': 6 * 3600,
+    'TIME_SERIES_DAILY': 24 * 3600,
+    # Computed locally (sentiment_price), keyed by ticker and window
+    'SENTIMENT_PRICE': 900,
+}
+DEFAULT_TTL = 300
+
+
+def make_key(params):
+    """Normalized cache key for a set of request params, without the API key"""
+    return tuple(sorted((k, str(v)) for k, v in params.items() if k != 'apikey'))
+
+
+def is_cacheable(payload):
+    """Never store error, rate-limit or empty payloads"""
+    return classify(payload) == OK
+
+
+class ResponseCache:
+    """LRU cache bounded by entry count and approximate bytes, with expiry per function"""
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttl or {})}
+        self._entries = OrderedDict()  # key -> (expires_at, size, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'rejected': 0,
+        }
+
+    def ttl_for(self, function):
+        return self.ttls.get(function, DEFAULT_TTL)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            expires_at, size, payload = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return payload
+
+    def set(self, key, payload, function=None):
+        """Store payload under key; returns False when the payload is not cacheable"""
+        if not is_cacheable(payload):
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        size = len(json.dumps(payload, separators=(',', ':')))
+        if size > self.max_bytes:
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        expires_at = time.time() + self.ttl_for(function)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, payload)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats['evictions'] += 1
+        return True
+
+    def fill(self, key, fetch, function=None):
+        """Call fetch() for a missed key and cache its result"""
+        result = fetch()
+        # Error and rate-limit payloads are rejected by set()
+        self.set(key, result, function)
+        return result
+
+    def after_fork(self):
+        """Called in a freshly forked worker; nothing to do in memory"""
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        """Counters plus current occupancy, for the metrics endpoint"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else None,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SharedResponseCache(ResponseCache):
+    """
+    ResponseCache whose entries live in a SQLite file shared by every worker
+    process, with the in-memory LRU in front as a per-process first level.
+
+    fill() takes a short lease on the key, so when several workers miss the
+    same key only one calls upstream and the others wait for its entry.
+    """
+
+    def __init__(self, path=DEFAULT_SHARED_PATH, max_entries=512, max_bytes=64 * 1024 * 1024, ttl=None,
+                 local_entries=128, lease_seconds=30, poll_interval=0.05):
+        super().__init__(max_entries=local_entries, max_bytes=max_bytes, ttl=ttl)
+        self.path = path
+        self.shared_max_entries = max_entries
+        self.shared_max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self.stats.update({'shared_hits': 0, 'lease_waits': 0, 'lease_timeouts': 0})
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries (expires_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # SQLite connections must not cross a fork: every worker opens its own
+        self._local = threading.local()
+
+    @staticmethod
+    def _db_key(key):
+        return json.dumps(key, separators=(',', ':'))
+
+    def get(self, key):
+        payload = super().get(key)
+        if payload is not None:
+            return payload
+        row = self._conn().execute(
+            "SELECT expires_at, payload FROM entries WHERE key = ? AND expires_at > ?",
+            (self._db_key(key), time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        expires_at, blob = row
+        payload = json.loads(blob)
+        self._set_local(key, payload, expires_at, len(blob))
+        with self._lock:
+            # The first-level lookup above already counted a miss
+            self.stats['misses'] -= 1
+            self.stats['hits'] += 1
+            self.stats['shared_hits'] += 1
+        return payload
+
+    def _set_local(self, key, payload, expires_at, size):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, payload)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def set(self, key, payload, function=None):
+        if not is_cacheable(payload):
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        blob = dumps(payload)
+        if len(blob) > self.shared_max_bytes:
+            with self._lock:
+                self.stats['rejected'] += 1
+            return False
+        expires_at = time.time() + self.ttl_for(function)
+        self._set_local(key, payload, expires_at, len(blob))
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, expires_at, size, payload) VALUES (?, ?, ?, ?)",
+                (self._db_key(key), expires_at, len(blob), blob)
+            )
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def _evict(self, conn):
+        """Drop expired entries, then the ones closest to expiry until within bounds"""
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.shared_max_entries and total <= self.shared_max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY expires_at").fetchall():
+            if count <= self.shared_max_entries and total <= self.shared_max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.stats['evictions'] += evicted
+
+    def _try_lease(self, db_key):
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (db_key, now))
+            taken = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, expires_at) VALUES (?, ?)", (db_key, now + self.lease_seconds)
+            ).rowcount == 1
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return taken
+
+    def fill(self, key, fetch, function=None):
+        """
+        Fetch a missed key at most once across workers: the lease holder calls
+        fetch(), the others poll the shared entry until it appears or the
+        lease is released or expires, and only then fetch themselves.
+        """
+        db_key = self._db_key(key)
+        deadline = time.time() + self.lease_seconds
+        waited = False
+        while not self._try_lease(db_key):
+            if not waited:
+                waited = True
+                with self._lock:
+                    self.stats['lease_waits'] += 1
+            time.sleep(self.poll_interval)
+            payload = self.get(key)
+            if payload is not None:
+                return payload
+            if time.time() >= deadline:
+                with self._lock:
+                    self.stats['lease_timeouts'] += 1
+                return super().fill(key, fetch, function)
+        try:
+            # Another worker may have filled it between our miss and the lease
+            payload = self.get(key)
+            if payload is not None:
+                return payload
+            return super().fill(key, fetch, function)
+        finally:
+            self._conn().execute("DELETE FROM leases WHERE key = ?", (db_key,))
+
+    def clear(self):
+        super().clear()
+        self._conn().execute("DELETE FROM entries")
+
+    def snapshot(self):
+        snap = super().snapshot()
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        snap.update({
+            'backend': 'sqlite',
+            'path': self.path,
+            'shared_entries': count,
+            'shared_bytes': total,
+            'shared_max_entries': self.shared_max_entries,
+        })
+        return snap
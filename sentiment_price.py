@@ -0,0 +1,247 @@
+"""Join of ticker sentiment (news.db) with returns from the local price store.
+
+Everything is computed on (time x ticker) matrices so a whole universe is
+handled with a few NumPy operations instead of a loop per ticker.
+"""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from news_db import to_epoch
+
+UNIVERSE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sp500_tickers.txt')
+# Intraday bars from Alpha Vantage are in exchange time, news times in UTC
+EXCHANGE_TZ = 'US/Eastern'
+
+
+def load_universe(path=UNIVERSE_FILE):
+    with open(path) as f:
+        return [line.strip().upper() for line in f if line.strip()]
+
+
+def load_closes(load, tickers, interval='daily'):
+    """
+    Close prices of tickers on a shared calendar.
+
+    load(symbol, interval) returns stored bars or None (PriceStore.load).
+    Returns (calendar, closes, tickers) where closes is len(calendar) x
+    len(tickers) with NaN where a ticker has no bar; tickers without any
+    stored history are dropped.
+    """
+    series = {}
+    for ticker in tickers:
+        bars = load(ticker, interval)
+        if bars is not None and len(bars):
+            series[ticker] = bars
+    if not series:
+        return np.empty(0, dtype='datetime64[s]'), np.empty((0, 0)), []
+    tickers = list(series)
+    calendar = np.unique(np.concatenate([bars['date'] for bars in series.values()]))
+    closes = np.full((len(calendar), len(tickers)), np.nan)
+    for column, ticker in enumerate(tickers):
+        bars = series[ticker]
+        closes[np.searchsorted(calendar, bars['date']), column] = bars['close']
+    return calendar, closes, tickers
+
+
+def log_returns(closes):
+    """Bar-to-bar log returns; the first row is NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(closes)
+    returns = np.full_like(log_prices, np.nan)
+    returns[1:] = log_prices[1:] - log_prices[:-1]
+    return returns
+
+
+def to_calendar_time(epochs, interval):
+    """UTC epoch seconds -> datetime64[s] in the price calendar's clock"""
+    times = pd.to_datetime(np.asarray(epochs, dtype=np.int64), unit='s', utc=True)
+    if interval == 'daily':
+        return times.tz_localize(None).normalize().values.astype('datetime64[s]')
+    return times.tz_convert(EXCHANGE_TZ).tz_localize(None).values.astype('datetime64[s]')
+
+
+def sentiment_matrix(calendar, n_tickers, columns, times, weighted, relevance):
+    """
+    Relevance-weighted sentiment per (calendar bar, ticker).
+
+    Each observation goes to the first bar at or after its time, so news
+    published on a weekend counts for the next session. Bars without news
+    are NaN.
+    """
+    rows = np.searchsorted(calendar, times, side='left')
+    keep = rows < len(calendar)
+    shape = (len(calendar), n_tickers)
+    weighted_sum = np.zeros(shape)
+    relevance_sum = np.zeros(shape)
+    np.add.at(weighted_sum, (rows[keep], columns[keep]), weighted[keep])
+    np.add.at(relevance_sum, (rows[keep], columns[keep]), relevance[keep])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(relevance_sum > 0, weighted_sum / relevance_sum, np.nan)
+
+
+def lagged_correlations(sentiment, returns, lags):
+    """
+    Pearson correlation of sentiment[t] with returns[t + lag], per ticker.
+
+    Positive lags mean sentiment leads the price. Returns (corr, n), both
+    len(lags) x tickers; corr is NaN with fewer than 3 overlapping bars.
+    """
+    periods = len(sentiment)
+    corr = np.full((len(lags), sentiment.shape[1]), np.nan)
+    counts = np.zeros((len(lags), sentiment.shape[1]), dtype=np.int64)
+    for i, lag in enumerate(lags):
+        if abs(lag) >= periods:
+            continue
+        if lag >= 0:
+            x, y = sentiment[:periods - lag], returns[lag:]
+        else:
+            x, y = sentiment[-lag:], returns[:periods + lag]
+        mask = ~(np.isnan(x) | np.isnan(y))
+        n = mask.sum(axis=0)
+        x = np.where(mask, x, 0.0)
+        y = np.where(mask, y, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_x = x.sum(axis=0) / n
+            mean_y = y.sum(axis=0) / n
+            cov = (x * y).sum(axis=0) / n - mean_x * mean_y
+            var_x = (x * x).sum(axis=0) / n - mean_x ** 2
+            var_y = (y * y).sum(axis=0) / n - mean_y ** 2
+            r = cov / np.sqrt(var_x * var_y)
+        corr[i] = np.where((n >= 3) & (var_x > 0) & (var_y > 0), r, np.nan)
+        counts[i] = n
+    return corr, counts
+
+
+def event_returns(log_prices, calendar, columns, times, scores, window):
+    """
+    Cumulative log return around each event, measured from the close before it.
+
+    Returns (offsets, paths, scores) with paths events x len(offsets); events
+    too close to either end of the calendar are dropped.
+    """
+    offsets = np.arange(-window, window + 1)
+    event_rows = np.searchsorted(calendar, times, side='left')
+    keep = (event_rows - 1 - window >= 0) & (event_rows + window < len(calendar))
+    event_rows, columns, scores = event_rows[keep], columns[keep], scores[keep]
+    base = log_prices[event_rows - 1, columns]
+    paths = log_prices[event_rows[:, None] + offsets[None, :], columns[:, None]] - base[:, None]
+    valid = ~np.isnan(paths).any(axis=1)
+    return offsets, paths[valid], scores[valid]
+
+
+def _fetch(conn, column_of, sql, args):
+    """
+    Run a query whose first column is a ticker; returns one array per column,
+    the ticker mapped to its matrix column and NULLs as 0
+    """
+    cursor = conn.execute(sql, args)
+    rows = cursor.fetchall()
+    if not rows:
+        return [np.empty(0, dtype=np.int64)] * len(cursor.description)
+    tickers, *values = zip(*rows)
+    arrays = [np.fromiter(map(column_of.__getitem__, tickers), dtype=np.int64, count=len(rows))]
+    for column in values:
+        arrays.append(np.array(column, dtype=float))
+        np.nan_to_num(arrays[-1], copy=False)
+    # Times and days are whole numbers
+    arrays[1] = arrays[1].astype(np.int64)
+    return arrays
+
+
+def _mean_path(paths):
+    if not len(paths):
+        return None
+    return [round(float(v), 6) for v in paths.mean(axis=0)]
+
+
+def _round(values):
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+def analyze(conn, load, tickers, time_from=None, time_to=None, interval='daily',
+            max_lag=5, window=5, min_relevance=0.5):
+    """
+    Lagged sentiment/return correlations and event-window returns for tickers.
+
+    conn is a news.db connection, load a PriceStore.load-like callable.
+    time_from/time_to use the API format ('20240101T0000'). Daily
+    runs read only the sentiment_daily rollup; intraday runs read the
+    individual mentions in article_tickers. A negative max_lag or a window
+    below 1 raises ValueError.
+    """
+    if max_lag < 0:
+        raise ValueError('max_lag non può essere negativo')
+    if window < 1:
+        raise ValueError('window deve essere almeno 1')
+    calendar, closes, tickers = load_closes(load, tickers, interval)
+    if not tickers:
+        return {'tickers': [], 'correlations': {}, 'events': None}
+    start = to_epoch(time_from) if time_from else 0
+    end = to_epoch(time_to) if time_to else 2 ** 62
+    if start is None or end is None:
+        raise ValueError('Intervallo temporale non valido')
+    window_rows = (calendar >= np.datetime64(start, 's')) & (calendar <= np.datetime64(end, 's'))
+    marks = ','.join('?' * len(tickers))
+    column_of = {ticker: i for i, ticker in enumerate(tickers)}
+
+    if interval == 'daily':
+        day_from = str(np.datetime64(start, 's').astype('datetime64[D]'))
+        day_to = str(np.datetime64(min(end, 253402214400), 's').astype('datetime64[D]'))
+        columns, days, weighted, relevance, mentions, score_sum = _fetch(conn, column_of, f"""
+            SELECT ticker, CAST(julianday(day) - 2440587.5 AS INTEGER), weighted_score_sum, relevance_sum,
+                   mentions, score_sum
+            FROM sentiment_daily WHERE ticker IN ({marks}) AND day BETWEEN ? AND ?""",
+            (*tickers, day_from, day_to))
+        times = days.astype('datetime64[D]').astype('datetime64[s]')
+        # Daily events are ticker-days whose news were on average highly relevant:
+        # several articles on one day are a single price reaction
+        high = relevance >= min_relevance * mentions
+        event_columns, event_times = columns[high], times[high]
+        scores = score_sum[high] / mentions[high]
+    else:
+        columns, epochs, weighted, relevance = _fetch(conn, column_of, f"""
+            SELECT ticker, time_published, relevance_score * sentiment_score, relevance_score
+            FROM article_tickers WHERE ticker IN ({marks}) AND time_published BETWEEN ? AND ?""",
+            (*tickers, start, end))
+        times = to_calendar_time(epochs, interval)
+        event_columns, event_epochs, scores = _fetch(conn, column_of, f"""
+            SELECT ticker, time_published, sentiment_score FROM article_tickers
+            WHERE ticker IN ({marks}) AND time_published BETWEEN ? AND ? AND relevance_score >= ?""",
+            (*tickers, start, end, min_relevance))
+        event_times = to_calendar_time(event_epochs, interval)
+
+    sentiment = sentiment_matrix(calendar, len(tickers), columns, times, weighted, relevance)
+    returns = log_returns(closes)
+    lags = list(range(-max_lag, max_lag + 1))
+    corr, counts = lagged_correlations(sentiment[window_rows], returns[window_rows], lags)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(closes)
+    offsets, paths, scores = event_returns(log_prices, calendar, event_columns, event_times, scores, window)
+
+    with warnings.catch_warnings():
+        # Lags where no ticker has enough overlap give an all-NaN row
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean_corr = np.nanmean(corr, axis=1)
+    return {
+        'tickers': tickers,
+        'interval': interval,
+        'lags': lags,
+        'correlations': {
+            ticker: {'corr': _round(corr[:, i]), 'n': counts[:, i].tolist()}
+            for i, ticker in enumerate(tickers)
+        },
+        'mean_correlation': _round(mean_corr),
+        'events': {
+            'offsets': offsets.tolist(),
+            'count': int(len(paths)),
+            'all': _mean_path(paths),
+            # Same cut-offs Alpha Vantage uses for the Somewhat-Bullish/Bearish labels
+            'positive': _mean_path(paths[scores > 0.15]),
+            'negative': _mean_path(paths[scores < -0.15]),
+            'min_relevance': min_relevance
+        }
+    }
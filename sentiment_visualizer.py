@@ -1,12 +1,12 @@
 import matplotlib.pyplot as plt
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import os
-from news_analyzer import get_news_sentiment
+from news_db import connect, ensure_schema, daily_sentiment
 
 class SentimentVisualizer:
-    def __init__(self, api_key, output_dir='sentiment_plots'):
-        self.api_key = api_key
+    def __init__(self, db_path='news.db', output_dir='sentiment_plots'):
+        self.db_path = db_path
         self.output_dir = output_dir
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -22,32 +22,23 @@ class SentimentVisualizer:
             end_date (str): Data di fine nel formato 'YYYYMMDDTHHMM'
             save_plot (bool): Se True, salva il grafico come immagine
         """
-        # Ottieni le news per il ticker
-        news = get_news_sentiment(
-            api_key=self.api_key,
-            tickers=[ticker],
-            time_from=start_date,
-            time_to=end_date
+        # Serie giornaliera già aggregata in news.db (tabella sentiment_daily)
+        conn = connect(self.db_path)
+        ensure_schema(conn)
+        series = daily_sentiment(
+            conn,
+            ticker,
+            datetime.strptime(start_date[:8], '%Y%m%d').strftime('%Y-%m-%d'),
+            datetime.strptime(end_date[:8], '%Y%m%d').strftime('%Y-%m-%d')
         )
+        conn.close()
 
-        if not news:
+        if not series:
             print(f"Nessuna news trovata per {ticker} nel periodo specificato")
             return None
 
-        # Raggruppa le news per giorno e calcola l'average sentiment
-        daily_sentiment = {}
-        for item in news:
-            date = datetime.strptime(item['time_published'], '%Y%m%dT%H%M%S').date()
-            if date not in daily_sentiment:
-                daily_sentiment[date] = []
-            daily_sentiment[date].append(item['sentiment_scores']['overall'])
-
-        # Calcola l'average sentiment per ogni giorno
-        dates = []
-        avg_sentiments = []
-        for date, sentiments in sorted(daily_sentiment.items()):
-            dates.append(date)
-            avg_sentiments.append(sum(sentiments) / len(sentiments))
+        dates = [datetime.strptime(row['day'], '%Y-%m-%d').date() for row in series]
+        avg_sentiments = [row['mean'] for row in series]
 
         # Crea il grafico
         plt.figure(figsize=(12, 6))
@@ -97,10 +88,8 @@ class SentimentVisualizer:
         print(f"Dati salvati in: {filepath}")
 
 def main():
-    # Esempio di utilizzo
-    from config import API_KEY  # Assumi di avere un file config.py con la tua API key
-    
-    visualizer = SentimentVisualizer(api_key=API_KEY)
+    # Esempio di utilizzo: legge news.db popolato da disconnected/output_handler.py
+    visualizer = SentimentVisualizer(db_path='news.db')
     
     # Esempio: analizza il sentiment di Apple per l'ultimo mese
     ticker = 'AAPL'
@@ -0,0 +1,142 @@
+"""Configuration and the long-lived objects behind the web app, built by app.create_app."""
+import json
+import threading
+
+import upstream
+from response_cache import ResponseCache, SharedResponseCache, make_key
+from singleflight import SingleFlight
+from rate_limiter import RateLimiter, AdaptiveBackoff, DEFAULT_PATH as RATE_LIMIT_DB
+from av_responses import classify, raise_for_payload
+from price_store import PriceStore
+from news_store import NewsStore
+from snapshot_refresher import SnapshotRefresher
+from top_companies import build_top_companies
+
+
+def load_config(path='config.json'):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print("Warning: config.json not found. Please copy config.example.json to config.json and update with your API key.")
+        return {"alpha_vantage_api_key": "demo"}
+
+
+class Services:
+    """
+    Everything a request needs besides its own arguments: the upstream
+    client settings, caches, rate limiter and the local stores. Creating
+    one opens the SQLite files but makes no upstream call.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.api_key = config['alpha_vantage_api_key']
+        upstream.configure(
+            max_concurrency=config.get('max_concurrency'),
+            request_timeout=config.get('request_timeout'),
+            max_retries=config.get('max_retries'),
+            # Point at benchmarks/av_stub.py to run without the real API
+            base_url=config.get('alpha_vantage_base_url')
+        )
+
+        # Responses are cached per function (seconds for quotes, hours for overviews).
+        # backend 'sqlite' shares the cache between worker processes (see gunicorn.conf.py)
+        cache_config = dict(config.get('cache', {}))
+        if cache_config.pop('backend', 'memory') == 'sqlite':
+            self.response_cache = SharedResponseCache(**cache_config)
+        else:
+            cache_config.pop('path', None)
+            self.response_cache = ResponseCache(**cache_config)
+
+        # Shared with the news orchestrator through the same SQLite file
+        rate_limit_config = config.get('rate_limit', {})
+        self.rate_limiter = RateLimiter(
+            per_minute=rate_limit_config.get('per_minute'),
+            per_day=rate_limit_config.get('per_day'),
+            path=rate_limit_config.get('path', RATE_LIMIT_DB)
+        )
+        # Seconds a web request may wait for a free slot before giving up
+        self.rate_limit_max_wait = rate_limit_config.get('max_wait', 15)
+
+        # Slows every upstream call down while Alpha Vantage is answering with throttle notes
+        self.upstream_backoff = AdaptiveBackoff()
+
+        # Identical requests already in flight wait for that call instead of hitting the API
+        self.inflight = SingleFlight()
+
+        # Full price history lives on disk; only compact top-ups hit the API.
+        # It bypasses the response cache so every refresh sees fresh bars.
+        self.price_store = PriceStore(
+            self.fetch_upstream,
+            root=config.get('price_store_dir', 'data/prices'),
+            refresh_after=config.get('price_refresh_after')
+        )
+
+        # News are served from news.db (shared with the orchestrator ingest); only
+        # windows not fetched before go to NEWS_SENTIMENT, and the results are kept
+        self.news_store = NewsStore(
+            lambda **params: self.fetch_upstream('NEWS_SENTIMENT', None, **params),
+            path=config.get('news_db', 'news.db')
+        )
+
+        # The dashboard is served from a snapshot refreshed on a fixed cadence, so
+        # upstream cost does not grow with the number of viewers
+        top_companies_config = config.get('top_companies', {})
+        self.top_companies_snapshot = SnapshotRefresher(
+            lambda: build_top_companies(self.get_api_data),
+            interval=top_companies_config.get('refresh_interval', 60)
+        )
+        # Seconds the very first request waits for the initial snapshot
+        self.top_companies_first_wait = top_companies_config.get('first_wait', 30)
+        # Open SSE streams per process: each holds a thread (see gunicorn.conf.py)
+        self.top_companies_streams = threading.BoundedSemaphore(top_companies_config.get('max_streams', 4))
+
+    def fetch_upstream(self, function, symbol, **additional_params):
+        self.upstream_backoff.wait(max_wait=self.rate_limit_max_wait)
+        self.rate_limiter.acquire(timeout=self.rate_limit_max_wait)
+        params = {
+            'function': function,
+            'symbol': symbol,
+            'apikey': self.api_key,
+            **additional_params
+        }
+        data = upstream.fetch_json(params)
+        # Throttle and invalid-key notes arrive as HTTP 200: raise instead of returning them as data
+        self.upstream_backoff.record(classify(data))
+        raise_for_payload(data)
+        return data
+
+    def get_api_data(self, function, symbol, **additional_params):
+        key = make_key({'function': function, 'symbol': symbol, **additional_params})
+        data = self.response_cache.get(key)
+        if data is None:
+            def fetch_and_cache():
+                # With the shared cache, only one worker process calls upstream per key
+                return self.response_cache.fill(
+                    key, lambda: self.fetch_upstream(function, symbol, **additional_params), function
+                )
+            data = self.inflight.do(key, fetch_and_cache)
+        return data
+
+    def after_fork(self):
+        """
+        Run in every worker process forked from a preloaded app (gunicorn's
+        post_fork hook): per-thread SQLite connections and the HTTP pools
+        must not be shared with the parent.
+        """
+        self.rate_limiter.after_fork()
+        self.news_store.after_fork()
+        self.response_cache.after_fork()
+        upstream.after_fork()
+
+    def snapshot(self):
+        return {
+            'cache': self.response_cache.snapshot(),
+            'singleflight': self.inflight.snapshot(),
+            'rate_limiter': self.rate_limiter.snapshot(),
+            'backoff': self.upstream_backoff.snapshot(),
+            'upstream': upstream.snapshot(),
+            'news': self.news_store.snapshot(),
+            'top_companies': self.top_companies_snapshot.snapshot()
+        }
@@ -0,0 +1,161 @@
+"""Background refresh of a keyed row snapshot, served in O(1) and pushed as row diffs."""
+import hashlib
+import queue
+import threading
+import time
+
+from fastjson import dumps
+
+
+def content_version(rows, errors):
+    """
+    Version of a snapshot, from its content only: every process that built
+    the same rows and errors (e.g. gunicorn workers reading one shared
+    cache) agrees on it, whenever it refreshed.
+    """
+    return hashlib.md5(dumps({'companies': rows, 'errors': errors})).hexdigest()[:20]
+
+
+class _Snapshot:
+    __slots__ = ('version', 'rows', 'errors', 'body', 'etag', 'updated_at')
+
+    def __init__(self, rows, errors, updated_at):
+        self.version = content_version(rows, errors)
+        self.rows = rows
+        self.errors = errors
+        self.updated_at = updated_at
+        # Serialized once per refresh: every request gets the same bytes
+        self.body = dumps({'companies': rows, 'errors': errors, 'version': self.version, 'updated_at': updated_at})
+        # Not a hash of body, which carries updated_at: equal data, equal ETag, in any worker
+        self.etag = self.version
+
+
+class SnapshotRefresher:
+    """
+    Calls build() every interval seconds on a daemon thread. build returns
+    (rows, errors) where rows are dicts carrying a unique key field.
+
+    current() returns the latest snapshot without touching upstream; its
+    version is a content hash (see content_version), not a counter.
+    Subscribers get {'version', 'rows', 'removed'} with only the rows that
+    changed since the previous refresh, or {'resync': True} after falling
+    more than max_queued diffs behind.
+
+    A key listed in errors keeps its previous row, marked 'stale': a failed
+    upstream call never shows up as a removed row.
+    """
+
+    def __init__(self, build, interval=60, key='ticker', max_queued=16):
+        self.build = build
+        self.interval = interval
+        self.key = key
+        self.max_queued = max_queued
+        self._snapshot = None
+        self._row_hashes = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'refreshes': 0,
+            'failures': 0,
+            'changed_rows': 0,
+            'last_refresh_seconds': None,
+        }
+
+    def start(self):
+        """Start the refresh thread once; later calls are no-ops"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats['failures'] += 1
+                print(f"Snapshot refresh failed: {e}")
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """Rebuild the snapshot now; returns the number of rows that changed"""
+        with self._refresh_lock:
+            started = time.time()
+            rows, errors = self.build()
+            rows = self._keep_failed_rows(rows, errors)
+            hashes = {row[self.key]: hashlib.md5(dumps(row)).digest() for row in rows}
+            changed = [row for row in rows if self._row_hashes.get(row[self.key]) != hashes[row[self.key]]]
+            removed = [k for k in self._row_hashes if k not in hashes]
+            previous = self._snapshot
+            if previous is None or changed or removed or errors != previous.errors:
+                self._snapshot = _Snapshot(rows, errors, started)
+                self._row_hashes = hashes
+                if previous is not None and (changed or removed):
+                    self._publish({'version': self._snapshot.version, 'rows': changed, 'removed': removed})
+            self._ready.set()
+            self.stats['refreshes'] += 1
+            self.stats['changed_rows'] += len(changed)
+            self.stats['last_refresh_seconds'] = round(time.time() - started, 3)
+            return len(changed)
+
+    def _keep_failed_rows(self, rows, errors):
+        """rows plus the previous row, marked stale, of every key in errors that has none"""
+        if self._snapshot is None or not errors:
+            return rows
+        built = {row[self.key] for row in rows}
+        kept = [
+            {**row, 'stale': True} for row in self._snapshot.rows
+            if row[self.key] in errors and row[self.key] not in built
+        ]
+        return rows + kept
+
+    def current(self, timeout=None):
+        """Latest snapshot, waiting up to timeout for the first one; None if not ready"""
+        if self._snapshot is None:
+            self.start()
+            self._ready.wait(timeout)
+        return self._snapshot
+
+    def subscribe(self):
+        """A queue receiving row diffs; pass it to unsubscribe() when done"""
+        q = queue.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def _publish(self, diff):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(diff)
+            except queue.Full:
+                # A slow client fell behind: replace its backlog with one full resync
+                while True:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait({'resync': True})
+
+    def snapshot(self):
+        current = self._snapshot
+        return {
+            **self.stats,
+            'version': current.version if current else None,
+            'rows': len(current.rows) if current else 0,
+            'subscribers': len(self._subscribers),
+            'interval': self.interval,
+        }
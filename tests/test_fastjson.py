@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+import pytest
+
+import fastjson
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(fastjson, 'orjson', None)
+    elif fastjson.orjson is None:
+        pytest.skip('orjson not installed')
+    return request.param
+
+
+def test_non_finite_values_become_null(encoder):
+    payload = {
+        'value': float('nan'),
+        'scalar': np.float64('inf'),
+        'values': np.array([1.5, np.nan, -np.inf]),
+        'rows': [(1, float('nan'))],
+    }
+    assert json.loads(fastjson.dumps(payload), parse_constant=pytest.fail) == {
+        'value': None, 'scalar': None, 'values': [1.5, None, None], 'rows': [[1, None]],
+    }
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from downsample import lttb_indices, ohlc_buckets
+from indicators import INDICATORS, compute, parse_specs, warmup_bars
+from timeseries import OHLCV
+
+NAN = np.nan
+
+
+def series(close, dates=None, volume=None):
+    close = np.asarray(close, dtype=np.float64)
+    if dates is None:
+        dates = np.arange('2024-01-01', len(close), dtype='datetime64[D]').astype('datetime64[s]')
+    if volume is None:
+        volume = np.ones(len(close), dtype=np.int64)
+    return OHLCV(np.asarray(dates, dtype='datetime64[s]'), close, close, close, close, np.asarray(volume))
+
+
+def lines(name, s, **params):
+    return {line['name']: line['values'] for line in compute([(name, {**INDICATORS[name][1], **params})], s)}
+
+
+def test_sma():
+    np.testing.assert_allclose(lines('sma', series([1, 2, 3, 4, 5]), window=3)['SMA 3'], [NAN, NAN, 2, 3, 4])
+
+
+def test_rsi_uses_wilder_smoothing():
+    # gains 1, 1, 0, 1 and losses 0, 0, 1, 0 averaged with alpha 1/2
+    np.testing.assert_allclose(lines('rsi', series([1, 2, 3, 2, 3]), window=2)['RSI 2'], [NAN, NAN, 100, 50, 75])
+
+
+def test_macd():
+    # fast and signal of 1 follow their input; the slow EMA (alpha 1/2) is 2, 3, 4.5, 6.25
+    result = lines('macd', series([2, 4, 6, 8]), fast=1, slow=3, signal=1)
+    np.testing.assert_allclose(result['MACD 1/3'], [NAN, NAN, 1.5, 1.75])
+    np.testing.assert_allclose(result['MACD histogram'], [NAN, NAN, 0, 0])
+
+
+def test_bollinger():
+    result = lines('bollinger', series([1, 3, 5]), window=2, k=1.0)
+    np.testing.assert_allclose(result['BB mid 2'], [NAN, 2, 4])
+    np.testing.assert_allclose(result['BB upper 2'], [NAN, 3, 5])
+    np.testing.assert_allclose(result['BB lower 2'], [NAN, 1, 3])
+
+
+def test_vwap_restarts_every_session():
+    dates = np.array(['2024-01-02T10:00', '2024-01-02T10:05', '2024-01-03T10:00', '2024-01-03T10:05'],
+                     dtype='datetime64[s]')
+    result = lines('vwap', series([10, 20, 30, 40], dates, [1, 3, 2, 2]))
+    np.testing.assert_allclose(result['VWAP'], [10, 17.5, 30, 35])
+
+
+# Exponential smoothing never fully forgets its seed: after the warm-up the
+# lines agree with the ones computed on the whole history to within atol
+@pytest.mark.parametrize('name, atol', [('ema', 1e-3), ('rsi', 0.5), ('macd', 1e-2)])
+def test_warmup_history_matches_full_history(name, atol):
+    close = 100 + np.cumsum(np.random.default_rng(1).normal(size=600))
+    specs = [(name, dict(INDICATORS[name][1]))]
+    start = len(close) - 50 - warmup_bars(specs)
+    full = compute(specs, series(close))
+    warmed = compute(specs, series(close[start:]))
+    for a, b in zip(full, warmed):
+        np.testing.assert_allclose(a['values'][-50:], b['values'][-50:], rtol=0, atol=atol)
+
+
+def test_parse_specs_accepts_a_single_name():
+    assert parse_specs('sma') == [('sma', {'window': 20})]
+    assert parse_specs({'name': 'rsi', 'window': 7}) == [('rsi', {'window': 7})]
+
+
+@pytest.mark.parametrize('raw', [5, ['sma', 3], ['unknown'], [{'name': 'sma', 'window': 0}]])
+def test_parse_specs_rejects_invalid_input(raw):
+    with pytest.raises(ValueError):
+        parse_specs(raw)
+
+
+def test_lttb_keeps_the_peak():
+    x = np.arange(5)
+    assert lttb_indices(x, [0, 0, 10, 0, 0], 3).tolist() == [0, 2, 4]
+    assert lttb_indices(x, [0, 1, 2, 3, 4], 10).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_ohlc_buckets():
+    dates = np.arange('2024-01-01', 4, dtype='datetime64[D]')
+    out = ohlc_buckets(dates, [1, 2, 3, 4], [5, 9, 6, 8], [0, -1, 2, 1], [1.5, 2.5, 3.5, 4.5], [10, 20, 30, 40], 2)
+    assert out[0].tolist() == dates[[0, 2]].tolist()
+    assert [v.tolist() for v in out[1:]] == [[1, 3], [9, 8], [-1, 1], [2.5, 4.5], [30, 70]]
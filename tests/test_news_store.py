@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from av_responses import ThrottledError
+from news_db import feed_item_rows, from_epoch, insert_rows
+from news_store import NewsStore
+from rate_limiter import RateLimitTimeout
+
+
+def store_with_local_article(tmp_path, error):
+    def fetch(**params):
+        raise error
+    store = NewsStore(fetch, path=str(tmp_path / 'news.db'))
+    item = {
+        'url': 'https://news.example/local',
+        'title': 'Stored headline',
+        'time_published': from_epoch(int(time.time()) - 3600),
+        'source': 'Test',
+        'ticker_sentiment': [{'ticker': 'AAPL', 'relevance_score': '0.9', 'ticker_sentiment_score': '0.1'}],
+    }
+    article, topics, tickers = feed_item_rows(item)
+    conn = store.connection()
+    with conn:
+        insert_rows(conn, [article], topics, tickers)
+    return store
+
+
+@pytest.mark.parametrize('error', [RateLimitTimeout('Rate limit reached'), ThrottledError('call frequency')])
+def test_failed_fill_still_serves_local_rows(tmp_path, error):
+    store = store_with_local_article(tmp_path, error)
+    feed, next_cursor, info = store.search(['AAPL'])
+    assert [item['title'] for item in feed] == ['Stored headline']
+    assert info['error']
+    assert store.stats['fill_errors'] == 1
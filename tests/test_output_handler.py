@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+import pytest
+
+from output_handler import ingest, iter_file_chunks
+from raw_output import RawWriter
+
+
+def write_partition(output_dir, count):
+    writer = RawWriter(str(output_dir), 'run1')
+    articles = [
+        {'url': f'https://news.example/{i}', 'title': f'Headline {i}',
+         'time_published': '20240102T100000', 'tickers': ['AAPL']}
+        for i in range(count)
+    ]
+    writer.append('2024-01-02', articles, topic='technology')
+    return writer.close()[0]
+
+
+def test_file_is_read_in_bounded_chunks(tmp_path):
+    path = write_partition(tmp_path / 'output', 25)
+    chunks = list(iter_file_chunks(path, chunk_rows=10))
+    assert [len(rows) for _, rows, _, _ in chunks] == [10, 10, 5]
+    assert [last for _, _, _, last in chunks] == [False, False, True]
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_ingest_moves_file_after_all_chunks(tmp_path, workers):
+    path = write_partition(tmp_path / 'output', 25)
+    db_path = str(tmp_path / 'news.db')
+    stats = ingest(
+        input_dir=str(tmp_path / 'output'), processed_root=str(tmp_path / 'processed'),
+        db_path=db_path, batch_size=10, commit_rows=10, workers=workers
+    )
+    assert stats['files'] == 1
+    assert not os.path.exists(path)
+    assert os.path.exists(str(tmp_path / 'processed' / '2024-01' / os.path.basename(path)))
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0] == 25
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from periods import period_slice, resolve_range
+
+
+def test_compact_and_iso_dates_give_the_same_range():
+    assert resolve_range(time_from='20240102', time_to='20240105') == \
+        resolve_range(time_from='2024-01-02', time_to='2024-01-05')
+    start, end = resolve_range(time_from='20240102T0930', time_to='2024-01-05')
+    assert start == np.datetime64('2024-01-02T09:30:00')
+    assert end == np.datetime64('2024-01-05T23:59:59')
+
+
+def test_compact_bounds_select_bars():
+    dates = np.array(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-08'], dtype='datetime64[s]')
+    window = period_slice(dates, time_from='20240102', time_to='20240105')
+    assert (window.start, window.stop) == (1, 3)
+
+
+@pytest.mark.parametrize('value', ['2024/01/02', 'yesterday', '2024-13-01', '202401'])
+def test_unrecognized_bound_raises(value):
+    with pytest.raises(ValueError):
+        resolve_range(time_from=value)
+
+
+def test_custom_needs_bounds():
+    with pytest.raises(ValueError):
+        resolve_range('custom', now=datetime(2024, 6, 1))
+    assert resolve_range('custom', time_from='2024-01-02')[0] == np.datetime64('2024-01-02')
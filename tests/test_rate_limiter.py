@@ -0,0 +1,38 @@
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitTimeout, stored_quotas
+
+
+def test_instances_on_one_path_share_the_budget(tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    web = RateLimiter(per_minute=3, path=path)
+    orchestrator = RateLimiter(per_minute=3, path=path)
+    assert [web.try_acquire(), orchestrator.try_acquire(), web.try_acquire()] == [0.0, 0.0, 0.0]
+    # The fourth call waits for one token at 3 per minute, whichever process asks
+    assert orchestrator.try_acquire() == pytest.approx(20, abs=0.5)
+    with pytest.raises(RateLimitTimeout):
+        web.acquire(timeout=1)
+
+
+def test_quota_configured_by_another_process_is_debited(tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    RateLimiter(per_minute=100, per_day=2, path=path)
+    web = RateLimiter(per_minute=100, path=path)
+    assert stored_quotas(path) == {'minute', 'day'}
+    assert web.try_acquire() == 0.0
+    assert web.try_acquire() == 0.0
+    assert web.try_acquire() > 0
+
+
+def test_conflicting_limits_raise_while_the_bucket_is_in_use(tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    RateLimiter(per_minute=3, path=path).try_acquire()
+    with pytest.raises(ValueError, match='alpha_vantage:minute'):
+        RateLimiter(per_minute=5, path=path)
+
+
+def test_idle_bucket_takes_the_new_limits(tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    RateLimiter(per_minute=3, path=path)
+    limiter = RateLimiter(per_minute=5, path=path)
+    assert limiter.buckets() == {'alpha_vantage:minute': (5.0, 5 / 60)}
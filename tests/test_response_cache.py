@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+import response_cache
+from fastjson import dumps
+from response_cache import ResponseCache, SharedResponseCache, make_key
+
+
+def quote(price, padding=0):
+    return {'Global Quote': {'05. price': str(price), 'padding': 'x' * padding}}
+
+
+def key(symbol):
+    return make_key({'function': 'GLOBAL_QUOTE', 'symbol': symbol, 'apikey': 'secret'})
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, 'time', clock)
+    return clock
+
+
+def test_key_leaves_out_the_api_key():
+    assert ('apikey', 'secret') not in key('AAPL')
+
+
+def test_eviction_by_bytes_drops_least_recently_used():
+    size = len(dumps(quote(1, 100)))
+    cache = ResponseCache(max_entries=100, max_bytes=2 * size + size // 2)
+    cache.set(key('A'), quote(1, 100), 'GLOBAL_QUOTE')
+    cache.set(key('B'), quote(2, 100), 'GLOBAL_QUOTE')
+    assert cache.get(key('A')) is not None
+    cache.set(key('C'), quote(3, 100), 'GLOBAL_QUOTE')
+    assert cache.get(key('B')) is None
+    assert cache.get(key('A')) is not None and cache.get(key('C')) is not None
+    assert cache.snapshot()['bytes'] <= cache.max_bytes
+    assert cache.stats['evictions'] == 1
+
+
+def test_shared_eviction_by_bytes(tmp_path):
+    size = len(dumps(quote(1, 100)))
+    path = str(tmp_path / 'cache.db')
+    cache = SharedResponseCache(path=path, max_bytes=2 * size + size // 2)
+    for i, symbol in enumerate('ABC'):
+        cache.set(key(symbol), quote(i, 100), 'GLOBAL_QUOTE')
+    assert cache.snapshot()['shared_entries'] == 2
+    # Another worker only sees what is in the file
+    other = SharedResponseCache(path=path, max_bytes=2 * size + size // 2)
+    assert other.get(key('A')) is None
+    assert other.get(key('C')) == quote(2, 100)
+
+
+@pytest.mark.parametrize('payload', [
+    {'Information': 'Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day.'},
+    {'Note': 'Please consider spreading out your free API requests more sparingly (1 request per second).'},
+    {'Error Message': 'Invalid API call.'},
+    {},
+])
+@pytest.mark.parametrize('shared', [False, True])
+def test_error_payloads_are_never_cached(tmp_path, payload, shared):
+    cache = SharedResponseCache(path=str(tmp_path / 'cache.db')) if shared else ResponseCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return payload
+
+    assert cache.fill(key('A'), fetch, 'GLOBAL_QUOTE') == payload
+    assert cache.get(key('A')) is None
+    cache.fill(key('A'), fetch, 'GLOBAL_QUOTE')
+    assert len(calls) == 2
+    assert cache.stats['rejected'] == 2
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_entries_expire_after_their_function_ttl(tmp_path, clock, shared):
+    ttl = {'GLOBAL_QUOTE': 60, 'OVERVIEW': 3600}
+    cache = SharedResponseCache(path=str(tmp_path / 'cache.db'), ttl=ttl) if shared else ResponseCache(ttl=ttl)
+    overview = make_key({'function': 'OVERVIEW', 'symbol': 'A'})
+    cache.set(key('A'), quote(1), 'GLOBAL_QUOTE')
+    cache.set(overview, {'Symbol': 'A'}, 'OVERVIEW')
+    clock.now += 59
+    assert cache.get(key('A')) == quote(1)
+    clock.now += 2
+    assert cache.get(key('A')) is None
+    assert cache.get(overview) == {'Symbol': 'A'}
+    clock.now += 3600
+    assert cache.get(overview) is None
+
+
+def start_lease_holder(cache, result):
+    """Run cache.fill in a thread whose fetch blocks until the returned event is set"""
+    holding, release = threading.Event(), threading.Event()
+
+    def fetch():
+        holding.set()
+        release.wait(5)
+        return result()
+
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = cache.fill(key('A'), fetch, 'GLOBAL_QUOTE')
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert holding.wait(5)
+    return release, thread, outcome
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_lease_hands_the_entry_to_waiting_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    holder = SharedResponseCache(path=path, poll_interval=0.01)
+    waiter = SharedResponseCache(path=path, poll_interval=0.01)
+    release, thread, outcome = start_lease_holder(holder, lambda: quote(1))
+
+    waiter_calls = []
+    result = {}
+    waiting = threading.Thread(target=lambda: result.update(
+        value=waiter.fill(key('A'), lambda: waiter_calls.append(1) or quote(2), 'GLOBAL_QUOTE')))
+    waiting.start()
+    wait_for(lambda: waiter.stats['lease_waits'] == 1)
+    release.set()
+    thread.join(5)
+    waiting.join(5)
+
+    assert outcome['value'] == quote(1)
+    assert result['value'] == quote(1)
+    assert waiter_calls == []
+
+
+def test_failed_lease_holder_lets_the_next_worker_fetch(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    holder = SharedResponseCache(path=path, poll_interval=0.01, lease_seconds=30)
+    waiter = SharedResponseCache(path=path, poll_interval=0.01, lease_seconds=30)
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    release, thread, outcome = start_lease_holder(holder, fail)
+    result = {}
+    waiting = threading.Thread(target=lambda: result.update(
+        value=waiter.fill(key('A'), lambda: quote(2), 'GLOBAL_QUOTE')))
+    waiting.start()
+    wait_for(lambda: waiter.stats['lease_waits'] == 1)
+    started = time.time()
+    release.set()
+    thread.join(5)
+    waiting.join(5)
+
+    assert isinstance(outcome['error'], RuntimeError)
+    assert result['value'] == quote(2)
+    # Released with the failure, not after lease_seconds
+    assert time.time() - started < 5
+    assert waiter.stats['lease_timeouts'] == 0
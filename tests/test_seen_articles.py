@@ -0,0 +1,94 @@
+import threading
+
+from job_queue import NEW, NEW_TOPIC, DUPLICATE, SeenArticles
+
+URL = 'https://news.example/a'
+
+
+def in_thread(fn):
+    """Run fn on a new thread (reservations are per thread) and return its result"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class Job:
+    """A worker thread that runs steps on demand, like an orchestrator job"""
+
+    def __init__(self, seen):
+        self.seen = seen
+        self.steps = []
+        self.results = []
+        self.ready = threading.Semaphore(0)
+        self.done = threading.Semaphore(0)
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            self.ready.acquire()
+            step = self.steps.pop(0)
+            if step is None:
+                return
+            self.results.append(step())
+            self.done.release()
+
+    def run(self, step):
+        self.steps.append(step)
+        self.ready.release()
+        self.done.acquire()
+        return self.results[-1]
+
+    def stop(self):
+        self.steps.append(None)
+        self.ready.release()
+        self.thread.join()
+
+
+def test_rollback_of_full_writer_does_not_strand_topic_only_records(tmp_path):
+    seen = SeenArticles(str(tmp_path / 'queue.db'))
+    a, b = Job(seen), Job(seen)
+    try:
+        assert a.run(lambda: seen.reserve(URL, 'earnings')) == NEW
+        # The full record is not committed yet: B must write it as well
+        assert b.run(lambda: seen.reserve(URL, 'technology')) == NEW
+        a.run(seen.rollback)
+        # A's retry owns the full record again
+        assert a.run(lambda: seen.reserve(URL, 'earnings')) == NEW
+        b.run(seen.commit)
+        a.run(seen.commit)
+    finally:
+        a.stop()
+        b.stop()
+    assert in_thread(lambda: seen.reserve(URL, 'earnings')) == DUPLICATE
+    assert in_thread(lambda: seen.reserve(URL, 'finance')) == NEW_TOPIC
+
+
+def test_topic_reserved_by_running_job_is_freed_by_rollback(tmp_path):
+    seen = SeenArticles(str(tmp_path / 'queue.db'))
+    a, b = Job(seen), Job(seen)
+    try:
+        assert a.run(lambda: seen.reserve(URL, 'earnings')) == NEW
+        assert b.run(lambda: seen.reserve(URL, 'earnings')) == DUPLICATE
+        a.run(seen.rollback)
+        assert b.run(lambda: seen.reserve(URL, 'earnings')) == NEW
+    finally:
+        a.stop()
+        b.stop()
+
+
+def test_committed_articles_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    seen = SeenArticles(path)
+
+    def write():
+        assert seen.reserve(URL, 'earnings') == NEW
+        seen.commit()
+    in_thread(write)
+
+    resumed = SeenArticles(path)
+    assert len(resumed) == 1
+    assert in_thread(lambda: resumed.reserve(URL, 'earnings')) == DUPLICATE
+    assert in_thread(lambda: resumed.reserve(URL, 'technology')) == NEW_TOPIC
@@ -0,0 +1,21 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({
+        'alpha_vantage_api_key': 'test',
+        'price_store_dir': str(tmp_path / 'prices'),
+        'news_db': str(tmp_path / 'news.db'),
+        'rate_limit': {'path': str(tmp_path / 'rate_limit.db')},
+    })
+    return app.test_client()
+
+
+@pytest.mark.parametrize('query', ['max_lag=-3', 'window=0', 'max_lag=-3&window=-2'])
+def test_negative_lag_or_window_is_rejected(client, query):
+    response = client.get(f'/api/sentiment_price?ticker=AAPL&{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,30 @@
+from snapshot_refresher import SnapshotRefresher
+
+
+def test_failed_row_is_kept_stale_and_not_removed():
+    results = [
+        ([{'ticker': 'AAPL', 'price': 1.0}, {'ticker': 'MSFT', 'price': 2.0}], {}),
+        ([{'ticker': 'AAPL', 'price': 1.5}], {'MSFT': 'throttled'}),
+        ([{'ticker': 'AAPL', 'price': 1.5}, {'ticker': 'MSFT', 'price': 2.5}], {}),
+    ]
+    refresher = SnapshotRefresher(lambda: results.pop(0))
+    refresher.refresh()
+    q = refresher.subscribe()
+
+    refresher.refresh()
+    diff = q.get_nowait()
+    assert diff['removed'] == []
+    assert {row['ticker']: row for row in diff['rows']}['MSFT'] == {'ticker': 'MSFT', 'price': 2.0, 'stale': True}
+    assert {row['ticker'] for row in refresher.current().rows} == {'AAPL', 'MSFT'}
+
+    refresher.refresh()
+    assert q.get_nowait() == {'version': refresher.current().version, 'rows': [{'ticker': 'MSFT', 'price': 2.5}], 'removed': []}
+
+
+def test_row_without_error_is_removed():
+    results = [([{'ticker': 'AAPL'}, {'ticker': 'OLD'}], {}), ([{'ticker': 'AAPL'}], {})]
+    refresher = SnapshotRefresher(lambda: results.pop(0))
+    refresher.refresh()
+    q = refresher.subscribe()
+    refresher.refresh()
+    assert q.get_nowait()['removed'] == ['OLD']
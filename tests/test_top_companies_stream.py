@@ -0,0 +1,39 @@
+import pytest
+
+import app as app_module
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'SSE_KEEPALIVE', 0.01)
+    app = create_app({
+        'alpha_vantage_api_key': 'test',
+        'price_store_dir': str(tmp_path / 'prices'),
+        'news_db': str(tmp_path / 'news.db'),
+        'rate_limit': {'path': str(tmp_path / 'rate_limit.db')},
+    })
+    snapshots = app.extensions['services'].top_companies_snapshot
+    snapshots.build = lambda: ([{'ticker': 'AAPL', 'price': 1.0}], {})
+    snapshots.refresh()
+    return app
+
+
+def first_event(app, url, headers=None):
+    response = app.test_client().get(url, headers=headers or {}, buffered=False)
+    try:
+        return next(iter(response.response))
+    finally:
+        response.close()
+
+
+def test_reconnect_resumes_from_last_event_id(app):
+    version = app.extensions['services'].top_companies_snapshot.current().version
+    event = first_event(app, '/api/top_companies/stream?version=stale', {'Last-Event-ID': version})
+    assert event == b': keep-alive\n\n'
+
+
+def test_first_subscribe_uses_query_version(app):
+    version = app.extensions['services'].top_companies_snapshot.current().version
+    assert first_event(app, f'/api/top_companies/stream?version={version}') == b': keep-alive\n\n'
+    assert first_event(app, '/api/top_companies/stream?version=stale').startswith(b'event: snapshot')
@@ -0,0 +1,81 @@
+"""Fast parsing of Alpha Vantage time-series payloads into typed NumPy arrays."""
+from collections import namedtuple
+from operator import itemgetter
+
+import numpy as np
+
+OHLCV = namedtuple('OHLCV', ['dates', 'open', 'high', 'low', 'close', 'volume'])
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[s]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'i8'),
+])
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+# Alpha Vantage field names per output column
+_SOURCE_FIELDS = {
+    'open': '1. open',
+    'high': '2. high',
+    'low': '3. low',
+    'close': '4. close',
+    'volume': '5. volume',
+}
+
+
+def parse_time_series(time_series):
+    """
+    Turn {'2024-01-02': {'1. open': '...', ...}, ...} into an ascending OHLCV.
+
+    Dates become datetime64[s], prices contiguous float64 and volume int64.
+    NumPy converts the numeric strings directly, so no intermediate DataFrame
+    or per-row float() calls are needed.
+    """
+    if not time_series:
+        empty = np.empty(0)
+        return OHLCV(np.empty(0, dtype='datetime64[s]'), empty, empty, empty, empty, np.empty(0, dtype=np.int64))
+
+    dates = np.array(list(time_series.keys()), dtype='datetime64[s]')
+    rows = time_series.values()
+    columns = {}
+    for name in PRICE_FIELDS:
+        columns[name] = np.array(list(map(itemgetter(_SOURCE_FIELDS[name]), rows)), dtype=np.float64)
+    volume = list(map(itemgetter(_SOURCE_FIELDS['volume']), rows))
+    try:
+        columns['volume'] = np.array(volume, dtype=np.int64)
+    except ValueError:
+        # Some feeds report volume as '123.0'
+        columns['volume'] = np.array(volume, dtype=np.float64).astype(np.int64)
+
+    # Alpha Vantage returns newest first: reversing is enough in the common case
+    if len(dates) > 1 and dates[0] > dates[-1]:
+        order = slice(None, None, -1)
+        if not np.all(dates[1:] <= dates[:-1]):
+            order = np.argsort(dates, kind='stable')
+    elif np.all(dates[1:] >= dates[:-1]):
+        order = None
+    else:
+        order = np.argsort(dates, kind='stable')
+    if order is not None:
+        dates = np.ascontiguousarray(dates[order])
+        columns = {name: np.ascontiguousarray(values[order]) for name, values in columns.items()}
+
+    return OHLCV(dates, columns['open'], columns['high'], columns['low'], columns['close'], columns['volume'])
+
+
+def to_bars(series):
+    """Pack an OHLCV into the structured array layout used on disk"""
+    bars = np.empty(len(series.dates), dtype=BAR_DTYPE)
+    bars['date'] = series.dates
+    for name in PRICE_FIELDS + ('volume',):
+        bars[name] = getattr(series, name)
+    return bars
+
+
+def from_bars(bars):
+    """Unpack a structured bar array into contiguous OHLCV columns"""
+    return OHLCV(*(np.ascontiguousarray(bars[name]) for name in ('date',) + PRICE_FIELDS + ('volume',)))
@@ -0,0 +1,96 @@
+"""Companies shown on the market cap dashboard and how their rows are built."""
+import upstream
+from timeseries import parse_time_series
+
+# Top 20 S&P500 companies (ticker, name, earnings, country, logo_url)
+TOP_COMPANIES = [
+    {"ticker": "AAPL", "name": "Apple", "earnings": "125.57B", "country": "USA", "logo": "https://logo.clearbit.com/apple.com"},
+    {"ticker": "MSFT", "name": "Microsoft", "earnings": "89.47B", "country": "USA", "logo": "https://logo.clearbit.com/microsoft.com"},
+    {"ticker": "GOOGL", "name": "Alphabet (Google)", "earnings": "73.80B", "country": "USA", "logo": "https://logo.clearbit.com/abc.xyz"},
+    {"ticker": "AMZN", "name": "Amazon", "earnings": "30.43B", "country": "USA", "logo": "https://logo.clearbit.com/amazon.com"},
+    {"ticker": "META", "name": "Meta Platforms", "earnings": "39.10B", "country": "USA", "logo": "https://logo.clearbit.com/meta.com"},
+    {"ticker": "TSLA", "name": "Tesla", "earnings": "15.00B", "country": "USA", "logo": "https://logo.clearbit.com/tesla.com"},
+    {"ticker": "BRK-B", "name": "Berkshire Hathaway", "earnings": "115.57B", "country": "USA", "logo": "https://logo.clearbit.com/berkshirehathaway.com"},
+    {"ticker": "NVDA", "name": "NVIDIA", "earnings": "29.76B", "country": "USA", "logo": "https://logo.clearbit.com/nvidia.com"},
+    {"ticker": "JPM", "name": "JPMorgan Chase", "earnings": "48.33B", "country": "USA", "logo": "https://logo.clearbit.com/jpmorganchase.com"},
+    {"ticker": "V", "name": "Visa", "earnings": "17.27B", "country": "USA", "logo": "https://logo.clearbit.com/visa.com"},
+    {"ticker": "UNH", "name": "UnitedHealth Group", "earnings": "22.38B", "country": "USA", "logo": "https://logo.clearbit.com/unitedhealthgroup.com"},
+    {"ticker": "XOM", "name": "Exxon Mobil", "earnings": "55.74B", "country": "USA", "logo": "https://logo.clearbit.com/exxonmobil.com"},
+    {"ticker": "PG", "name": "Procter & Gamble", "earnings": "14.74B", "country": "USA", "logo": "https://logo.clearbit.com/pg.com"},
+    {"ticker": "MA", "name": "Mastercard", "earnings": "11.19B", "country": "USA", "logo": "https://logo.clearbit.com/mastercard.com"},
+    {"ticker": "JNJ", "name": "Johnson & Johnson", "earnings": "17.94B", "country": "USA", "logo": "https://logo.clearbit.com/jnj.com"},
+    {"ticker": "LLY", "name": "Eli Lilly", "earnings": "5.24B", "country": "USA", "logo": "https://logo.clearbit.com/lilly.com"},
+    {"ticker": "HD", "name": "Home Depot", "earnings": "17.10B", "country": "USA", "logo": "https://logo.clearbit.com/homedepot.com"},
+    {"ticker": "MRK", "name": "Merck & Co.", "earnings": "14.52B", "country": "USA", "logo": "https://logo.clearbit.com/merck.com"},
+    {"ticker": "ABBV", "name": "AbbVie", "earnings": "11.84B", "country": "USA", "logo": "https://logo.clearbit.com/abbvie.com"},
+    {"ticker": "PEP", "name": "PepsiCo", "earnings": "9.08B", "country": "USA", "logo": "https://logo.clearbit.com/pepsico.com"}
+]
+
+
+def build_company_row(company, quote, overview, series):
+    """Merge the three upstream payloads of one company into a dashboard row"""
+    quote_data = quote.get('Global Quote', {})
+    price = float(quote_data.get('05. price', 0))
+    change = float(quote_data.get('09. change', 0))
+    change_percent = quote_data.get('10. change percent', '0%')
+    volume = int(quote_data.get('06. volume', 0))
+    market_cap = overview.get('MarketCapitalization', 'N/A')
+    pe_ratio = overview.get('PERatio', 'N/A')
+    shares_outstanding = overview.get('SharesOutstanding')
+    # Calcolo market cap live se possibile
+    if shares_outstanding and price:
+        try:
+            market_cap_live = float(shares_outstanding) * price
+        except Exception:
+            market_cap_live = market_cap
+    else:
+        market_cap_live = market_cap
+    # Sparkline (last 30 closes)
+    ts_data = series.get('Time Series (Daily)', {})
+    closes = []
+    if ts_data:
+        closes = parse_time_series(ts_data).close[-30:].tolist()
+    return {
+        **company,
+        'price': price,
+        'change': change,
+        'change_percent': change_percent,
+        'volume': volume,
+        'market_cap': market_cap_live,
+        'pe_ratio': pe_ratio,
+        'sparkline': closes
+    }
+
+
+def build_top_companies(get_api_data):
+    """
+    (rows, errors) for TOP_COMPANIES, with get_api_data(function, symbol, **params)
+    fetching the payloads; run by the background refresher, not per request
+    """
+    # One job per (ticker, payload), all fetched concurrently on the shared session
+    jobs = {}
+    for company in TOP_COMPANIES:
+        ticker = company['ticker']
+        jobs[(ticker, 'quote')] = {'function': 'GLOBAL_QUOTE', 'symbol': ticker}
+        jobs[(ticker, 'overview')] = {'function': 'OVERVIEW', 'symbol': ticker}
+        jobs[(ticker, 'series')] = {'function': 'TIME_SERIES_DAILY', 'symbol': ticker, 'outputsize': 'compact'}
+    payloads, failures = upstream.run_concurrently(get_api_data, jobs)
+
+    results = []
+    errors = {}
+    for company in TOP_COMPANIES:
+        ticker = company['ticker']
+        if (ticker, 'quote') not in payloads:
+            # Without a quote there is nothing useful to show for this row
+            errors[ticker] = failures.get((ticker, 'quote'), 'quote unavailable')
+            continue
+        try:
+            results.append(build_company_row(
+                company,
+                payloads[(ticker, 'quote')],
+                payloads.get((ticker, 'overview'), {}),
+                payloads.get((ticker, 'series'), {})
+            ))
+        except Exception as e:
+            errors[ticker] = str(e)
+    return results, errors
@@ -0,0 +1,113 @@
+"""Shared HTTP client and concurrent fetch helpers for Alpha Vantage calls."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from av_responses import UpstreamError
+
+BASE_URL = 'https://www.alphavantage.co/query'
+
+# Transient answers worth another try; everything else fails immediately
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Defaults, overridden by configure() with the values from config.json
+settings = {
+    'base_url': BASE_URL,
+    'max_concurrency': 8,
+    'request_timeout': 10,
+    'max_retries': 2,
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure(max_concurrency=None, request_timeout=None, base_url=None, max_retries=None):
+    """Update the settings used by this module; the next call opens a fresh pool"""
+    global _session
+    with _session_lock:
+        if max_concurrency:
+            settings['max_concurrency'] = int(max_concurrency)
+        if request_timeout:
+            settings['request_timeout'] = float(request_timeout)
+        if base_url:
+            settings['base_url'] = base_url
+        if max_retries is not None:
+            settings['max_retries'] = int(max_retries)
+        # Recreate the session so the pool size follows the new cap
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def after_fork():
+    """Forget the pool inherited from the parent process without closing it"""
+    global _session
+    with _session_lock:
+        _session = None
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported on first use, not at start-up
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            pool_size = settings['max_concurrency']
+            # Transient statuses and connection errors are retried with backoff
+            retry = Retry(
+                total=settings['max_retries'], backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+                allowed_methods=['GET'], raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def fetch_json(params, url=None, timeout=None):
+    """GET url (the configured endpoint by default) with params and decode the JSON body"""
+    url = url or settings['base_url']
+    import requests
+    if timeout is None:
+        timeout = settings['request_timeout']
+    try:
+        response = get_session().get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        # Callers only need to handle one exception type
+        raise UpstreamError(f"{type(e).__name__}: {e}") from e
+    except ValueError as e:
+        raise UpstreamError(f"invalid JSON from upstream: {e}") from e
+
+
+def snapshot():
+    return {key: settings[key] for key in ('max_concurrency', 'request_timeout', 'max_retries')}
+
+
+def run_concurrently(func, jobs, max_workers=None):
+    """
+    Call func(**kwargs) for every (key, kwargs) pair in jobs on a thread pool.
+
+    Returns (results, errors): two dicts keyed like jobs. A failing job only
+    lands in errors, so callers always get whatever completed successfully.
+    """
+    if max_workers is None:
+        max_workers = settings['max_concurrency']
+    results = {}
+    errors = {}
+    if not jobs:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = {key: executor.submit(func, **kwargs) for key, kwargs in jobs.items()}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = str(e)
+    return results, errors